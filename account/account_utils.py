@@ -3,9 +3,9 @@ import logging
 from datetime import timedelta
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import send_mail, BadHeaderError
 from django.core.exceptions import ImproperlyConfigured
 from rest_framework_simplejwt.tokens import RefreshToken
+from mailer.outbox import enqueue_email
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +20,7 @@ def get_otp_expiry(minutes=30):
     return timezone.now() + timedelta(minutes=minutes)
 
 def send_otp_email(recipient_email: str, otp: str) -> None:
-    """Send an OTP to the user's email."""
+    """Queue an OTP email for the user; the outbox worker delivers it."""
     from_email = getattr(settings, 'EMAIL_HOST_USER', None) or getattr(settings, 'DEFAULT_FROM_EMAIL', None)
     if not from_email:
         raise ImproperlyConfigured("Sender email not configured. Set EMAIL_HOST_USER or DEFAULT_FROM_EMAIL in settings.")
@@ -29,18 +29,10 @@ def send_otp_email(recipient_email: str, otp: str) -> None:
     message = f"Your One-Time Password (OTP) is: {otp}"
 
     try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=from_email,
-            recipient_list=[recipient_email],
-            fail_silently=False,
-        )
-        logger.info(f"OTP email sent to {recipient_email}")
-    except BadHeaderError:
-        logger.error("Invalid header found while sending email.")
+        enqueue_email(subject, message, [recipient_email], from_email=from_email)
+        logger.info(f"OTP email queued for {recipient_email}")
     except Exception as e:
-        logger.exception(f"Error sending OTP email to {recipient_email}: {e}")
+        logger.exception(f"Error queueing OTP email to {recipient_email}: {e}")
 
 def generate_tokens_for_user(user):
     """Generates access and refresh tokens for a user."""
@@ -1,8 +1,23 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.utils.translation import gettext_lazy as _
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def with_subscription(self):
+        """
+        Annotate `plan_name`: the active subscription's plan, or None.
+
+        UserSerializer reads it instead of querying once per user.
+        """
+        from subscription.models import UserSubscription
+
+        active = UserSubscription.objects.filter(user=OuterRef('pk'), is_active=True)
+        return self.annotate(plan_name=Subquery(active.values('plan__name')[:1]))
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def _create_user(self, email, password=None, **extra_fields):
         """
         Core method for creating all types of users.
@@ -0,0 +1,74 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+
+def _wrapper(alias, settings_dict):
+    backend = load_backend(settings_dict['ENGINE'])
+    return backend.DatabaseWrapper(settings_dict, alias)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request connection setup time: a fresh connection per request "
+        "(the old behaviour) against the configured pool / persistent connections"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Simulated requests per mode")
+        parser.add_argument('--database', default='default', help="Database alias to benchmark")
+
+    def simulate(self, wrapper, requests):
+        """Run the connection lifecycle Django applies around each request, with one tiny query."""
+        setup, query = [], []
+        try:
+            for _ in range(requests):
+                wrapper.close_if_unusable_or_obsolete()     # request_started
+                start = time.perf_counter()
+                wrapper.ensure_connection()
+                connected = time.perf_counter()
+                with wrapper.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                setup.append((connected - start) * 1000)
+                query.append((time.perf_counter() - connected) * 1000)
+                wrapper.close_if_unusable_or_obsolete()     # request_finished
+        finally:
+            wrapper.close()
+            close_pool = getattr(wrapper, 'close_pool', None)
+            if close_pool:
+                close_pool()
+        return setup, query
+
+    def report(self, label, setup, query):
+        self.stdout.write(
+            f"{label:<12} setup avg {statistics.mean(setup):7.2f} ms  p50 {_percentile(setup, 50):7.2f} ms  "
+            f"p95 {_percentile(setup, 95):7.2f} ms | query avg {statistics.mean(query):6.2f} ms"
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        requests = options['requests']
+        configured = copy.deepcopy(connections[alias].settings_dict)
+
+        unpooled = copy.deepcopy(configured)
+        unpooled['CONN_MAX_AGE'] = 0
+        unpooled['OPTIONS'].pop('pool', None)
+
+        self.stdout.write(f"Simulating {requests} requests against '{alias}' ({configured['ENGINE']})")
+        before = self.simulate(_wrapper(f"{alias}_benchmark_unpooled", unpooled), requests)
+        self.report("unpooled", *before)
+        after = self.simulate(_wrapper(f"{alias}_benchmark_configured", configured), requests)
+        self.report("configured", *after)
+
+        saved = statistics.mean(before[0]) - statistics.mean(after[0])
+        self.stdout.write(self.style.SUCCESS(f"Connection setup saved per request: {saved:.2f} ms"))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_userauth_age_userauth_club_userauth_playing_level'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userauth',
+            index=models.Index(fields=['date_joined', 'id'], name='user_joined_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userauth',
+            index=models.Index(fields=['is_verified', 'date_joined', 'id'], name='user_verified_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userauth',
+            index=models.Index(fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
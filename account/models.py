@@ -10,6 +10,13 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
         verbose_name = "User"
         verbose_name_plural = "Users"
         ordering = ['-date_joined']
+        indexes = [
+            # The admin user list pages by (date_joined, id), optionally per verification state.
+            models.Index(fields=['date_joined', 'id'], name='user_joined_id_idx'),
+            models.Index(fields=['is_verified', 'date_joined', 'id'], name='user_verified_joined_idx'),
+            # Prefix search on email (LIKE 'abc%') on PostgreSQL.
+            models.Index(fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
         
     email = models.EmailField(max_length=100, unique=True)
     full_name = models.CharField(max_length=30)
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    """Keyset pagination over users, newest first; the id breaks date_joined ties."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-date_joined', '-id')
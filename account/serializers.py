@@ -4,9 +4,11 @@ from django.contrib.auth.password_validation import validate_password
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import authenticate
-from .account_utils import send_mail, send_otp_email, generate_otp, get_otp_expiry, generate_tokens_for_user
+from .account_utils import send_otp_email, generate_otp, get_otp_expiry, generate_tokens_for_user
 
 class UserSerializer(serializers.ModelSerializer):
+    subscribed_plan_status = serializers.SerializerMethodField()
+
     class Meta:
         model = UserAuth
         fields = [
@@ -16,6 +18,29 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'email', 'is_verified', 'is_superuser', 'is_staff', 'subscribed_plan_status' 'date_joined', 'updated_at']
 
+    def get_subscribed_plan_status(self, obj):
+        # Annotated by UserAuth.objects.with_subscription(); otherwise one query.
+        if hasattr(obj, 'plan_name'):
+            return {'plan__name': obj.plan_name} if obj.plan_name else None
+        return obj.subscribed_plan_status()
+
+
+class SparseFieldsMixin:
+    """Drop every field not named in the `fields` kwarg (e.g. from `?fields=id,email`)."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UserListSerializer(SparseFieldsMixin, UserSerializer):
+    """Admin user list row; pair with UserAuth.objects.with_subscription()."""
+
+    class Meta(UserSerializer.Meta):
+        read_only_fields = UserSerializer.Meta.fields
+
 
 class SignupSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
@@ -1,3 +1,79 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from subscription.models import SubscriptionPlan, UserSubscription
+from .models import UserAuth
+from .serializers import UserSerializer
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserSubscriptionQueryTests(TestCase):
+    """Pin the query counts of endpoints that render UserSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserAuth.objects.create_superuser('admin@example.com', 'pass', full_name='Admin')
+        cls.plan = SubscriptionPlan.objects.create(name='vip', monthly_price=10)
+        cls.member = UserAuth.objects.create_user('member@example.com', 'pass', full_name='Member', is_verified=True)
+        UserSubscription.objects.create(
+            user=cls.member, plan=cls.plan, billing_cycle='monthly',
+            end_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        for i in range(5):
+            UserAuth.objects.create_user(f'user{i}@example.com', full_name=f'User {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_with_subscription_annotates_plan(self):
+        with self.assertNumQueries(1):
+            users = {u.email: u for u in UserAuth.objects.with_subscription()}
+            data = UserSerializer(list(users.values()), many=True).data
+        self.assertEqual(users['member@example.com'].plan_name, 'vip')
+        self.assertIsNone(users['admin@example.com'].plan_name)
+        self.assertIn({'plan__name': 'vip'}, [row['subscribed_plan_status'] for row in data])
+
+    def test_login(self):
+        # User lookup, then the plan for the response.
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/auth/login/', {'email': 'member@example.com', 'password': 'pass'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['subscribed_plan_status'], {'plan__name': 'vip'})
+
+    def test_update_profile(self):
+        self.client.force_authenticate(self.member)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/update-profile/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_specific_user(self):
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/auth/user/{self.member.pk}/')
+        self.assertEqual(response.data['user']['subscribed_plan_status'], {'plan__name': 'vip'})
+
+    def test_dashboard(self):
+        self.client.force_authenticate(self.admin)
+        # The rollup totals, the user counts, then the live subscriber count.
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/auth/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_subscribed_users'], 1)
+
+    def test_dashboard_user_counts_drop_with_deleted_users(self):
+        self.client.force_authenticate(self.admin)
+        before = self.client.get('/api/auth/dashboard/').data
+        UserAuth.objects.get(email='user0@example.com').delete()
+
+        after = self.client.get('/api/auth/dashboard/').data
+
+        self.assertEqual(after['total_users'], before['total_users'] - 1)
+        self.assertEqual(after['verified_users'] + after['unverified_users'], after['total_users'])
+
+    def test_user_list_does_not_grow_with_users(self):
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/users/')
+        self.assertEqual(len(response.data['data']), 7)
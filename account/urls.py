@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import SignupView, VerifyEmailOTPView, ResendOTPView, LoginView, ForgetPasswordView, ResetPasswordView, UpdateProfileView, DashboardView, SpecificUserView, VerifyForgetPasswordOTPView
+from .views import SignupView, VerifyEmailOTPView, ResendOTPView, LoginView, ForgetPasswordView, ResetPasswordView, UpdateProfileView, DashboardView, UserListView, SpecificUserView, VerifyForgetPasswordOTPView
 
 urlpatterns = [
     path('signup/', SignupView.as_view(), name='signup'),
@@ -11,5 +11,6 @@ urlpatterns = [
     path('reset-password/', ResetPasswordView.as_view(), name='reset-password'),
     path('update-profile/', UpdateProfileView.as_view(), name='update-profile'),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('users/', UserListView.as_view(), name='user-list'),
     path('user/<int:pk>/', SpecificUserView.as_view(), name='specific-user'),
 ]
\ No newline at end of file
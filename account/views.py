@@ -18,6 +18,7 @@ from django.db import transaction
 from .account_permissions import  IsOwnerOrSuperuser, IsSuperUserOrReadOnly
 from rest_framework.permissions import IsAuthenticated
 from .models import UserAuth
+from metrics.rollups import record as record_metrics
 
 import logging
 logger = logging.getLogger(__name__)
@@ -124,10 +125,13 @@ class VerifyEmailOTPView(APIView):
         if serializer.is_valid():
             try:
                 user = serializer.validated_data['user']
+                was_verified = user.is_verified
                 user.is_verified = True
                 user.otp = None
                 user.otp_expired = None
                 user.save()
+                if not was_verified:
+                    record_metrics(at=user.date_joined, verified_users=1)
 
                 tokens = generate_tokens_for_user(user)
 
@@ -361,10 +365,13 @@ class UpdateProfileView(APIView):
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum, F, DecimalField, ExpressionWrapper, Q
-from tickets.models import TicketPurchase
+from django.db.models import Count, Q
+from metrics.rollups import totals as metrics_totals
 from subscription.models import UserSubscription
+from .pagination import UserCursorPagination
+from .serializers import UserListSerializer
 from decimal import Decimal
+import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -379,37 +386,21 @@ class DashboardView(APIView):
             logger.warning(f'Unauthorized dashboard access by user: {user.id}')
             return Response({'message': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
 
-        # User stats - only 2 queries total here
-        total_users = UserAuth.objects.count()
-        verified_users = UserAuth.objects.filter(is_verified=True).count()
+        # Revenue stats - one aggregate over the daily rollups
+        metrics = metrics_totals()
+        # Exact user counts: the signup rollups only ever grow, deleted users included.
+        users = UserAuth.objects.aggregate(
+            total=Count('id'), verified=Count('id', filter=Q(is_verified=True)),
+        )
+        total_users = users['total']
+        verified_users = users['verified']
         unverified_users = total_users - verified_users
-
-        # Serialize only if necessary - consider lazy or limit for large users list
-        serializer = UserSerializer(UserAuth.objects.all(), many=True)
-
-        # Ticket purchase earnings - single aggregate query, no joins except F('ticket__price')
-        ticket_earnings = (
-            TicketPurchase.objects
-            .filter(payment_status='succeeded')
-            .aggregate(
-                total=Sum(
-                    ExpressionWrapper(
-                        F('ticket__price') * F('quantity'),
-                        output_field=DecimalField(max_digits=20, decimal_places=2)
-                    )
-                )
-            )
-        )['total'] or Decimal('0.00')
-
-        # Subscription earnings - sum monthly_price for active subscriptions, single query
-        total_subscription_earnings = (
-            UserSubscription.objects
-            .filter(is_active=True)
-            .aggregate(total=Sum('plan__monthly_price'))
-        )['total'] or Decimal('0.00')
-
-        # Count of active subscriptions - single query
-        total_subscribed_users = UserSubscription.objects.filter(is_active=True).count()
+        ticket_earnings = metrics['ticket_revenue']
+        total_subscription_earnings = metrics['subscription_revenue']
+        # A live count: subscriptions also end by lapsing, which the rollups never record.
+        total_subscribed_users = UserSubscription.objects.filter(
+            is_active=True, end_date__gte=timezone.now().date()
+        ).count()
         
         logger.info(f'Superuser {user.id} accessed dashboard.')
 
@@ -421,7 +412,63 @@ class DashboardView(APIView):
             'unverified_users': unverified_users,
             'total_earning': float(ticket_earnings + total_subscription_earnings),
             'total_subscribed_users': total_subscribed_users,
-            'user_list': serializer.data,
+        }, status=status.HTTP_200_OK)
+
+
+class UserListView(APIView):
+    """
+    Admin user list, cursor-paginated newest first.
+
+    - `?fields=id,email,...`: only these fields per user
+    - `?search=`: email prefix
+    - `?is_verified=true|false`, `?joined_after=` / `?joined_before=` (YYYY-MM-DD)
+    """
+    permission_classes = [IsOwnerOrSuperuser]
+    pagination_class = UserCursorPagination
+
+    def get(self, request):
+        user = request.user
+        if not user.is_superuser:
+            logger.warning(f'Unauthorized user list access by user: {user.id}')
+            return Response({'message': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+        params = request.query_params
+        fields = [f for f in params.get('fields', '').split(',') if f]
+        unknown = set(fields) - set(UserListSerializer.Meta.fields)
+        if unknown:
+            return Response({
+                'success': False,
+                'message': f"Unknown fields: {', '.join(sorted(unknown))}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        users = UserAuth.objects.all()
+        if params.get('search'):
+            users = users.filter(email__startswith=params['search'])
+        if params.get('is_verified') in ('true', 'false'):
+            users = users.filter(is_verified=params['is_verified'] == 'true')
+        try:
+            if params.get('joined_after'):
+                users = users.filter(date_joined__date__gte=datetime.date.fromisoformat(params['joined_after']))
+            if params.get('joined_before'):
+                users = users.filter(date_joined__date__lte=datetime.date.fromisoformat(params['joined_before']))
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': "joined_after and joined_before must be YYYY-MM-DD dates."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not fields or 'subscribed_plan_status' in fields:
+            users = users.with_subscription()
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(users, request, view=self)
+
+        return Response({
+            'success': True,
+            'message': 'Users retrieved successfully.',
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'data': UserListSerializer(page, many=True, fields=fields).data,
         }, status=status.HTTP_200_OK)
 
 
@@ -436,7 +483,7 @@ class SpecificUserView(APIView):
             return Response({'message': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
 
         try:
-            user_obj = UserAuth.objects.get(pk=pk)
+            user_obj = UserAuth.objects.with_subscription().get(pk=pk)
             serializer = UserSerializer(user_obj)
             logger.info(f'Superuser {user.id} accessed data for user {pk}')
             return Response({
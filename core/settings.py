@@ -59,6 +59,8 @@ EXTERNAL_APPS = [
     'subscription',
     'tickets',
     'raffle',
+    'mailer',
+    'metrics',
     
 ]
 
@@ -120,14 +122,42 @@ WSGI_APPLICATION = 'core.wsgi.application'
 #     }
 # }
 
+# Connection handling, set with DB_POOL_MODE:
+#   psycopg   - Django's built-in psycopg 3 connection pool (default)
+#   pgbouncer - persistent connections to an external pgbouncer in transaction mode
+#   none      - persistent per-thread connections (the old conn_max_age=600 setup)
+DB_POOL_MODE = env('DB_POOL_MODE', default='psycopg')
+DB_POOL_MIN_SIZE = env('DB_POOL_MIN_SIZE', cast=int, default=2)
+DB_POOL_MAX_SIZE = env('DB_POOL_MAX_SIZE', cast=int, default=10)
+DB_POOL_TIMEOUT = env('DB_POOL_TIMEOUT', cast=float, default=10.0)          # seconds to wait for a free connection
+DB_POOL_MAX_IDLE = env('DB_POOL_MAX_IDLE', cast=float, default=300.0)       # close idle pooled connections after this
+DB_POOL_MAX_LIFETIME = env('DB_POOL_MAX_LIFETIME', cast=float, default=1800.0)
+DB_HEALTH_CHECKS = env('DB_HEALTH_CHECKS', cast=bool, default=True)
+
 DATABASES = {
     'default': dj_database_url.parse(
         env('DATABASE_URL'),
-        conn_max_age=600,
+        conn_max_age=0 if DB_POOL_MODE == 'psycopg' else 600,
+        conn_health_checks=DB_HEALTH_CHECKS and DB_POOL_MODE != 'psycopg',
+        # pgbouncer in transaction mode cannot keep server-side cursors open across statements.
+        disable_server_side_cursors=DB_POOL_MODE == 'pgbouncer',
         ssl_require=True
     )
 }
 
+if DB_POOL_MODE == 'psycopg' and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
+        'max_idle': DB_POOL_MAX_IDLE,
+        'max_lifetime': DB_POOL_MAX_LIFETIME,
+    }
+    if DB_HEALTH_CHECKS:
+        from psycopg_pool import ConnectionPool
+        # Validate a pooled connection before handing it out.
+        DATABASES['default']['OPTIONS']['pool']['check'] = ConnectionPool.check_connection
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -241,6 +271,12 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Outbound email queue (mailer app, drained by `manage.py deliver_emails`)
+EMAIL_OUTBOX_BATCH_SIZE = env('EMAIL_OUTBOX_BATCH_SIZE', cast=int, default=50)
+EMAIL_OUTBOX_MAX_ATTEMPTS = env('EMAIL_OUTBOX_MAX_ATTEMPTS', cast=int, default=5)
+EMAIL_OUTBOX_RETRY_BACKOFF = env('EMAIL_OUTBOX_RETRY_BACKOFF', cast=int, default=30)
+
+
 
 
 
@@ -270,6 +306,7 @@ LOGGING = {
             "class": "logging.handlers.TimedRotatingFileHandler",
             "level": "INFO",
             "filename": LOG_DIR / "access.log",
+            "delay": True,        # open the file on the first record, not at startup
             "when": "D",          # rotate daily
             "interval": 1,
             "backupCount": 7,     # keep 7 days only
@@ -280,6 +317,7 @@ LOGGING = {
             "class": "logging.handlers.TimedRotatingFileHandler",
             "level": "ERROR",
             "filename": LOG_DIR / "error.log",
+            "delay": True,        # open the file on the first record, not at startup
             "when": "D",          # rotate daily
             "interval": 1,
             "backupCount": 7,     # keep 7 days only
@@ -328,6 +366,16 @@ STRIPE_PUBLISHABLE_KEY = env('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY')
 # stripe webhook secret
 STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET')
+# Webhook events are stored on receipt and applied by `manage.py process_stripe_events`.
+STRIPE_EVENT_BATCH_SIZE = env('STRIPE_EVENT_BATCH_SIZE', cast=int, default=20)
+STRIPE_EVENT_MAX_ATTEMPTS = env('STRIPE_EVENT_MAX_ATTEMPTS', cast=int, default=8)
+STRIPE_EVENT_RETRY_BACKOFF = env('STRIPE_EVENT_RETRY_BACKOFF', cast=int, default=30)
+# Subscription free tickets are queued per period and run by `manage.py process_ticket_allocations`.
+FREE_TICKET_ALLOCATION_BATCH_SIZE = env('FREE_TICKET_ALLOCATION_BATCH_SIZE', cast=int, default=50)
+FREE_TICKET_ALLOCATION_MAX_ATTEMPTS = env('FREE_TICKET_ALLOCATION_MAX_ATTEMPTS', cast=int, default=10)
+FREE_TICKET_ALLOCATION_RETRY_BACKOFF = env('FREE_TICKET_ALLOCATION_RETRY_BACKOFF', cast=int, default=60)
+# Subscriptions per transaction for the scheduled `manage.py allocate_monthly_tickets` run.
+FREE_TICKET_ALLOCATION_CHUNK_SIZE = env('FREE_TICKET_ALLOCATION_CHUNK_SIZE', cast=int, default=500)
 
 # Stripe success and cancle url
 SUCCESS_URL = 'http://localhost:3000/success/'  # Temporary
@@ -348,6 +396,15 @@ CACHES = {
 }
 
 
+# Split each new giveaway's stock across this many counter rows (0 = single row).
+# Existing giveaways: `manage.py shard_giveaway_stock <id> --shards N`.
+TICKET_STOCK_SHARDS = env('TICKET_STOCK_SHARDS', cast=int, default=0)
+
+# Ticket IDs: 'random' (CSPRNG, checked against the unique index) or 'sequence'
+# (blocks reserved from a database counter, no lookup per batch).
+TICKET_ID_MODE = env('TICKET_ID_MODE', default='random')
+
+
 # celery task configuration
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
@@ -32,6 +32,8 @@ urlpatterns = [
     path('api/ticket/', include('tickets.urls')),
     path('api/raffle/', include('raffle.urls')),
     path('api/subscription/', include('subscription.urls')),
+    path('api/mailer/', include('mailer.urls')),
+    path('api/metrics/', include('metrics.urls')),
     
 ]
 
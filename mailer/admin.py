@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "recipients", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("subject", "to")
+    readonly_fields = ("attempts", "locked_at", "last_error", "created_at", "sent_at")
+    ordering = ("-created_at",)
+
+    def recipients(self, obj):
+        return ", ".join(obj.to)
+    recipients.short_description = "To"
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from mailer.outbox import BATCH_SIZE, deliver_pending, outbox_metrics
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound emails (polls the outbox until stopped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the outbox once and exit")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Emails sent per connection")
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help="Seconds to wait between polls when the outbox is empty")
+        parser.add_argument('--stats', action='store_true',
+                            help="Print queue depth and latency metrics and exit")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in outbox_metrics().items():
+                self.stdout.write(f"{key}: {value}")
+            return
+
+        while True:
+            result = deliver_pending(options['batch_size'])
+            if result['batches']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {result['sent']} email(s), {result['failed']} failed, "
+                    f"in {result['batches']} batch(es)."
+                ))
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
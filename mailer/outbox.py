@@ -0,0 +1,161 @@
+# mailer/outbox.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+RETRY_BACKOFF_SECONDS = getattr(settings, 'EMAIL_OUTBOX_RETRY_BACKOFF', 30)
+MAX_BACKOFF_SECONDS = 60 * 60
+# Rows claimed by a worker that died mid-batch are released after this long.
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_email(subject: str, body: str, recipient_list, from_email: str = None) -> OutboundEmail:
+    """Store an email in the outbox; the delivery worker sends it."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list),
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2x base, 4x base... capped at one hour."""
+    return timedelta(seconds=min(RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def release_stale_locks() -> int:
+    cutoff = timezone.now() - LOCK_TIMEOUT
+    return OutboundEmail.objects.filter(
+        status=OutboundEmail.STATUS_SENDING, locked_at__lt=cutoff
+    ).update(status=OutboundEmail.STATUS_PENDING, locked_at=None)
+
+
+def claim_batch(batch_size: int = BATCH_SIZE) -> list:
+    """Claim up to `batch_size` due emails; SKIP LOCKED keeps parallel workers apart."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids, status=OutboundEmail.STATUS_PENDING).update(
+            status=OutboundEmail.STATUS_SENDING, locked_at=now
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids, status=OutboundEmail.STATUS_SENDING, locked_at=now))
+
+
+def _record_failure(email: OutboundEmail, error: str, now):
+    email.attempts += 1
+    email.last_error = error
+    email.locked_at = None
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboundEmail.STATUS_FAILED
+    else:
+        email.status = OutboundEmail.STATUS_PENDING
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def deliver_batch(batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Send one batch of due emails over a single backend connection.
+
+    Each message goes through `send_messages` on the shared connection, so a
+    bad address only fails (and backs off) its own row.
+    """
+    batch = claim_batch(batch_size)
+    result = {'sent': 0, 'failed': 0}
+    if not batch:
+        return result
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not open email connection: {e}")
+        now = timezone.now()
+        for email in batch:
+            _record_failure(email, f"Connection failed: {e}", now)
+        OutboundEmail.objects.bulk_update(
+            batch, ['status', 'attempts', 'last_error', 'locked_at', 'next_attempt_at']
+        )
+        result['failed'] = len(batch)
+        return result
+
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logger.error(f"Failed to send email #{email.pk} to {', '.join(email.to)}: {e}")
+                _record_failure(email, str(e), timezone.now())
+                result['failed'] += 1
+            else:
+                email.status = OutboundEmail.STATUS_SENT
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.locked_at = None
+                result['sent'] += 1
+            # Saved per message: if the worker dies mid-batch, only the unsent
+            # rows are picked up again once their lock goes stale.
+            email.save(update_fields=['status', 'attempts', 'last_error', 'locked_at', 'next_attempt_at', 'sent_at'])
+    finally:
+        connection.close()
+
+    logger.info(f"Email outbox batch: {result['sent']} sent, {result['failed']} failed.")
+    return result
+
+
+def deliver_pending(batch_size: int = BATCH_SIZE) -> dict:
+    """Drain every due email, batch by batch."""
+    release_stale_locks()
+    totals = {'sent': 0, 'failed': 0, 'batches': 0}
+    while True:
+        result = deliver_batch(batch_size)
+        if not result['sent'] and not result['failed']:
+            break
+        totals['sent'] += result['sent']
+        totals['failed'] += result['failed']
+        totals['batches'] += 1
+    return totals
+
+
+def outbox_metrics(window: timedelta = timedelta(hours=1)) -> dict:
+    """Queue depth and delivery latency (enqueue to sent) over the last `window`."""
+    now = timezone.now()
+    recently_sent = Q(status=OutboundEmail.STATUS_SENT, sent_at__gte=now - window)
+    stats = OutboundEmail.objects.aggregate(
+        pending=Count('id', filter=Q(status=OutboundEmail.STATUS_PENDING)),
+        sending=Count('id', filter=Q(status=OutboundEmail.STATUS_SENDING)),
+        failed=Count('id', filter=Q(status=OutboundEmail.STATUS_FAILED)),
+        oldest_pending=Min('created_at', filter=Q(status=OutboundEmail.STATUS_PENDING)),
+        sent_in_window=Count('id', filter=recently_sent),
+        avg_latency=Avg(F('sent_at') - F('created_at'), filter=recently_sent),
+        max_latency=Max(F('sent_at') - F('created_at'), filter=recently_sent),
+    )
+
+    def seconds(value):
+        return round(value.total_seconds(), 3) if value is not None else None
+
+    oldest_pending = stats.pop('oldest_pending')
+    stats['oldest_pending_age_seconds'] = seconds(now - oldest_pending) if oldest_pending else None
+    stats['avg_latency_seconds'] = seconds(stats.pop('avg_latency'))
+    stats['max_latency_seconds'] = seconds(stats.pop('max_latency'))
+    return stats
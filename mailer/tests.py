@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+from pathlib import Path
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from account.account_utils import send_otp_email
+from .models import OutboundEmail
+from .outbox import MAX_ATTEMPTS, deliver_pending, enqueue_email, outbox_metrics
+
+
+class CountingBackend(LocmemBackend):
+    """locmem backend that records how many connections were opened."""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FailingBackend(LocmemBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP server unavailable")
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+
+    def test_enqueue_does_not_send(self):
+        send_otp_email('user@example.com', '123456')
+
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, ['user@example.com'])
+        self.assertEqual(email.status, OutboundEmail.STATUS_PENDING)
+
+    def test_deliver_sends_and_marks_sent(self):
+        for i in range(3):
+            enqueue_email(f"Subject {i}", "Body", [f"user{i}@example.com"])
+
+        result = deliver_pending()
+
+        self.assertEqual(result['sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+        self.assertEqual(outbox_metrics()['sent_in_window'], 3)
+
+    @override_settings(EMAIL_BACKEND='mailer.tests.CountingBackend')
+    def test_one_connection_per_batch(self):
+        CountingBackend.opened = 0
+        for i in range(5):
+            enqueue_email("Subject", "Body", [f"user{i}@example.com"])
+
+        result = deliver_pending(batch_size=5)
+
+        self.assertEqual(result['batches'], 1)
+        self.assertEqual(CountingBackend.opened, 1)
+
+    @override_settings(EMAIL_BACKEND='mailer.tests.FailingBackend')
+    def test_failure_backs_off_then_gives_up(self):
+        email = enqueue_email("Subject", "Body", ["user@example.com"])
+
+        with self.assertLogs('mailer.outbox', 'ERROR'):
+            deliver_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.STATUS_PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(outbox_metrics()['pending'], 1)
+
+        # Not due yet, so another run leaves it alone.
+        self.assertEqual(deliver_pending()['failed'], 0)
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            with self.assertLogs('mailer.outbox', 'ERROR'):
+                deliver_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.STATUS_FAILED)
+        self.assertEqual(email.attempts, MAX_ATTEMPTS)
+
+
+class InterruptingBackend(LocmemBackend):
+    """Delivers the first message of a batch, then the worker "dies"."""
+    def send_messages(self, messages):
+        if len(mail.outbox) >= 1:
+            raise KeyboardInterrupt
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='mailer.tests.InterruptingBackend')
+class InterruptedBatchTests(TestCase):
+
+    def test_rows_sent_before_a_crash_are_not_sent_again(self):
+        first = enqueue_email("Subject", "Body", ["first@example.com"])
+        second = enqueue_email("Subject", "Body", ["second@example.com"])
+
+        with self.assertRaises(KeyboardInterrupt):
+            deliver_pending(batch_size=2)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, OutboundEmail.STATUS_SENT)
+        self.assertEqual(second.status, OutboundEmail.STATUS_SENDING)
+
+
+class FileBackendOutboxTests(TestCase):
+
+    def setUp(self):
+        self.mail_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.mail_dir)
+
+    def test_deliver_with_file_backend(self):
+        enqueue_email("Subject", "Body", ["user@example.com"])
+
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+                           EMAIL_FILE_PATH=self.mail_dir):
+            result = deliver_pending()
+
+        self.assertEqual(result['sent'], 1)
+        with open(next(Path(self.mail_dir).iterdir())) as f:
+            self.assertIn("user@example.com", f.read())
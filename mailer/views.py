@@ -0,0 +1,15 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from .outbox import outbox_metrics
+
+
+class OutboxMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'success': True,
+            'data': outbox_metrics()
+        }, status=status.HTTP_200_OK)
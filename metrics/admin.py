@@ -0,0 +1,21 @@
+from django.contrib import admin
+from .models import DailyMetrics, HourlyMetrics
+
+COUNTER_COLUMNS = (
+    'new_users', 'verified_users', 'purchases', 'tickets_sold', 'ticket_revenue',
+    'subscriptions_started', 'subscriptions_cancelled', 'subscription_revenue',
+)
+
+
+@admin.register(DailyMetrics)
+class DailyMetricsAdmin(admin.ModelAdmin):
+    list_display = ('date',) + COUNTER_COLUMNS
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+
+
+@admin.register(HourlyMetrics)
+class HourlyMetricsAdmin(admin.ModelAdmin):
+    list_display = ('hour',) + COUNTER_COLUMNS
+    date_hierarchy = 'hour'
+    ordering = ('-hour',)
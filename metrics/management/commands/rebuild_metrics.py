@@ -0,0 +1,22 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from metrics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily and hourly metrics rollups from purchases, subscriptions and users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild buckets from this date (YYYY-MM-DD) onwards")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a YYYY-MM-DD date.")
+
+        result = rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {result['days']} daily and {result['hours']} hourly rollups."))
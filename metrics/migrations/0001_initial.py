@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('verified_users', models.PositiveIntegerField(default=0)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('tickets_sold', models.PositiveIntegerField(default=0)),
+                ('ticket_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('subscriptions_started', models.PositiveIntegerField(default=0)),
+                ('subscriptions_cancelled', models.PositiveIntegerField(default=0)),
+                ('subscription_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(unique=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Metrics',
+                'verbose_name_plural': 'Daily Metrics',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('verified_users', models.PositiveIntegerField(default=0)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('tickets_sold', models.PositiveIntegerField(default=0)),
+                ('ticket_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('subscriptions_started', models.PositiveIntegerField(default=0)),
+                ('subscriptions_cancelled', models.PositiveIntegerField(default=0)),
+                ('subscription_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hour', models.DateTimeField(unique=True)),
+            ],
+            options={
+                'verbose_name': 'Hourly Metrics',
+                'verbose_name_plural': 'Hourly Metrics',
+                'ordering': ['-hour'],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:50
+
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Round, TruncDate, TruncHour
+from django.utils import timezone
+
+COUNTER_FIELDS = [
+    'new_users', 'verified_users', 'purchases', 'tickets_sold', 'ticket_revenue',
+    'subscriptions_started', 'subscriptions_cancelled', 'subscription_revenue',
+]
+
+
+def backfill_rollups(apps, schema_editor):
+    # The rollups only count from the moment the app is deployed; fill in the
+    # history so totals and series start out complete. A frozen copy of
+    # metrics.rollups.rebuild, on the historical models.
+    users = apps.get_model(settings.AUTH_USER_MODEL)._default_manager.all()
+    purchases = apps.get_model('tickets', 'TicketPurchase')._default_manager.filter(
+        payment_status='succeeded',
+    ).exclude(source__in=['subscription', 'first_time_bonus'])
+    subscriptions = apps.get_model('subscription', 'UserSubscription')._default_manager.exclude(
+        stripe_subscription_id=None,
+    )
+    yearly_charge = Round(
+        F('plan__monthly_price') * Value(Decimal('12')) * (Value(Decimal('100')) - F('plan__yearly_discount_percent')) / Value(Decimal('100')),
+        2,
+    )
+    charge = Case(
+        When(billing_cycle='yearly', then=yearly_charge),
+        default=F('plan__monthly_price'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+    def collect(buckets, rows):
+        for row in rows:
+            counters = buckets.setdefault(row.pop('bucket'), dict.fromkeys(COUNTER_FIELDS, 0))
+            for field, value in row.items():
+                counters[field] += value or 0
+
+    for granularity, truncate, model, key in (
+        ('day', TruncDate, 'DailyMetrics', 'date'),
+        ('hour', TruncHour, 'HourlyMetrics', 'hour'),
+    ):
+        buckets = {}
+        collect(buckets, users.annotate(bucket=truncate('date_joined')).values('bucket').annotate(
+            new_users=Count('id'),
+            verified_users=Count('id', filter=Q(is_verified=True)),
+        ))
+        collect(buckets, purchases.annotate(bucket=truncate('purchase_date')).values('bucket').annotate(
+            purchases=Count('id'),
+            tickets_sold=Sum('quantity'),
+            ticket_revenue=Sum(Coalesce('amount_charged', Value(Decimal('0.00')))),
+        ))
+        collect(buckets, (
+            {**row, 'bucket': row['bucket'] if granularity == 'day' else timezone.make_aware(
+                datetime.datetime.combine(row['bucket'], datetime.time.min)
+            )}
+            for row in subscriptions.annotate(bucket=F('start_date')).values('bucket').annotate(
+                subscriptions_started=Count('id'),
+                subscriptions_cancelled=Count('id', filter=Q(is_active=False)),
+                subscription_revenue=Sum(charge),
+            )
+        ))
+
+        Rollup = apps.get_model('metrics', model)
+        Rollup.objects.all().delete()
+        Rollup.objects.bulk_create(
+            [Rollup(**{key: bucket}, **counters) for bucket, counters in buckets.items()], batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0001_initial'),
+        ('account', '0006_userauth_list_indexes'),
+        ('subscription', '0012_allocationrun'),
+        ('tickets', '0012_ticketpurchase_stripe_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
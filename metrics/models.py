@@ -0,0 +1,44 @@
+from django.db import models
+
+
+class MetricsCounters(models.Model):
+    """Counters shared by every rollup granularity; all are deltas within the bucket."""
+    new_users = models.PositiveIntegerField(default=0)
+    verified_users = models.PositiveIntegerField(default=0)
+
+    purchases = models.PositiveIntegerField(default=0)
+    tickets_sold = models.PositiveIntegerField(default=0)
+    ticket_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    subscriptions_started = models.PositiveIntegerField(default=0)
+    subscriptions_cancelled = models.PositiveIntegerField(default=0)
+    subscription_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class DailyMetrics(MetricsCounters):
+    date = models.DateField(unique=True)
+
+    class Meta:
+        verbose_name = "Daily Metrics"
+        verbose_name_plural = "Daily Metrics"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Metrics {self.date}"
+
+
+class HourlyMetrics(MetricsCounters):
+    hour = models.DateTimeField(unique=True)
+
+    class Meta:
+        verbose_name = "Hourly Metrics"
+        verbose_name_plural = "Hourly Metrics"
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"Metrics {self.hour:%Y-%m-%d %H:00}"
@@ -0,0 +1,195 @@
+# metrics/rollups.py
+import datetime
+import logging
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Round, TruncDate, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyMetrics, HourlyMetrics
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = [
+    'new_users',
+    'verified_users',
+    'purchases',
+    'tickets_sold',
+    'ticket_revenue',
+    'subscriptions_started',
+    'subscriptions_cancelled',
+    'subscription_revenue',
+]
+MONEY_FIELDS = {'ticket_revenue', 'subscription_revenue'}
+
+INTERVALS = ('hour', 'day', 'week', 'month')
+
+
+def hour_bucket(at: datetime.datetime) -> datetime.datetime:
+    return timezone.localtime(at).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(day: datetime.date) -> datetime.datetime:
+    """Midnight of `day`, where events dated by a plain date field are bucketed."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def record(at: datetime.datetime = None, **deltas):
+    """
+    Add `deltas` (counter name -> amount) to the day and hour buckets of `at`.
+
+    `at` must be the timestamp `rebuild` buckets the same event on, or a
+    rebuild moves counts between buckets: the signup for verifications, the
+    purchase row's date for purchases, and `day_start` of the subscription's
+    start date for subscription starts and cancellations.
+    The increments run once the caller's transaction commits, so a rolled-back
+    purchase or signup never shows up in the rollups, and the shared day and
+    hour rows are locked for one statement each instead of for the rest of
+    every purchase. A failed increment is logged rather than raised, since
+    the caller's work has already committed; `rebuild` restores the counts.
+    """
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+    at = at or timezone.now()
+    transaction.on_commit(lambda: _increment(at, deltas), robust=True)
+
+
+def _increment(at: datetime.datetime, deltas: dict):
+    update = {field: F(field) + value for field, value in deltas.items()}
+    for model, key in ((DailyMetrics, {'date': timezone.localdate(at)}), (HourlyMetrics, {'hour': hour_bucket(at)})):
+        if not model.objects.filter(**key).update(**update):
+            model.objects.get_or_create(**key)
+            model.objects.filter(**key).update(**update)
+
+
+def totals() -> dict:
+    """All-time counter totals, summed over the daily rollups."""
+    result = DailyMetrics.objects.aggregate(**{field: Sum(field) for field in COUNTER_FIELDS})
+    return {field: result[field] or (Decimal('0.00') if field in MONEY_FIELDS else 0) for field in COUNTER_FIELDS}
+
+
+def series(fields=None, start: datetime.date = None, end: datetime.date = None, interval: str = 'day') -> list:
+    """
+    Counter values per `interval` bucket between `start` and `end` (inclusive dates).
+
+    Hours come from the hourly table; days, weeks and months from the daily one.
+    """
+    fields = fields or COUNTER_FIELDS
+    if interval == 'hour':
+        rows = HourlyMetrics.objects.annotate(bucket=F('hour'))
+        if start:
+            rows = rows.filter(hour__date__gte=start)
+        if end:
+            rows = rows.filter(hour__date__lte=end)
+    else:
+        bucket = {'day': F('date'), 'week': TruncWeek('date'), 'month': TruncMonth('date')}[interval]
+        rows = DailyMetrics.objects.annotate(bucket=bucket)
+        if start:
+            rows = rows.filter(date__gte=start)
+        if end:
+            rows = rows.filter(date__lte=end)
+
+    return list(
+        rows.values('bucket')
+        .annotate(**{field: Sum(field) for field in fields})
+        .order_by('bucket')
+    )
+
+
+def _subscription_charge():
+    # What a checkout for the plan costs, as SubscriptionPlan.price_for() computes it.
+    yearly = Round(
+        F('plan__monthly_price') * Value(Decimal('12')) * (Value(Decimal('100')) - F('plan__yearly_discount_percent')) / Value(Decimal('100')),
+        2,
+    )
+    return Case(
+        When(billing_cycle='yearly', then=yearly),
+        default=F('plan__monthly_price'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _collect(buckets, queryset, trunc, aggregates):
+    for row in queryset.annotate(bucket=trunc).values('bucket').annotate(**aggregates):
+        counters = buckets.setdefault(row.pop('bucket'), dict.fromkeys(COUNTER_FIELDS, 0))
+        for field, value in row.items():
+            counters[field] += value or 0
+
+
+def _rollup_buckets(since: datetime.date, granularity: str) -> dict:
+    from subscription.models import UserSubscription
+    from tickets.models import TicketPurchase
+
+    buckets = {}
+    truncate = TruncDate if granularity == 'day' else TruncHour
+
+    users = get_user_model()._default_manager.all()
+    purchases = (
+        TicketPurchase.objects
+        .filter(payment_status='succeeded').exclude(source__in=TicketPurchase.FREE_SOURCES)
+    )
+    # Subscriptions that reached Stripe; pending checkouts never got a subscription ID.
+    subscriptions = UserSubscription.objects.exclude(stripe_subscription_id=None)
+    if since:
+        users = users.filter(date_joined__date__gte=since)
+        purchases = purchases.filter(purchase_date__date__gte=since)
+        subscriptions = subscriptions.filter(start_date__gte=since)
+
+    # Verification has no timestamp of its own; it is counted on the signup
+    # bucket, here and when recorded live.
+    _collect(buckets, users, truncate('date_joined'), {
+        'new_users': Count('id'),
+        'verified_users': Count('id', filter=Q(is_verified=True)),
+    })
+    _collect(buckets, purchases, truncate('purchase_date'), {
+        'purchases': Count('id'),
+        'tickets_sold': Sum('quantity'),
+        'ticket_revenue': Sum(Coalesce('amount_charged', Value(Decimal('0.00')))),
+    })
+
+    # start_date is a plain date: cancellations (which are not timestamped) and
+    # starts land on it, at midnight for the hourly table, as when recorded live.
+    sub_aggregates = {
+        'subscriptions_started': Count('id'),
+        'subscriptions_cancelled': Count('id', filter=Q(is_active=False)),
+        'subscription_revenue': Sum(_subscription_charge()),
+    }
+    for row in subscriptions.values('start_date').annotate(**sub_aggregates):
+        start_date = row.pop('start_date')
+        key = start_date if granularity == 'day' else day_start(start_date)
+        counters = buckets.setdefault(key, dict.fromkeys(COUNTER_FIELDS, 0))
+        for field, value in row.items():
+            counters[field] += value or 0
+    return buckets
+
+
+@transaction.atomic
+def rebuild(since: datetime.date = None) -> dict:
+    """
+    Recompute the daily and hourly rollups from the transactional tables.
+
+    Only buckets from `since` onwards are replaced (everything when None).
+    """
+    daily = _rollup_buckets(since, 'day')
+    hourly = _rollup_buckets(since, 'hour')
+
+    old_daily = DailyMetrics.objects.all()
+    old_hourly = HourlyMetrics.objects.all()
+    if since:
+        old_daily = old_daily.filter(date__gte=since)
+        old_hourly = old_hourly.filter(hour__date__gte=since)
+    old_daily.delete()
+    old_hourly.delete()
+
+    DailyMetrics.objects.bulk_create(
+        [DailyMetrics(date=day, **counters) for day, counters in daily.items()], batch_size=1000
+    )
+    HourlyMetrics.objects.bulk_create(
+        [HourlyMetrics(hour=hour, **counters) for hour, counters in hourly.items()], batch_size=1000
+    )
+    logger.info(f"Rebuilt metrics rollups since {since or 'the beginning'}: {len(daily)} days, {len(hourly)} hours.")
+    return {'days': len(daily), 'hours': len(hourly)}
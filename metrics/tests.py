@@ -0,0 +1,130 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from subscription.models import SubscriptionPlan
+from subscription.webhooks import activate_subscription
+from tickets.models import GiveawayTicket, TicketPurchase
+from .models import DailyMetrics, HourlyMetrics
+from .rollups import COUNTER_FIELDS, rebuild, record, series, totals
+
+User = get_user_model()
+
+
+def snapshot(model, key):
+    return {row.pop(key): row for row in model.objects.values(key, *COUNTER_FIELDS)}
+
+
+class RecordTests(TestCase):
+
+    def test_record_adds_to_the_day_and_hour_after_commit(self):
+        at = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            record(at, purchases=1, ticket_revenue=Decimal('4.50'))
+            record(at, purchases=2, tickets_sold=0)
+            self.assertFalse(DailyMetrics.objects.exists())
+
+        day = DailyMetrics.objects.get()
+        self.assertEqual((day.date, day.purchases, day.ticket_revenue), (timezone.localdate(at), 3, Decimal('4.50')))
+        self.assertEqual(HourlyMetrics.objects.get().purchases, 3)
+
+    def test_rolled_back_work_is_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record(purchases=1)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertFalse(DailyMetrics.objects.exists())
+
+    def test_totals_and_series_buckets(self):
+        monday = datetime.date(2026, 3, 2)
+        days = [monday, monday + datetime.timedelta(days=1), monday + datetime.timedelta(days=7),
+                datetime.date(2026, 4, 1)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for n, day in enumerate(days, start=1):
+                at = timezone.make_aware(datetime.datetime.combine(day, datetime.time(10, 30)))
+                record(at, purchases=n, ticket_revenue=Decimal(n))
+
+        self.assertEqual(totals()['purchases'], 10)
+        self.assertEqual(totals()['ticket_revenue'], Decimal('10.00'))
+        self.assertEqual(totals()['new_users'], 0)
+        self.assertEqual([row['purchases'] for row in series(['purchases'], interval='day')], [1, 2, 3, 4])
+        self.assertEqual([row['purchases'] for row in series(['purchases'], interval='week')], [3, 3, 4])
+        self.assertEqual([row['purchases'] for row in series(['purchases'], interval='month')], [6, 4])
+        hours = series(['purchases'], start=monday, end=monday, interval='hour')
+        self.assertEqual([(row['bucket'].hour, row['purchases']) for row in hours], [(10, 1)])
+
+
+class RebuildTests(TestCase):
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        giveaway = GiveawayTicket.objects.create(
+            title='Metrics', price=5, total_available=50,
+            ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            plan = SubscriptionPlan.objects.create(name='gold', monthly_price=10, yearly_discount_percent=15)
+            buyer = User.objects.create_user('buyer@example.com', full_name='Buyer', is_verified=True)
+            member = User.objects.create_user('member@example.com', full_name='Member')
+            purchase = TicketPurchase.objects.create(
+                user=buyer, ticket=giveaway, quantity=3, payment_status='succeeded',
+            )
+            purchase.confirm_purchase(amount_charged=Decimal('13.50'))
+            activate_subscription({'subscription': 'sub_1', 'metadata': {
+                'user_id': member.id, 'plan_id': plan.id, 'billing_cycle': 'yearly',
+            }})
+        daily, hourly = snapshot(DailyMetrics, 'date'), snapshot(HourlyMetrics, 'hour')
+        self.assertEqual(totals()['tickets_sold'], 3)
+        self.assertEqual(totals()['subscription_revenue'], Decimal('102.00'))
+
+        rebuild()
+
+        self.assertEqual(snapshot(DailyMetrics, 'date'), daily)
+        self.assertEqual(snapshot(HourlyMetrics, 'hour'), hourly)
+
+
+class BackfillMigrationTests(TransactionTestCase):
+    before = [('metrics', '0001_initial')]
+    after = [('metrics', '0002_backfill_rollups')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_backfill_matches_rebuild(self):
+        self.migrate(self.before)
+        giveaway = GiveawayTicket.objects.create(
+            title='Backfill', price=5, total_available=50,
+            ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        plan = SubscriptionPlan.objects.create(name='gold', monthly_price=10, yearly_discount_percent=15)
+        buyer = User.objects.create_user('buyer@example.com', full_name='Buyer', is_verified=True)
+        member = User.objects.create_user('member@example.com', full_name='Member')
+        TicketPurchase.objects.create(
+            user=buyer, ticket=giveaway, quantity=2, payment_status='succeeded', amount_charged=Decimal('9.00'),
+        )
+        activate_subscription({'subscription': 'sub_1', 'metadata': {
+            'user_id': member.id, 'plan_id': plan.id, 'billing_cycle': 'monthly',
+        }})
+        rebuild()
+        daily, hourly = snapshot(DailyMetrics, 'date'), snapshot(HourlyMetrics, 'hour')
+        DailyMetrics.objects.all().delete()
+        HourlyMetrics.objects.all().delete()
+
+        self.migrate(self.after)
+
+        self.assertEqual(snapshot(DailyMetrics, 'date'), daily)
+        self.assertEqual(snapshot(HourlyMetrics, 'hour'), hourly)
+        self.assertEqual(totals()['subscription_revenue'], Decimal('10.00'))
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import MetricsSeriesView
+
+urlpatterns = [
+    path('admin/series/', MetricsSeriesView.as_view(), name='metrics-series'),
+]
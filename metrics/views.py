@@ -0,0 +1,46 @@
+import datetime
+
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from .rollups import COUNTER_FIELDS, INTERVALS, series
+
+
+class MetricsSeriesView(APIView):
+    """Rollup counters over time, e.g. ?metrics=ticket_revenue&interval=day or ?metrics=new_users&interval=week."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        interval = request.query_params.get('interval', 'day')
+        if interval not in INTERVALS:
+            return Response({
+                'success': False,
+                'message': f"interval must be one of: {', '.join(INTERVALS)}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = [f for f in request.query_params.get('metrics', '').split(',') if f] or COUNTER_FIELDS
+        unknown = set(fields) - set(COUNTER_FIELDS)
+        if unknown:
+            return Response({
+                'success': False,
+                'message': f"Unknown metrics: {', '.join(sorted(unknown))}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            end = datetime.date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else datetime.date.today()
+            start = (
+                datetime.date.fromisoformat(request.query_params['start']) if 'start' in request.query_params
+                else end - datetime.timedelta(days=30)
+            )
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': "start and end must be YYYY-MM-DD dates."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Metrics retrieved successfully.',
+            'data': series(fields, start, end, interval),
+        }, status=status.HTTP_200_OK)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PrivacysafetyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'privacysafety'
+
+    def ready(self):
+        from . import signals  # noqa: F401
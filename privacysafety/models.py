@@ -1,5 +1,7 @@
 from django.db import models
 
+from core.conditional import VersionStamp
+
 class BaseContent(models.Model):
     description = models.TextField()
     last_updated = models.DateTimeField(auto_now=True)
@@ -10,6 +12,11 @@ class BaseContent(models.Model):
     def __str__(self):
         return self.description[:50]  # Return first 50 characters of description
 
+    @classmethod
+    def version_stamp(cls) -> VersionStamp:
+        """Bumped on every save/delete; lets the views answer conditional GETs without the row."""
+        return VersionStamp(f'content:{cls._meta.label_lower}')
+
 class PrivacyPolicy(BaseContent):
     pass
 
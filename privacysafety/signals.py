@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PrivacyPolicy, TermsConditions, TrustSafety
+
+
+@receiver(post_save, sender=PrivacyPolicy)
+@receiver(post_save, sender=TrustSafety)
+@receiver(post_save, sender=TermsConditions)
+@receiver(post_delete, sender=PrivacyPolicy)
+@receiver(post_delete, sender=TrustSafety)
+@receiver(post_delete, sender=TermsConditions)
+def content_changed(sender, instance, **kwargs):
+    sender.version_stamp().bump()
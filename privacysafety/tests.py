@@ -1,3 +1,37 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import PrivacyPolicy
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy = PrivacyPolicy.objects.create(description='Version one')
+        self.client = APIClient()
+
+    def test_unchanged_content_is_answered_with_304_without_queries(self):
+        response = self.client.get('/api/dicipline/privacy-policy/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            by_etag = self.client.get('/api/dicipline/privacy-policy/', HTTP_IF_NONE_MATCH=response['ETag'])
+            by_date = self.client.get(
+                '/api/dicipline/privacy-policy/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+
+        self.assertEqual((by_etag.status_code, by_date.status_code), (304, 304))
+        self.assertEqual(by_etag['ETag'], response['ETag'])
+
+    def test_saving_content_changes_the_etag(self):
+        etag = self.client.get('/api/dicipline/privacy-policy/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy.description = 'Version two'
+            self.policy.save()
+
+        response = self.client.get('/api/dicipline/privacy-policy/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['description'], 'Version two')
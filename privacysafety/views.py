@@ -10,6 +10,7 @@ from .serializers import (
     ContactFormSerializer
 )
 from account.account_permissions import IsSuperUserOrReadOnly
+from core.conditional import conditional_get, make_etag
 from rest_framework.permissions import AllowAny
 
 class SingleObjectViewMixin:
@@ -17,6 +18,26 @@ class SingleObjectViewMixin:
     def get_object(self):
         return self.queryset.first()
 
+    def get_content_stamp(self):
+        """(pk, last_updated) of the served object, cached until the content changes."""
+        return self.queryset.model.version_stamp().get(
+            lambda: self.queryset.values_list('pk', 'last_updated').first()
+        )
+
+    def get_etag(self, request):
+        stamp = self.get_content_stamp()
+        if stamp:
+            return make_etag(self.queryset.model._meta.label_lower, *stamp)
+
+    def get_last_modified(self, request):
+        stamp = self.get_content_stamp()
+        if stamp:
+            return stamp[1]
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 class PrivacyPolicyView(SingleObjectViewMixin, generics.RetrieveUpdateAPIView):
     queryset = PrivacyPolicy.objects.all()
     serializer_class = PrivacyPolicySerializer
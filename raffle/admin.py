@@ -3,7 +3,8 @@ from .models import (
     UserTicketConsolidation,
     RaffleWinner,
     UserTicketConsolidationArchive,
-    RaffleWinnerArchive
+    RaffleWinnerArchive,
+    RaffleDrawJob,
 )
 
 @admin.register(UserTicketConsolidation)
@@ -11,11 +12,7 @@ class UserTicketConsolidationAdmin(admin.ModelAdmin):
     list_display = ("email", "full_name", "user", "ticket_count", "created_at", "updated_at")
     search_fields = ("email", "full_name", "user__email")
     list_filter = ("created_at",)
-    readonly_fields = ("created_at", "updated_at")
-
-    def ticket_count(self, obj):
-        return len(obj.unique_ticket_ids)
-    ticket_count.short_description = "Ticket Count"
+    readonly_fields = ("ticket_count", "created_at", "updated_at")
 
 
 @admin.register(RaffleWinner)
@@ -60,3 +57,11 @@ class RaffleWinnerArchiveAdmin(admin.ModelAdmin):
         'winning_ticket_id',
     )
     ordering = ('-archived_at',)
+
+
+@admin.register(RaffleDrawJob)
+class RaffleDrawJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "giveaway", "strategy", "winners_count", "status", "phase", "created_at", "finished_at")
+    list_filter = ("status", "phase", "strategy")
+    readonly_fields = ("timings", "winners", "error", "created_at", "started_at", "finished_at")
+    ordering = ("-created_at",)
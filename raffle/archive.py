@@ -0,0 +1,121 @@
+# raffle/archive.py
+import hashlib
+import json
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from tickets.models import TicketEntry
+from .models import (
+    RaffleWinner,
+    RaffleWinnerArchive,
+    UserTicketConsolidation,
+    UserTicketConsolidationArchive,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 1000
+
+CONSOLIDATION_ARCHIVE_FIELDS = ['user_id', 'email', 'full_name', 'unique_ticket_ids']
+WINNER_ARCHIVE_FIELDS = ['user_id', 'email', 'full_name', 'winning_ticket_id', 'position', 'giveaway_id', 'created_at']
+
+
+class ArchiveVerificationError(Exception):
+    """An archived batch did not match its source rows; the batch was rolled back."""
+
+
+def batch_checksum(rows, fields) -> str:
+    """Order-independent digest of the archived columns of a batch."""
+    digest = hashlib.sha256()
+    for row in sorted(rows, key=lambda r: r['source_id']):
+        digest.update(json.dumps([row['source_id']] + [row[f] for f in fields], default=str).encode())
+    return digest.hexdigest()
+
+
+def archive_in_batches(source, archive_model, fields, batch_size: int = ARCHIVE_BATCH_SIZE,
+                       before_delete=None, on_batch=None) -> dict:
+    """
+    Copy `source` rows into `archive_model` and delete them, one batch per transaction.
+
+    Rows are read with values() and written with bulk_create, so no model (or
+    related object) is loaded. Each batch is checked by row count and checksum
+    against what landed in the archive before its source rows are deleted. A
+    failed run leaves earlier batches archived and the rest untouched, so
+    running it again resumes where it stopped. `on_batch()` runs inside every
+    batch's transaction, e.g. to report progress; raising from it rolls the
+    batch back and stops the run.
+    """
+    totals = {'archived': 0, 'batches': 0}
+    last_id = 0
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                source.select_for_update()
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values('id', *fields)[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            source_ids = [row['id'] for row in rows]
+            for row in rows:
+                row['source_id'] = row.pop('id')
+
+            # A batch copied by an interrupted run that could not delete its
+            # sources is not copied twice.
+            already_archived = set(
+                archive_model.objects.filter(source_id__in=source_ids).values_list('source_id', flat=True)
+            )
+            archived_at = timezone.now()
+            archive_model.objects.bulk_create(
+                [archive_model(archived_at=archived_at, **row) for row in rows if row['source_id'] not in already_archived],
+                batch_size=batch_size,
+            )
+
+            copied = list(archive_model.objects.filter(source_id__in=source_ids).values('source_id', *fields))
+            if len(copied) != len(rows) or batch_checksum(copied, fields) != batch_checksum(rows, fields):
+                logger.error(f"Archive verification failed for {archive_model.__name__} IDs {source_ids[0]}-{source_ids[-1]}.")
+                raise ArchiveVerificationError("Archiving failed. Data not deleted.")
+
+            if before_delete:
+                before_delete(rows)
+            source.filter(id__in=source_ids).delete()
+            if on_batch:
+                on_batch()
+
+        totals['archived'] += len(rows)
+        totals['batches'] += 1
+
+    logger.info(f"Archived {totals['archived']} {archive_model.__name__} rows in {totals['batches']} batches.")
+    return totals
+
+
+def _archive_consolidated_entries(rows):
+    TicketEntry.objects.consolidated().filter(
+        user_id__in=[row['user_id'] for row in rows]
+    ).update(state=TicketEntry.STATE_ARCHIVED, updated_at=timezone.now())
+
+
+def archive_consolidations(batch_size: int = ARCHIVE_BATCH_SIZE, on_batch=None) -> dict:
+    """Archive every consolidation and retire its pool entries."""
+    return archive_in_batches(
+        UserTicketConsolidation.objects.all(),
+        UserTicketConsolidationArchive,
+        CONSOLIDATION_ARCHIVE_FIELDS,
+        batch_size,
+        before_delete=_archive_consolidated_entries,
+        on_batch=on_batch,
+    )
+
+
+def archive_winners(batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    return archive_in_batches(
+        RaffleWinner.objects.all(),
+        RaffleWinnerArchive,
+        WINNER_ARCHIVE_FIELDS,
+        batch_size,
+    )
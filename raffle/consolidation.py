@@ -0,0 +1,214 @@
+# raffle/consolidation.py
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from subscription.models import SubscriptionUsage, UserSubscription
+from tickets.models import GiveawayTicket, TicketEntry, TicketPurchase
+from .models import ConsolidationWatermark, UserTicketConsolidation
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+CONSOLIDATION_CHUNK_SIZE = 500
+FREE_TICKET_SOURCES = ['subscription', 'first_time_bonus']
+WATERMARK_LAG = timedelta(minutes=5)
+
+
+def consolidation_candidates(user_ids=None):
+    """Owned entries of succeeded purchases that have not been consolidated yet."""
+    entries = TicketEntry.objects.owned().filter(purchase__payment_status='succeeded')
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    return entries
+
+
+def consolidate_tickets(user_ids=None, chunk_size: int = CONSOLIDATION_CHUNK_SIZE, entries=None) -> dict:
+    """
+    Move owned tickets into each user's consolidation, `chunk_size` users at a time.
+
+    Users are walked with keyset pagination on user_id, and every chunk runs in
+    its own short transaction, so the job can be called from a request or a
+    management command without holding locks for the whole run. `entries`
+    narrows which users are visited; each visited user is consolidated in full.
+    """
+    started_at = timezone.now()
+    totals = {'users': 0, 'tickets': 0, 'chunks': 0}
+    last_user_id = 0
+    if entries is None:
+        entries = consolidation_candidates(user_ids)
+
+    while True:
+        chunk = list(
+            entries
+            .filter(user_id__gt=last_user_id)
+            .order_by('user_id')
+            .values_list('user_id', flat=True)
+            .distinct()[:chunk_size]
+        )
+        if not chunk:
+            break
+        last_user_id = chunk[-1]
+
+        users, tickets = consolidate_chunk(chunk)
+        totals['users'] += users
+        totals['tickets'] += tickets
+        totals['chunks'] += 1
+
+    totals['started_at'] = started_at
+    logger.info(
+        f"Consolidated {totals['tickets']} tickets for {totals['users']} users "
+        f"in {totals['chunks']} chunks."
+    )
+    return totals
+
+
+def rebuild_consolidations(chunk_size: int = CONSOLIDATION_CHUNK_SIZE) -> dict:
+    """Full pass over every pending ticket; also resets the incremental watermarks."""
+    result = consolidate_tickets(chunk_size=chunk_size)
+    for giveaway in GiveawayTicket.objects.filter(is_active=True):
+        ConsolidationWatermark.objects.update_or_create(
+            giveaway=giveaway,
+            defaults={'processed_until': result['started_at'], 'last_full_rebuild_at': result['started_at']},
+        )
+    return result
+
+
+def consolidate_incremental(user_ids=None, chunk_size: int = CONSOLIDATION_CHUNK_SIZE) -> dict:
+    """
+    Consolidate only the entries issued since each active giveaway's watermark.
+
+    The scan starts WATERMARK_LAG before the watermark so entries committed late
+    by a slow transaction are still seen; rescanning them is harmless because
+    only owned entries are picked up. Yearly subscribers with free tickets
+    still held back are visited too, so each run releases their next slice.
+    A giveaway without a watermark gets a full pass. The watermark is only
+    written when a run advances it, and runs scoped to `user_ids` never do.
+    """
+    started_at = timezone.now()
+    totals = {'users': 0, 'tickets': 0, 'chunks': 0}
+    watermarks = dict(
+        ConsolidationWatermark.objects.filter(giveaway__is_active=True).values_list('giveaway_id', 'processed_until')
+    )
+
+    for giveaway in GiveawayTicket.objects.filter(is_active=True):
+        processed_until = watermarks.get(giveaway.id)
+        entries = consolidation_candidates(user_ids).filter(giveaway=giveaway)
+        if processed_until:
+            entries = entries.filter(
+                Q(created_at__gte=processed_until - WATERMARK_LAG) | Q(
+                    source__in=FREE_TICKET_SOURCES,
+                    user__subscription__is_active=True,
+                    user__subscription__billing_cycle='yearly',
+                )
+            )
+
+        result = consolidate_tickets(user_ids, chunk_size, entries=entries)
+        for key in totals:
+            totals[key] += result[key]
+
+        if user_ids is None and (processed_until is None or result['tickets']):
+            ConsolidationWatermark.objects.update_or_create(
+                giveaway=giveaway, defaults={'processed_until': started_at}
+            )
+
+    totals['started_at'] = started_at
+    return totals
+
+
+@transaction.atomic
+def consolidate_chunk(user_ids) -> tuple:
+    """Consolidate one chunk of users with set-based updates in one short transaction."""
+    now = timezone.now()
+    subscriptions = {
+        sub.user_id: sub
+        for sub in UserSubscription.objects.filter(user_id__in=user_ids, is_active=True).select_related('plan')
+    }
+    yearly_user_ids = [uid for uid, sub in subscriptions.items() if sub.billing_cycle == 'yearly']
+    candidates = consolidation_candidates(user_ids)
+
+    # Yearly free tickets are released a slice at a time: the first
+    # max(n // 12, 1) remaining tickets of each free purchase.
+    sliced_purchase_ids = []
+    sliced_entry_ids = []
+    if yearly_user_ids:
+        free_yearly = candidates.filter(user_id__in=yearly_user_ids, source__in=FREE_TICKET_SOURCES)
+        for row in free_yearly.values('purchase_id').annotate(remaining=Count('id')):
+            sliced_purchase_ids.append(row['purchase_id'])
+            sliced_entry_ids.extend(
+                free_yearly.filter(purchase_id=row['purchase_id'])
+                .order_by('id')
+                .values_list('id', flat=True)[:max(row['remaining'] // 12, 1)]
+            )
+
+    released_in_full = candidates.exclude(purchase_id__in=sliced_purchase_ids)
+    released_slices = candidates.filter(id__in=sliced_entry_ids)
+
+    per_user = defaultdict(int)
+    purchase_ids = set()
+    for queryset in (released_in_full, released_slices):
+        for row in queryset.values('user_id', 'purchase_id').annotate(count=Count('id')):
+            per_user[row['user_id']] += row['count']
+            purchase_ids.add(row['purchase_id'])
+
+    if not per_user:
+        return 0, 0
+
+    released_in_full.update(state=TicketEntry.STATE_CONSOLIDATED, updated_at=now)
+    released_slices.update(state=TicketEntry.STATE_CONSOLIDATED, updated_at=now)
+
+    # Mirror the remaining ticket IDs back onto the purchases' JSON column.
+    remaining = defaultdict(list)
+    for purchase_id, ticket_id in (
+        TicketEntry.objects.owned()
+        .filter(purchase_id__in=sliced_purchase_ids)
+        .order_by('id')
+        .values_list('purchase_id', 'ticket_id')
+    ):
+        remaining[purchase_id].append(ticket_id)
+    TicketPurchase.objects.bulk_update(
+        [TicketPurchase(id=pid, unique_ticket_ids=remaining[pid]) for pid in purchase_ids],
+        ['unique_ticket_ids'],
+        batch_size=1000,
+    )
+
+    consolidated = defaultdict(list)
+    for user_id, ticket_id in (
+        TicketEntry.objects.consolidated()
+        .filter(user_id__in=per_user.keys())
+        .order_by('id')
+        .values_list('user_id', 'ticket_id')
+    ):
+        consolidated[user_id].append(ticket_id)
+
+    UserTicketConsolidation.objects.bulk_create(
+        [
+            UserTicketConsolidation(
+                user_id=row['id'],
+                email=row['email'],
+                full_name=row['full_name'],
+                unique_ticket_ids=consolidated[row['id']],
+                ticket_count=len(consolidated[row['id']]),
+            )
+            for row in User.objects.filter(id__in=per_user.keys()).values('id', 'email', 'full_name')
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['email', 'full_name', 'unique_ticket_ids', 'ticket_count', 'updated_at'],
+    )
+
+    # Usage lands in the subscription's current period row; a new month (or
+    # subscription year) is a new key, so nothing needs resetting.
+    today = now.date()
+    SubscriptionUsage.objects.record(
+        (subscriptions[user_id].id, subscriptions[user_id].current_period_start(today), used)
+        for user_id, used in per_user.items()
+        if user_id in subscriptions
+    )
+
+    return len(per_user), sum(per_user.values())
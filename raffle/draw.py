@@ -0,0 +1,197 @@
+# raffle/draw.py
+import secrets
+from array import array
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+
+from tickets.models import TicketEntry
+from .models import UserTicketConsolidation
+
+User = get_user_model()
+
+_sysrandom = secrets.SystemRandom()
+
+STRATEGY_TICKET = 'ticket'
+STRATEGY_WEIGHTED = 'weighted'
+DRAW_STRATEGIES = (STRATEGY_TICKET, STRATEGY_WEIGHTED)
+
+
+def eligible_entries():
+    """Tickets currently in the draw pool, in a stable (indexed) order."""
+    return TicketEntry.objects.consolidated().order_by('id')
+
+
+def sample_ordinals(population: int, k: int) -> list:
+    """
+    Pick `k` distinct ordinals from range(population) using the OS CSPRNG.
+
+    The range is never materialized: sampling keeps only the picked ordinals,
+    so cost is O(k) regardless of the pool size. The returned order is itself
+    uniformly random and is used as the prize order.
+    """
+    return _sysrandom.sample(range(population), min(k, population))
+
+
+def resolve_ordinals(entries, ordinals) -> dict:
+    """
+    Map pool ordinals to their entries in one forward keyset walk.
+
+    The ordinals are visited in ascending order and each lookup starts after
+    the previous hit (`id > last_id`), skipping only the gap between them, so
+    a whole draw reads the index at most once instead of once per winner.
+    Ordinals past the end of `entries` are left out of the result.
+    """
+    resolved = {}
+    last_id = None
+    position = 0
+    for ordinal in sorted(set(ordinals)):
+        rows = entries if last_id is None else entries.filter(id__gt=last_id)
+        gap = ordinal - position
+        entry = rows.values('id', 'ticket_id', 'user_id')[gap:gap + 1].first()
+        if entry is None:
+            break
+        resolved[ordinal] = entry
+        last_id = entry['id']
+        position = ordinal + 1
+    return resolved
+
+
+def draw_winning_entries(winners_count: int, strategy: str = STRATEGY_TICKET,
+                         one_prize_per_user: bool = False) -> list:
+    """
+    Draw up to `winners_count` distinct tickets from the pool.
+
+    `ticket` samples pool ordinals directly; `weighted` samples over per-user
+    ticket counts. Both give every ticket the same chance of winning.
+    """
+    if strategy not in DRAW_STRATEGIES:
+        raise ValueError(f"Unknown draw strategy '{strategy}'. Use one of: {', '.join(DRAW_STRATEGIES)}.")
+    if strategy == STRATEGY_WEIGHTED:
+        return draw_weighted_entries(winners_count, one_prize_per_user)
+    if one_prize_per_user:
+        raise ValueError("one_prize_per_user is only supported by the 'weighted' draw strategy.")
+
+    population = eligible_entries().count()
+    if population == 0:
+        return []
+
+    ordinals = sample_ordinals(population, winners_count)
+    resolved = resolve_ordinals(eligible_entries(), ordinals)
+    if len(resolved) != len(ordinals):
+        raise RuntimeError("Eligible ticket pool changed during the draw.")
+    return [resolved[ordinal] for ordinal in ordinals]
+
+
+class CumulativeWeights:
+    """
+    Prefix sums of per-user ticket counts, kept in a Fenwick tree.
+
+    Users cost one 64-bit integer each, whatever their ticket count. Lookups
+    binary-search the cumulative counts in O(log n), and a user's weight can be
+    removed in O(log n) without rebuilding the sums.
+    """
+
+    def __init__(self, weights):
+        size = len(weights)
+        tree = array('q', bytes(8 * (size + 1)))
+        for i in range(1, size + 1):
+            tree[i] += weights[i - 1]
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._size = size
+        self._weights = weights
+        self.total = sum(weights)
+
+    def remove(self, index: int):
+        """Drop the whole weight at `index` from every prefix sum."""
+        weight = self._weights[index]
+        if not weight:
+            return
+        self._weights[index] = 0
+        self.total -= weight
+        i = index + 1
+        while i <= self._size:
+            self._tree[i] -= weight
+            i += i & -i
+
+    def find(self, target: int):
+        """Return (index, offset) of the slot whose cumulative range holds `target`."""
+        pos = 0
+        step = 1 << self._size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return pos, target
+
+
+def draw_weighted_entries(winners_count: int, one_prize_per_user: bool = False) -> list:
+    """
+    Draw tickets by walking cumulative per-user ticket counts.
+
+    A global ticket ordinal maps to exactly one (user, offset) pair, so drawing
+    distinct ordinals is the same as drawing distinct tickets uniformly. With
+    `one_prize_per_user`, a winner's weight is removed before the next prize,
+    which matches discarding the rest of their tickets - no rejection loop.
+    """
+    user_ids = array('q')
+    counts = array('q')
+    rows = (
+        UserTicketConsolidation.objects
+        .filter(ticket_count__gt=0)
+        .order_by('user_id')
+        .values_list('user_id', 'ticket_count')
+    )
+    for user_id, ticket_count in rows.iterator(chunk_size=2000):
+        user_ids.append(user_id)
+        counts.append(ticket_count)
+
+    weights = CumulativeWeights(counts)
+    if weights.total == 0:
+        return []
+
+    if one_prize_per_user:
+        slots = []
+        for _ in range(min(winners_count, len(user_ids))):
+            index, offset = weights.find(secrets.randbelow(weights.total))
+            slots.append((index, offset))
+            weights.remove(index)
+    else:
+        slots = [weights.find(ordinal) for ordinal in sample_ordinals(weights.total, winners_count)]
+
+    offsets_by_user = defaultdict(list)
+    for index, offset in slots:
+        offsets_by_user[user_ids[index]].append(offset)
+    resolved = {
+        user_id: resolve_ordinals(eligible_entries().filter(user_id=user_id), offsets)
+        for user_id, offsets in offsets_by_user.items()
+    }
+
+    picks = []
+    for index, offset in slots:
+        entry = resolved[user_ids[index]].get(offset)
+        if entry is None:
+            raise RuntimeError("Consolidated ticket counts are out of sync with the ticket pool.")
+        picks.append(entry)
+    return picks
+
+
+def winner_contacts(user_ids) -> dict:
+    """Email and full name for each winning user, as stored on their consolidation."""
+    user_ids = set(user_ids)
+    contacts = {
+        row['user_id']: row
+        for row in UserTicketConsolidation.objects
+        .filter(user_id__in=user_ids)
+        .values('user_id', 'email', 'full_name')
+    }
+    missing = user_ids - contacts.keys()
+    if missing:
+        for row in User.objects.filter(id__in=missing).values('id', 'email', 'full_name'):
+            contacts[row['id']] = {'user_id': row['id'], 'email': row['email'], 'full_name': row['full_name']}
+    return contacts
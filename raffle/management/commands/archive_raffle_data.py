@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from raffle.archive import ARCHIVE_BATCH_SIZE, archive_consolidations, archive_winners
+
+
+class Command(BaseCommand):
+    help = "Archive ticket consolidations and/or raffle winners in verified batches (safe to re-run)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consolidations', action='store_true', help="Archive ticket consolidations")
+        parser.add_argument('--winners', action='store_true', help="Archive raffle winners")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help="Rows moved per transaction")
+
+    def handle(self, *args, **options):
+        if not options['consolidations'] and not options['winners']:
+            raise CommandError("Pass --consolidations, --winners or both.")
+
+        if options['consolidations']:
+            result = archive_consolidations(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {result['archived']} consolidations in {result['batches']} batches."
+            ))
+        if options['winners']:
+            result = archive_winners(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {result['archived']} winners in {result['batches']} batches."
+            ))
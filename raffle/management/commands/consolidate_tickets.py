@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from raffle.consolidation import (
+    CONSOLIDATION_CHUNK_SIZE,
+    consolidate_incremental,
+    consolidate_tickets,
+    rebuild_consolidations,
+)
+
+
+class Command(BaseCommand):
+    help = "Consolidate owned raffle tickets into per-user consolidations in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CONSOLIDATION_CHUNK_SIZE,
+                            help="Number of users consolidated per transaction")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only consolidate this user ID (repeatable)")
+        parser.add_argument('--incremental', action='store_true',
+                            help="Only merge entries issued since each active giveaway's watermark")
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            result = consolidate_incremental(user_ids=options['user_ids'], chunk_size=options['chunk_size'])
+        elif options['user_ids']:
+            result = consolidate_tickets(user_ids=options['user_ids'], chunk_size=options['chunk_size'])
+        else:
+            result = rebuild_consolidations(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Consolidated {result['tickets']} tickets for {result['users']} users "
+            f"in {result['chunks']} chunks."
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from raffle.tasks import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued raffle draw jobs (polls the job table until stopped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the queue once and exit")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_pending_jobs()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"Ran {processed} raffle draw job(s)."))
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+def backfill_ticket_count(apps, schema_editor):
+    UserTicketConsolidation = apps.get_model('raffle', 'UserTicketConsolidation')
+    batch = []
+    for consolidation in UserTicketConsolidation.objects.only('id', 'unique_ticket_ids').iterator():
+        consolidation.ticket_count = len(consolidation.unique_ticket_ids or [])
+        batch.append(consolidation)
+        if len(batch) >= 1000:
+            UserTicketConsolidation.objects.bulk_update(batch, ['ticket_count'])
+            batch = []
+    if batch:
+        UserTicketConsolidation.objects.bulk_update(batch, ['ticket_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0003_alter_rafflewinner_position_rafflewinnerarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userticketconsolidation',
+            name='ticket_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ticket_count, migrations.RunPython.noop),
+    ]
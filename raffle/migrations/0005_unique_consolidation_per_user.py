@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:23
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_consolidations(apps, schema_editor):
+    UserTicketConsolidation = apps.get_model('raffle', 'UserTicketConsolidation')
+    duplicated = (
+        UserTicketConsolidation.objects.values('user_id')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .values_list('user_id', flat=True)
+    )
+    for user_id in duplicated:
+        rows = list(UserTicketConsolidation.objects.filter(user_id=user_id).order_by('-updated_at'))
+        keep, extra = rows[0], rows[1:]
+        ticket_ids = list(dict.fromkeys(
+            ticket_id for row in rows for ticket_id in (row.unique_ticket_ids or [])
+        ))
+        keep.unique_ticket_ids = ticket_ids
+        keep.ticket_count = len(ticket_ids)
+        keep.save(update_fields=['unique_ticket_ids', 'ticket_count'])
+        UserTicketConsolidation.objects.filter(id__in=[row.id for row in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0004_userticketconsolidation_ticket_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_consolidations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userticketconsolidation',
+            constraint=models.UniqueConstraint(fields=('user',), name='unique_consolidation_per_user'),
+        ),
+    ]
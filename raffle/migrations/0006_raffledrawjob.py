@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0005_unique_consolidation_per_user'),
+        ('tickets', '0007_ticketentry_state_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RaffleDrawJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('winners_count', models.PositiveIntegerField(default=3)),
+                ('strategy', models.CharField(default='ticket', max_length=20)),
+                ('one_prize_per_user', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('phase', models.CharField(choices=[('queued', 'Queued'), ('sampling', 'Sampling'), ('persisting_winners', 'Persisting winners'), ('archiving', 'Archiving'), ('notifying', 'Notifying'), ('done', 'Done')], default='queued', max_length=30)),
+                ('timings', models.JSONField(blank=True, default=dict, help_text='Seconds spent in each phase')),
+                ('winners', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('giveaway', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='draw_jobs', to='tickets.giveawayticket')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Raffle Draw Job',
+                'verbose_name_plural': 'Raffle Draw Jobs',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='raffle_raff_status_68084c_idx')],
+            },
+        ),
+    ]
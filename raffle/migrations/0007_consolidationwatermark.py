@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0006_raffledrawjob'),
+        ('tickets', '0008_ticketentry_giveaway_state_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsolidationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processed_until', models.DateTimeField(blank=True, null=True)),
+                ('last_full_rebuild_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('giveaway', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='consolidation_watermark', to='tickets.giveawayticket')),
+            ],
+            options={
+                'verbose_name': 'Consolidation Watermark',
+                'verbose_name_plural': 'Consolidation Watermarks',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0007_consolidationwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rafflewinnerarchive',
+            name='source_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userticketconsolidationarchive',
+            name='source_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('raffle', '0008_archive_source_id'),
+        ('tickets', '0012_ticketpurchase_stripe_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='raffledrawjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='raffledrawjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Refreshed by the worker at every phase', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='raffledrawjob',
+            index=models.Index(fields=['status', 'heartbeat_at'], name='raffle_raff_status_205086_idx'),
+        ),
+    ]
@@ -11,12 +11,16 @@ class UserTicketConsolidation(models.Model):
     email = models.EmailField()
     full_name = models.CharField(max_length=255)
     unique_ticket_ids = models.JSONField(default=list)
+    ticket_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "User Ticket Consolidation"
         verbose_name_plural = "User Ticket Consolidations"
+        constraints = [
+            models.UniqueConstraint(fields=['user'], name='unique_consolidation_per_user'),
+        ]
         indexes = [
             models.Index(fields=['user', 'email']),
             models.Index(fields=['created_at']),
@@ -53,6 +57,21 @@ class RaffleWinner(models.Model):
         return f"{self.position} winner: {self.email} (Ticket: {self.winning_ticket_id})"
 
 
+class ConsolidationWatermark(models.Model):
+    """How far incremental consolidation has processed a giveaway's ticket entries."""
+    giveaway = models.OneToOneField(GiveawayTicket, on_delete=models.CASCADE, related_name="consolidation_watermark")
+    processed_until = models.DateTimeField(null=True, blank=True)
+    last_full_rebuild_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Consolidation Watermark"
+        verbose_name_plural = "Consolidation Watermarks"
+
+    def __str__(self):
+        return f"{self.giveaway} consolidated until {self.processed_until}"
+
+
 class UserTicketConsolidationArchive(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     email = models.EmailField()
@@ -60,6 +79,8 @@ class UserTicketConsolidationArchive(models.Model):
     
     unique_ticket_ids = models.JSONField(default=list)
     archived_at = models.DateTimeField(auto_now_add=True)
+    # ID of the consolidation this row was copied from; used to verify and resume archiving.
+    source_id = models.BigIntegerField(null=True, blank=True, db_index=True)
 
     class Meta:
         verbose_name = "User Ticket Consolidation Archive"
@@ -81,6 +102,8 @@ class RaffleWinnerArchive(models.Model):
 
     created_at = models.DateTimeField()
     archived_at = models.DateTimeField(default=timezone.now)
+    # ID of the winner this row was copied from; used to verify and resume archiving.
+    source_id = models.BigIntegerField(null=True, blank=True, db_index=True)
 
     class Meta:
         indexes = [models.Index(fields=['position', 'giveaway'])]
@@ -89,3 +112,64 @@ class RaffleWinnerArchive(models.Model):
 
     def __str__(self):
         return f"{self.position} (Archived) winner: {self.email} (Ticket: {self.winning_ticket_id})"
+
+
+
+class RaffleDrawJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    PHASE_QUEUED = 'queued'
+    PHASE_SAMPLING = 'sampling'
+    PHASE_PERSISTING_WINNERS = 'persisting_winners'
+    PHASE_ARCHIVING = 'archiving'
+    PHASE_NOTIFYING = 'notifying'
+    PHASE_DONE = 'done'
+
+    PHASE_CHOICES = [
+        (PHASE_QUEUED, 'Queued'),
+        (PHASE_SAMPLING, 'Sampling'),
+        (PHASE_PERSISTING_WINNERS, 'Persisting winners'),
+        (PHASE_ARCHIVING, 'Archiving'),
+        (PHASE_NOTIFYING, 'Notifying'),
+        (PHASE_DONE, 'Done'),
+    ]
+
+    giveaway = models.ForeignKey(GiveawayTicket, on_delete=models.CASCADE, related_name="draw_jobs")
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    winners_count = models.PositiveIntegerField(default=3)
+    strategy = models.CharField(max_length=20, default='ticket')
+    one_prize_per_user = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    phase = models.CharField(max_length=30, choices=PHASE_CHOICES, default=PHASE_QUEUED)
+    timings = models.JSONField(default=dict, blank=True, help_text="Seconds spent in each phase")
+    winners = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    attempts = models.PositiveIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Refreshed by the worker at every phase")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Raffle Draw Job"
+        verbose_name_plural = "Raffle Draw Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'heartbeat_at']),
+        ]
+
+    def __str__(self):
+        return f"Draw job #{self.pk} ({self.status}/{self.phase})"
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TicketIdCursorPagination(CursorPagination):
+    """Keyset pagination over the ticket pool; pages stay cheap at any depth."""
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+    ordering = 'id'
@@ -1,11 +1,11 @@
 from rest_framework import serializers
-from .models import UserTicketConsolidation, RaffleWinner, UserTicketConsolidationArchive, RaffleWinnerArchive
+from .models import UserTicketConsolidation, RaffleWinner, UserTicketConsolidationArchive, RaffleWinnerArchive, RaffleDrawJob
 
 
 class UserTicketConsolidationSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserTicketConsolidation
-        fields = ['id', 'email', 'full_name', 'unique_ticket_ids', 'created_at', 'updated_at']
+        fields = ['id', 'email', 'full_name', 'unique_ticket_ids', 'ticket_count', 'created_at', 'updated_at']
         
         
 class RaffleWinnerSerializer(serializers.ModelSerializer):
@@ -37,3 +37,26 @@ class RaffleWinnerArchiveSerializer(serializers.ModelSerializer):
             'archived_at',
         ]
         read_only_fields = fields
+
+
+class RaffleDrawJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RaffleDrawJob
+        fields = [
+            'id',
+            'giveaway',
+            'winners_count',
+            'strategy',
+            'one_prize_per_user',
+            'status',
+            'phase',
+            'timings',
+            'winners',
+            'error',
+            'created_at',
+            'started_at',
+            'heartbeat_at',
+            'finished_at',
+            'attempts',
+        ]
+        read_only_fields = fields
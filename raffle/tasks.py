@@ -0,0 +1,217 @@
+# raffle/tasks.py
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .draw import draw_winning_entries
+from .models import RaffleDrawJob, RaffleWinner
+from .serializers import RaffleWinnerSerializer
+from .utils import (
+    archive_and_clear_user_ticket_consolidation,
+    get_active_giveaway,
+    persist_raffle_winners,
+    send_winner_congratulation_email,
+)
+
+logger = logging.getLogger(__name__)
+
+# A running job whose worker has not checked in (at a phase change or after an
+# archive batch) within this window is considered abandoned, e.g. the worker
+# was killed.
+STALE_JOB_TIMEOUT = timedelta(minutes=30)
+# Abandoned jobs are re-queued to resume from their phase this many times.
+MAX_JOB_ATTEMPTS = 3
+
+# Winners are committed together with the move to ARCHIVING, so a job found in
+# one of these phases already has its winners and must not draw again.
+WINNERS_SAVED_PHASES = (RaffleDrawJob.PHASE_ARCHIVING, RaffleDrawJob.PHASE_NOTIFYING, RaffleDrawJob.PHASE_DONE)
+
+
+class JobLost(RuntimeError):
+    """The job was re-queued and claimed again after this worker went quiet."""
+
+
+def enqueue_raffle_draw(giveaway, winners_count: int, strategy: str, one_prize_per_user: bool,
+                        requested_by=None) -> RaffleDrawJob:
+    """Queue a raffle draw for the worker and return the job to poll."""
+    job = RaffleDrawJob.objects.create(
+        giveaway=giveaway,
+        requested_by=requested_by,
+        winners_count=winners_count,
+        strategy=strategy,
+        one_prize_per_user=one_prize_per_user,
+    )
+    logger.info(f"Queued raffle draw job #{job.pk} for Giveaway ID: {giveaway.pk}")
+    return job
+
+
+def claim_next_job():
+    """
+    Claim the oldest queued job, or return None.
+
+    SKIP LOCKED lets several workers poll the same table, and the conditional
+    status update makes the claim safe on databases that ignore row locks.
+    Every claim bumps `attempts`, which fences off a previous worker that
+    may still be running the same job.
+    """
+    with transaction.atomic():
+        job = (
+            RaffleDrawJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=RaffleDrawJob.STATUS_QUEUED)
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = RaffleDrawJob.objects.filter(pk=job.pk, status=RaffleDrawJob.STATUS_QUEUED).update(
+            status=RaffleDrawJob.STATUS_RUNNING,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def recover_stale_jobs() -> dict:
+    """Re-queue running jobs whose heartbeat expired, or fail them once out of attempts."""
+    now = timezone.now()
+    stale = RaffleDrawJob.objects.filter(
+        status=RaffleDrawJob.STATUS_RUNNING, heartbeat_at__lt=now - STALE_JOB_TIMEOUT
+    )
+    failed = stale.filter(attempts__gte=MAX_JOB_ATTEMPTS).update(
+        status=RaffleDrawJob.STATUS_FAILED,
+        error='Worker stopped before the draw finished.',
+        finished_at=now,
+    )
+    requeued = stale.update(status=RaffleDrawJob.STATUS_QUEUED)
+    if failed or requeued:
+        logger.warning(f"Stale raffle draw jobs: {requeued} re-queued, {failed} failed.")
+    return {'requeued': requeued, 'failed': failed}
+
+
+def _update_owned(job, **fields):
+    """Write to the job only while this worker's claim is still the current one."""
+    updated = RaffleDrawJob.objects.filter(
+        pk=job.pk, status=RaffleDrawJob.STATUS_RUNNING, attempts=job.attempts
+    ).update(**fields)
+    if not updated:
+        raise JobLost(f"Raffle draw job #{job.pk} was claimed by another worker.")
+
+
+def _beat(job):
+    _update_owned(job, heartbeat_at=timezone.now())
+
+
+def _enter_phase(job, phase):
+    job.phase = phase
+    _update_owned(job, phase=phase, timings=job.timings, winners=job.winners, heartbeat_at=timezone.now())
+
+
+def _saved_winners(job):
+    ticket_ids = [winner['winning_ticket_id'] for winner in job.winners]
+    winners = {
+        winner.winning_ticket_id: winner
+        for winner in RaffleWinner.objects.filter(giveaway_id=job.giveaway_id, winning_ticket_id__in=ticket_ids)
+        .select_related('giveaway')
+    }
+    return [winners[ticket_id] for ticket_id in ticket_ids]
+
+
+def run_raffle_draw_job(job: RaffleDrawJob) -> RaffleDrawJob:
+    """
+    Run a claimed job phase by phase, recording the current phase and its timing.
+
+    Winners are saved in one short transaction and archiving commits batch by
+    batch, so the slow parts never hold locks on the winner or ticket tables.
+    The winners commit together with the move to the archiving phase: a job
+    resumed after a crash either draws afresh (nothing was saved) or carries
+    on from archiving with the saved winners, never drawing twice. Likewise the
+    winner emails go to the outbox in the transaction that moves the job to
+    DONE, so they are queued exactly once.
+    """
+    resumed = job.phase in WINNERS_SAVED_PHASES
+    if resumed:
+        phase = job.phase
+        logger.info(f"Resuming raffle draw job #{job.pk} at {phase} (attempt {job.attempts}).")
+    else:
+        job.timings[RaffleDrawJob.PHASE_QUEUED] = round((job.started_at - job.created_at).total_seconds(), 4)
+        phase = RaffleDrawJob.PHASE_SAMPLING
+    phase_started = time.monotonic()
+
+    def finish_phase(next_phase):
+        nonlocal phase, phase_started
+        now = time.monotonic()
+        job.timings[phase] = round(now - phase_started, 4)
+        phase, phase_started = next_phase, now
+        _enter_phase(job, next_phase)
+
+    try:
+        _enter_phase(job, phase)
+        giveaway = get_active_giveaway(job.giveaway_id)
+        if resumed:
+            winners = _saved_winners(job)
+        else:
+            picks = draw_winning_entries(job.winners_count, job.strategy, job.one_prize_per_user)
+            if not picks:
+                raise ValueError("No eligible tickets found for raffle draw.")
+
+            finish_phase(RaffleDrawJob.PHASE_PERSISTING_WINNERS)
+            with transaction.atomic():
+                winners = persist_raffle_winners(giveaway, picks)
+                job.winners = RaffleWinnerSerializer(winners, many=True).data
+                finish_phase(RaffleDrawJob.PHASE_ARCHIVING)
+
+        if phase == RaffleDrawJob.PHASE_ARCHIVING:
+            archive_and_clear_user_ticket_consolidation(on_batch=lambda: _beat(job))
+            finish_phase(RaffleDrawJob.PHASE_NOTIFYING)
+
+        if phase == RaffleDrawJob.PHASE_NOTIFYING:
+            with transaction.atomic():
+                for winner in winners:
+                    send_winner_congratulation_email(winner)
+                finish_phase(RaffleDrawJob.PHASE_DONE)
+
+        job.status = RaffleDrawJob.STATUS_SUCCEEDED
+        logger.info(f"Raffle draw job #{job.pk} selected {len(winners)} winners: {job.timings}")
+
+    except JobLost:
+        logger.warning(f"Raffle draw job #{job.pk} was taken over during {phase}; stopping.")
+        return job
+
+    except Exception as e:
+        job.timings[phase] = round(time.monotonic() - phase_started, 4)
+        job.status = RaffleDrawJob.STATUS_FAILED
+        job.error = str(e) or e.__class__.__name__
+        logger.exception(f"Raffle draw job #{job.pk} failed during {phase}: {e}")
+
+    job.finished_at = timezone.now()
+    try:
+        _update_owned(
+            job, status=job.status, phase=job.phase, timings=job.timings, winners=job.winners,
+            error=job.error, finished_at=job.finished_at,
+        )
+    except JobLost:
+        logger.warning(f"Raffle draw job #{job.pk} was taken over before it could finish.")
+    return job
+
+
+def run_pending_jobs(limit=None) -> int:
+    """Run queued jobs until the queue is empty (or `limit` jobs ran)."""
+    recover_stale_jobs()
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_raffle_draw_job(job)
+        processed += 1
+    return processed
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import datetime
+import random
+from array import array
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mailer.models import OutboundEmail
+from subscription.models import SubscriptionPlan, UserSubscription
+from tickets.models import GiveawayTicket, TicketEntry, TicketPurchase
+from tickets.ticket_ids import allocate_ticket_ids
+from . import tasks
+from .archive import ArchiveVerificationError, archive_consolidations
+from .consolidation import consolidate_incremental, consolidate_tickets
+from .draw import (
+    STRATEGY_WEIGHTED, CumulativeWeights, draw_winning_entries, eligible_entries, resolve_ordinals, sample_ordinals,
+)
+from .models import (
+    ConsolidationWatermark, RaffleDrawJob, RaffleWinner, UserTicketConsolidation, UserTicketConsolidationArchive,
+)
+from .tasks import (
+    MAX_JOB_ATTEMPTS, STALE_JOB_TIMEOUT, claim_next_job, enqueue_raffle_draw, recover_stale_jobs,
+    run_raffle_draw_job,
+)
+from .utils import run_raffle_draw
+
+User = get_user_model()
+
+
+def create_pool(ticket_counts):
+    """One consolidated user per count, each with that many pool tickets; returns the users."""
+    giveaway = GiveawayTicket.objects.create(
+        title="Pool", price=5, total_available=0,
+        ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+    )
+    users = []
+    for i, count in enumerate(ticket_counts):
+        user = User.objects.create_user(f'entrant{i}@example.com', full_name=f'Entrant {i}')
+        ticket_ids = [f'T{i:03d}{n:06d}' for n in range(count)]
+        TicketEntry.objects.bulk_create([
+            TicketEntry(ticket_id=ticket_id, user=user, giveaway=giveaway, state=TicketEntry.STATE_CONSOLIDATED)
+            for ticket_id in ticket_ids
+        ])
+        UserTicketConsolidation.objects.create(
+            user=user, email=user.email, full_name=user.full_name,
+            unique_ticket_ids=ticket_ids, ticket_count=count,
+        )
+        users.append(user)
+    return users
+
+
+class TicketDrawTests(TestCase):
+
+    def test_sample_ordinals_are_distinct_and_in_range(self):
+        for population, k in [(1, 1), (10, 10), (1000, 25), (5, 9)]:
+            ordinals = sample_ordinals(population, k)
+            self.assertEqual(len(ordinals), min(population, k))
+            self.assertEqual(len(set(ordinals)), len(ordinals))
+            self.assertTrue(all(0 <= ordinal < population for ordinal in ordinals))
+
+    def test_resolve_ordinals_matches_pool_order(self):
+        create_pool([3, 4, 5])
+        pool = list(eligible_entries().values_list('ticket_id', flat=True))
+
+        resolved = resolve_ordinals(eligible_entries(), [11, 0, 5, 6, 12])
+
+        self.assertEqual({o: e['ticket_id'] for o, e in resolved.items()},
+                         {0: pool[0], 5: pool[5], 6: pool[6], 11: pool[11]})
+
+    def test_ticket_draw_picks_distinct_pool_tickets(self):
+        create_pool([3, 4, 5])
+
+        with self.assertNumQueries(1 + 12):
+            picks = draw_winning_entries(20)
+
+        self.assertEqual(len(picks), 12)
+        self.assertEqual(len({pick['ticket_id'] for pick in picks}), 12)
+
+    def test_ticket_draw_rejects_one_prize_per_user(self):
+        with self.assertRaises(ValueError):
+            draw_winning_entries(1, one_prize_per_user=True)
+
+
+class CumulativeWeightsTests(TestCase):
+    WEIGHTS = [3, 0, 5, 1, 7, 2]
+
+    def test_find_maps_every_ordinal_to_its_slot(self):
+        weights = CumulativeWeights(array('q', self.WEIGHTS))
+        expected = [(index, offset) for index, weight in enumerate(self.WEIGHTS) for offset in range(weight)]
+
+        self.assertEqual(weights.total, sum(self.WEIGHTS))
+        self.assertEqual([weights.find(ordinal) for ordinal in range(weights.total)], expected)
+
+    def test_removed_weight_is_never_found_again(self):
+        weights = CumulativeWeights(array('q', self.WEIGHTS))
+        weights.remove(4)
+        weights.remove(4)
+
+        self.assertEqual(weights.total, sum(self.WEIGHTS) - 7)
+        found = {weights.find(ordinal)[0] for ordinal in range(weights.total)}
+        self.assertEqual(found, {0, 2, 3, 5})
+
+        # Sampling without replacement: removing each hit empties the tree in len(non-zero) draws.
+        rng = random.Random(7)
+        drawn = []
+        while weights.total:
+            index, _ = weights.find(rng.randrange(weights.total))
+            drawn.append(index)
+            weights.remove(index)
+        self.assertEqual(sorted(drawn), [0, 2, 3, 5])
+
+    def test_seeded_draws_follow_the_weights(self):
+        weights = CumulativeWeights(array('q', self.WEIGHTS))
+        rng = random.Random(2024)
+        draws = 18000
+
+        hits = Counter(weights.find(rng.randrange(weights.total))[0] for _ in range(draws))
+
+        for index, weight in enumerate(self.WEIGHTS):
+            self.assertAlmostEqual(hits[index] / draws, weight / weights.total, delta=0.02)
+
+
+class WeightedDrawTests(TestCase):
+
+    def test_one_prize_per_user(self):
+        users = create_pool([50, 1, 2, 3])
+
+        picks = draw_winning_entries(10, STRATEGY_WEIGHTED, one_prize_per_user=True)
+
+        self.assertEqual(sorted(pick['user_id'] for pick in picks), sorted(user.id for user in users))
+
+    def test_out_of_sync_counts_are_an_error(self):
+        users = create_pool([2, 2])
+        UserTicketConsolidation.objects.filter(user=users[0]).update(ticket_count=40)
+
+        with self.assertRaisesMessage(RuntimeError, "out of sync"):
+            draw_winning_entries(30, STRATEGY_WEIGHTED)
+
+
+def create_giveaway():
+    return GiveawayTicket.objects.create(
+        title="Live", price=5, total_available=1000,
+        ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+    )
+
+
+def buy(user, giveaway, quantity, source='purchase'):
+    purchase = TicketPurchase.objects.create(
+        user=user, ticket=giveaway, quantity=quantity, payment_status='succeeded', source=source,
+        unique_ticket_ids=allocate_ticket_ids(quantity),
+    )
+    TicketEntry.objects.issue_for_purchase(purchase)
+    return purchase
+
+
+class ConsolidationTests(TestCase):
+
+    def setUp(self):
+        self.giveaway = create_giveaway()
+
+    def test_rerun_over_the_same_data_is_stable(self):
+        users = [User.objects.create_user(f'buyer{i}@example.com', full_name=f'Buyer {i}') for i in range(5)]
+        for i, user in enumerate(users):
+            buy(user, self.giveaway, i + 1)
+
+        first = consolidate_tickets(chunk_size=2)
+        second = consolidate_tickets(chunk_size=2)
+        buy(users[0], self.giveaway, 2)
+        third = consolidate_tickets(chunk_size=2)
+
+        self.assertEqual((first['users'], first['tickets'], first['chunks']), (5, 15, 3))
+        self.assertEqual((second['users'], second['tickets']), (0, 0))
+        self.assertEqual((third['users'], third['tickets']), (1, 2))
+        self.assertEqual(UserTicketConsolidation.objects.count(), 5)
+        for consolidation in UserTicketConsolidation.objects.all():
+            self.assertEqual(len(set(consolidation.unique_ticket_ids)), consolidation.ticket_count)
+        self.assertEqual(UserTicketConsolidation.objects.get(user=users[0]).ticket_count, 3)
+        self.assertFalse(TicketEntry.objects.owned().exists())
+
+    def test_yearly_free_tickets_are_released_a_slice_at_a_time(self):
+        user = User.objects.create_user('yearly@example.com', full_name='Yearly')
+        plan = SubscriptionPlan.objects.create(name='vip', monthly_price=10, free_monthly_tickets=2)
+        UserSubscription.objects.create(
+            user=user, plan=plan, billing_cycle='yearly',
+            end_date=datetime.date.today() + datetime.timedelta(days=365),
+        )
+        free = buy(user, self.giveaway, 24, source='subscription')
+        buy(user, self.giveaway, 3)
+
+        consolidate_tickets()
+        free.refresh_from_db()
+        self.assertEqual(UserTicketConsolidation.objects.get(user=user).ticket_count, 3 + 2)
+        self.assertEqual(len(free.unique_ticket_ids), 22)
+
+        consolidate_tickets()
+        free.refresh_from_db()
+        self.assertEqual(UserTicketConsolidation.objects.get(user=user).ticket_count, 3 + 2 + 1)
+        self.assertEqual(
+            sorted(free.unique_ticket_ids),
+            sorted(TicketEntry.objects.owned().filter(purchase=free).values_list('ticket_id', flat=True)),
+        )
+
+
+class IncrementalConsolidationTests(TestCase):
+
+    def setUp(self):
+        self.giveaway = create_giveaway()
+
+    def test_later_yearly_slices_are_released_by_incremental_runs(self):
+        user = User.objects.create_user('slices@example.com', full_name='Slices')
+        plan = SubscriptionPlan.objects.create(name='vip', monthly_price=10, free_monthly_tickets=1)
+        UserSubscription.objects.create(
+            user=user, plan=plan, billing_cycle='yearly',
+            end_date=datetime.date.today() + datetime.timedelta(days=365),
+        )
+        free = buy(user, self.giveaway, 12, source='subscription')
+        consolidate_incremental()
+        # Push the watermark well past the entries' creation time.
+        ConsolidationWatermark.objects.update(processed_until=timezone.now() + datetime.timedelta(hours=1))
+
+        consolidate_incremental()
+
+        self.assertEqual(TicketEntry.objects.consolidated().filter(purchase=free).count(), 2)
+
+    def test_watermark_is_only_written_when_advanced(self):
+        buy(User.objects.create_user('once@example.com', full_name='Once'), self.giveaway, 2)
+        consolidate_incremental()
+        watermark = ConsolidationWatermark.objects.get(giveaway=self.giveaway)
+
+        with self.assertNumQueries(3):
+            # Watermarks, active giveaways, one empty chunk scan; no write.
+            result = consolidate_incremental()
+
+        self.assertEqual(result['tickets'], 0)
+        self.assertEqual(ConsolidationWatermark.objects.get(pk=watermark.pk).updated_at, watermark.updated_at)
+
+
+class ArchiveTests(TestCase):
+
+    def archive_row(self, consolidation, **overrides):
+        fields = {
+            'user_id': consolidation.user_id, 'email': consolidation.email, 'full_name': consolidation.full_name,
+            'unique_ticket_ids': consolidation.unique_ticket_ids, 'source_id': consolidation.pk,
+        }
+        return UserTicketConsolidationArchive.objects.create(**{**fields, **overrides})
+
+    def test_mismatched_copy_keeps_the_batch(self):
+        create_pool([2, 3])
+        first = UserTicketConsolidation.objects.order_by('id').first()
+        # A stale copy under the same source_id no longer matches the row.
+        self.archive_row(first, unique_ticket_ids=['OTHER'])
+
+        with self.assertLogs('raffle.archive', 'ERROR'), self.assertRaises(ArchiveVerificationError):
+            archive_consolidations(batch_size=1)
+
+        self.assertEqual(UserTicketConsolidation.objects.count(), 2)
+        self.assertEqual(TicketEntry.objects.consolidated().count(), 5)
+
+    def test_rerun_resumes_from_copied_batches(self):
+        create_pool([2, 3, 4])
+        # An interrupted run copied the first batch but never deleted it.
+        self.archive_row(UserTicketConsolidation.objects.order_by('id').first())
+
+        result = archive_consolidations(batch_size=2)
+
+        self.assertEqual(result, {'archived': 3, 'batches': 2})
+        self.assertFalse(UserTicketConsolidation.objects.exists())
+        self.assertEqual(UserTicketConsolidationArchive.objects.count(), 3)
+        self.assertEqual(TicketEntry.objects.filter(state=TicketEntry.STATE_ARCHIVED).count(), 9)
+
+    def test_winners_commit_before_archiving(self):
+        create_pool([2, 3])
+        giveaway = GiveawayTicket.objects.get()
+
+        with mock.patch('raffle.archive.batch_checksum', side_effect=['a', 'b']):
+            with self.assertLogs('raffle.archive', 'ERROR'), self.assertRaises(ArchiveVerificationError):
+                run_raffle_draw(2, giveaway.pk)
+
+        self.assertEqual(RaffleWinner.objects.count(), 2)
+        self.assertEqual(UserTicketConsolidation.objects.count(), 2)
+
+
+class RaffleDrawJobTests(TestCase):
+
+    def setUp(self):
+        create_pool([3, 4, 5])
+        self.giveaway = GiveawayTicket.objects.get()
+
+    def expire(self, job):
+        RaffleDrawJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - STALE_JOB_TIMEOUT * 2)
+
+    def test_claim_next_job_takes_the_oldest_once(self):
+        first = enqueue_raffle_draw(self.giveaway, 2, 'ticket', False)
+        second = enqueue_raffle_draw(self.giveaway, 2, 'ticket', False)
+
+        claimed = claim_next_job()
+
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.attempts), (RaffleDrawJob.STATUS_RUNNING, 1))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_stale_jobs_are_requeued_then_failed(self):
+        stale = enqueue_raffle_draw(self.giveaway, 1, 'ticket', False)
+        busy = enqueue_raffle_draw(self.giveaway, 1, 'ticket', False)
+        claim_next_job(), claim_next_job()
+        self.expire(stale)
+
+        self.assertEqual(recover_stale_jobs(), {'requeued': 1, 'failed': 0})
+        self.assertEqual(RaffleDrawJob.objects.get(pk=stale.pk).status, RaffleDrawJob.STATUS_QUEUED)
+        self.assertEqual(RaffleDrawJob.objects.get(pk=busy.pk).status, RaffleDrawJob.STATUS_RUNNING)
+
+        RaffleDrawJob.objects.filter(pk=stale.pk).update(
+            status=RaffleDrawJob.STATUS_RUNNING, attempts=MAX_JOB_ATTEMPTS,
+        )
+        self.expire(stale)
+        self.assertEqual(recover_stale_jobs(), {'requeued': 0, 'failed': 1})
+        self.assertEqual(RaffleDrawJob.objects.get(pk=stale.pk).status, RaffleDrawJob.STATUS_FAILED)
+
+    def test_job_runs_every_phase(self):
+        enqueue_raffle_draw(self.giveaway, 3, 'ticket', False)
+
+        job = run_raffle_draw_job(claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.phase), (RaffleDrawJob.STATUS_SUCCEEDED, RaffleDrawJob.PHASE_DONE))
+        self.assertEqual(len(job.winners), 3)
+        self.assertEqual(RaffleWinner.objects.count(), 3)
+        self.assertFalse(UserTicketConsolidation.objects.exists())
+
+    def test_resumed_job_keeps_its_winners(self):
+        enqueue_raffle_draw(self.giveaway, 2, 'ticket', False)
+        with mock.patch('raffle.tasks.archive_and_clear_user_ticket_consolidation', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                # The worker dies mid-archive.
+                run_raffle_draw_job(claim_next_job())
+        job = RaffleDrawJob.objects.get()
+        self.assertEqual(job.phase, RaffleDrawJob.PHASE_ARCHIVING)
+        drawn = sorted(RaffleWinner.objects.values_list('winning_ticket_id', flat=True))
+
+        self.expire(job)
+        recover_stale_jobs()
+        with mock.patch('raffle.tasks.draw_winning_entries') as draw:
+            job = run_raffle_draw_job(claim_next_job())
+
+        draw.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (RaffleDrawJob.STATUS_SUCCEEDED, 2))
+        self.assertEqual(sorted(RaffleWinner.objects.values_list('winning_ticket_id', flat=True)), drawn)
+        self.assertEqual(sorted(winner['winning_ticket_id'] for winner in job.winners), drawn)
+
+    def test_long_archive_keeps_the_job_claimed(self):
+        enqueue_raffle_draw(self.giveaway, 2, 'ticket', False)
+        job = claim_next_job()
+        batches = []
+
+        def archive_slowly(on_batch):
+            def beat():
+                on_batch()
+                batches.append(recover_stale_jobs()['requeued'])
+                # The next batch takes longer than the stale timeout.
+                self.expire(job)
+            return archive_consolidations(batch_size=1, on_batch=beat)
+
+        with mock.patch('raffle.tasks.archive_and_clear_user_ticket_consolidation', archive_slowly):
+            run_raffle_draw_job(job)
+
+        self.assertEqual(batches, [0] * UserTicketConsolidationArchive.objects.count())
+        self.assertEqual(RaffleDrawJob.objects.get().status, RaffleDrawJob.STATUS_SUCCEEDED)
+
+    def test_resumed_job_queues_winner_emails_once(self):
+        enqueue_raffle_draw(self.giveaway, 2, 'ticket', False)
+        real_enter_phase = tasks._enter_phase
+
+        def crash_before_done(job, phase):
+            if phase == RaffleDrawJob.PHASE_DONE:
+                raise KeyboardInterrupt
+            real_enter_phase(job, phase)
+
+        with mock.patch('raffle.tasks._enter_phase', crash_before_done), self.assertRaises(KeyboardInterrupt):
+            run_raffle_draw_job(claim_next_job())
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        for _ in range(2):
+            # Resumed once from notifying, then again after DONE committed.
+            job = RaffleDrawJob.objects.get()
+            RaffleDrawJob.objects.filter(pk=job.pk).update(status=RaffleDrawJob.STATUS_RUNNING)
+            self.expire(job)
+            recover_stale_jobs()
+            run_raffle_draw_job(claim_next_job())
+
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+        self.assertEqual(RaffleDrawJob.objects.get().status, RaffleDrawJob.STATUS_SUCCEEDED)
+
+    def test_superseded_worker_does_not_draw_again(self):
+        enqueue_raffle_draw(self.giveaway, 2, 'ticket', False)
+        old = claim_next_job()
+        self.expire(old)
+        recover_stale_jobs()
+        claim_next_job()
+
+        run_raffle_draw_job(old)
+
+        self.assertFalse(RaffleWinner.objects.exists())
+        job = RaffleDrawJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (RaffleDrawJob.STATUS_RUNNING, 2))
+
+
+class RaffleDrawViewTests(TestCase):
+
+    def setUp(self):
+        create_pool([2])
+        self.giveaway = GiveawayTicket.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_superuser('admin@example.com', 'pass', full_name='Admin')
+        )
+
+    def test_draw_is_queued_and_polled(self):
+        response = self.client.post(
+            '/api/raffle/admin/raffle/draw/', {'giveaway_id': self.giveaway.pk, 'winners_count': 1},
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['data']['id']
+        self.assertEqual(response.data['data']['status'], RaffleDrawJob.STATUS_QUEUED)
+
+        run_raffle_draw_job(claim_next_job())
+        response = self.client.get(f'/api/raffle/admin/raffle/draw/{job_id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['status'], RaffleDrawJob.STATUS_SUCCEEDED)
+        self.assertEqual(len(response.data['data']['winners']), 1)
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(self.client.get('/api/raffle/admin/raffle/draw/999/').status_code, 404)
+
+
+class MergeDuplicateConsolidationsMigrationTests(TransactionTestCase):
+    before = [('raffle', '0004_userticketconsolidation_ticket_count')]
+    after = [('raffle', '0005_unique_consolidation_per_user')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_are_merged_before_the_constraint(self):
+        user = User.objects.create_user('dup@example.com', full_name='Dup')
+        apps = self.migrate(self.before)
+        OldConsolidation = apps.get_model('raffle', 'UserTicketConsolidation')
+        for ticket_ids in (['A', 'B'], ['B', 'C']):
+            OldConsolidation.objects.create(
+                user_id=user.id, email=user.email, full_name=user.full_name,
+                unique_ticket_ids=ticket_ids, ticket_count=len(ticket_ids),
+            )
+
+        apps = self.migrate(self.after)
+
+        merged = apps.get_model('raffle', 'UserTicketConsolidation').objects.get(user_id=user.id)
+        self.assertEqual(sorted(merged.unique_ticket_ids), ['A', 'B', 'C'])
+        self.assertEqual(merged.ticket_count, 3)
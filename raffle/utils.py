@@ -104,119 +104,81 @@
 
 #     return winners
 
-from django.utils import timezone
-from datetime import timedelta
-import random
 import logging
 from django.db import transaction
 from .models import (
-    UserTicketConsolidation,
-    UserTicketConsolidationArchive,
     RaffleWinner,
     GiveawayTicket,
 )
-from django.core.mail import send_mail
-from django.conf import settings
+from .archive import archive_consolidations
+from tickets.models import TicketEntry
+from .draw import STRATEGY_TICKET, draw_winning_entries, winner_contacts
+from mailer.outbox import enqueue_email
 
 
 logger = logging.getLogger(__name__)
 
 
-def reset_usage_if_needed(subscription):
-    now = timezone.now()
-
-    if not subscription.last_usage_reset:
-        subscription.monthly_tickets_used = 0
-        subscription.yearly_tickets_used = 0
-        subscription.last_usage_reset = now
-        subscription.save(update_fields=['monthly_tickets_used', 'yearly_tickets_used', 'last_usage_reset'])
-        return
-
-    last_reset = subscription.last_usage_reset
-
-    if subscription.billing_cycle == 'monthly':
-        if (now.year, now.month) != (last_reset.year, last_reset.month):
-            subscription.monthly_tickets_used = 0
-            subscription.last_usage_reset = now
-            subscription.save(update_fields=['monthly_tickets_used', 'last_usage_reset'])
-
-    elif subscription.billing_cycle == 'yearly':
-        if now.year != last_reset.year:
-            subscription.yearly_tickets_used = 0
-            subscription.last_usage_reset = now
-            subscription.save(update_fields=['yearly_tickets_used', 'last_usage_reset'])
-
-
-def archive_and_clear_user_ticket_consolidation():
-    consolidations = list(UserTicketConsolidation.objects.all())
-    if not consolidations:
+def archive_and_clear_user_ticket_consolidation(on_batch=None):
+    result = archive_consolidations(on_batch=on_batch)
+    if not result['archived']:
         logger.info("No UserTicketConsolidation records to archive.")
-        return
+    return result
 
-    archives = [
-        UserTicketConsolidationArchive(
-            user=c.user,
-            email=c.email,
-            full_name=c.full_name,
-            unique_ticket_ids=c.unique_ticket_ids,
-        ) for c in consolidations
-    ]
 
-    UserTicketConsolidationArchive.objects.bulk_create(archives)
+def get_active_giveaway(giveaway_id):
+    giveaway = GiveawayTicket.objects.filter(id=giveaway_id, is_active=True).first()
+    if not giveaway:
+        raise GiveawayTicket.DoesNotExist("Active giveaway not found.")
+    return giveaway
 
-    # ✅ Validate successful archiving before deleting
-    archived_count = UserTicketConsolidationArchive.objects.filter(
-        user__in=[c.user for c in consolidations],
-        email__in=[c.email for c in consolidations]
-    ).count()
 
-    if archived_count < len(archives):
-        logger.error("Mismatch in archiving. Aborting deletion to avoid data loss.")
-        raise Exception("Archiving failed. Data not deleted.")
+def position_label(idx: int) -> str:
+    position_labels = ['1st', '2nd', '3rd', '4th', '5th']
+    return position_labels[idx] if idx < len(position_labels) else f"{idx+1}th"
 
-    # ✅ Safe to delete after verification
-    deleted_count, _ = UserTicketConsolidation.objects.all().delete()
-    logger.info(f"Archived and deleted {deleted_count} UserTicketConsolidation records.")
 
+@transaction.atomic
+def persist_raffle_winners(giveaway, picks):
+    """Save the drawn entries as winners and take them out of the pool."""
+    claimed = TicketEntry.objects.consolidated().filter(
+        id__in=[pick['id'] for pick in picks]
+    ).update(state=TicketEntry.STATE_DRAWN)
+    if claimed != len(picks):
+        raise RuntimeError("Drawn tickets left the pool before the winners were saved.")
 
-def run_raffle_draw(winners_count: int, giveaway_id: int):
-    eligible = []
+    contacts = winner_contacts(pick['user_id'] for pick in picks)
+    winners = []
+    for idx, pick in enumerate(picks):
+        contact = contacts[pick['user_id']]
+        winner = RaffleWinner.objects.create(
+            user_id=pick['user_id'],
+            email=contact['email'],
+            full_name=contact['full_name'],
+            winning_ticket_id=pick['ticket_id'],
+            position=position_label(idx),
+            giveaway=giveaway
+        )
+        winners.append(winner)
+    return winners
 
-    giveaway = GiveawayTicket.objects.filter(id=giveaway_id, is_active=True).first()
-    if not giveaway:
-        raise GiveawayTicket.DoesNotExist("Active giveaway not found.")
 
-    consolidations = UserTicketConsolidation.objects.all()
-    for consolidation in consolidations:
-        for ticket_id in consolidation.unique_ticket_ids:
-            eligible.append((consolidation.user, consolidation.email, consolidation.full_name, ticket_id))
+def run_raffle_draw(winners_count: int, giveaway_id: int, strategy: str = STRATEGY_TICKET,
+                    one_prize_per_user: bool = False):
+    giveaway = get_active_giveaway(giveaway_id)
 
-    if len(eligible) == 0:
-        raise ValueError("No eligible tickets found for raffle draw.")
+    with transaction.atomic():
+        picks = draw_winning_entries(winners_count, strategy, one_prize_per_user)
+        if not picks:
+            raise ValueError("No eligible tickets found for raffle draw.")
 
-    winners_to_pick = min(winners_count, len(eligible))
-    selected_winners = random.sample(eligible, winners_to_pick)
+        winners = persist_raffle_winners(giveaway, picks)
 
-    position_labels = ['1st', '2nd', '3rd', '4th', '5th']
-    winners = []
+    # ✅ Archive once the winners are committed; each batch commits on its own,
+    # and a failed batch is rolled back and resumed by the next run.
+    archive_and_clear_user_ticket_consolidation()
 
-    with transaction.atomic():
-        for idx, (user, email, full_name, ticket_id) in enumerate(selected_winners):
-            position = position_labels[idx] if idx < len(position_labels) else f"{idx+1}th"
-            winner = RaffleWinner.objects.create(
-                user=user,
-                email=email,
-                full_name=full_name,
-                winning_ticket_id=ticket_id,
-                position=position,
-                giveaway=giveaway
-            )
-            winners.append(winner)
-
-        # ✅ Archive and delete only inside transaction
-        archive_and_clear_user_ticket_consolidation()
-
-    logger.info(f"{winners_to_pick} winners selected for Giveaway ID: {giveaway_id}")
+    logger.info(f"{len(winners)} winners selected for Giveaway ID: {giveaway_id}")
     return winners
 
 
@@ -224,7 +186,7 @@ def run_raffle_draw(winners_count: int, giveaway_id: int):
 
 def send_winner_congratulation_email(winner):
     """
-    Sends a congratulatory plain-text email to a raffle winner with emojis and friendly formatting.
+    Queues a congratulatory plain-text email to a raffle winner with emojis and friendly formatting.
     
     Args:
         winner: RaffleWinner model instance
@@ -242,13 +204,7 @@ def send_winner_congratulation_email(winner):
     recipient_list = [winner.email]
 
     try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            recipient_list,
-            fail_silently=False,
-        )
-        logger.info(f"Sent winner email to {winner.email} for position {winner.position}")
+        enqueue_email(subject, message, recipient_list)
+        logger.info(f"Queued winner email to {winner.email} for position {winner.position}")
     except Exception as e:
-        logger.error(f"Failed to send winner email to {winner.email}: {e}")
+        logger.error(f"Failed to queue winner email to {winner.email}: {e}")
@@ -3,15 +3,16 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from tickets.models import TicketPurchase
-from subscription.models import UserSubscription
 from .models import UserTicketConsolidation, UserTicketConsolidationArchive
 from .serializers import UserTicketConsolidationSerializer, UserTicketConsolidationArchiveSerializer, RaffleWinnerArchiveSerializer
 from tickets.models import GiveawayTicket
-from django.db import transaction
 from rest_framework.permissions import IsAuthenticated
-from .utils import reset_usage_if_needed
-from django.db.models import Prefetch
+from .consolidation import consolidate_incremental, consolidate_tickets, rebuild_consolidations
+from .draw import eligible_entries
+from .pagination import TicketIdCursorPagination
+from django.http import StreamingHttpResponse
+import csv
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -276,126 +277,35 @@ class ConsolidatedTicketsView(APIView):
                         'success': False,
                         'message': 'You do not have permission to view all users. Only admin can access this.'
                     }, status=status.HTTP_403_FORBIDDEN)
-                users = User.objects.all()
+                target_user_ids = None
             else:
                 if not user.is_staff and user.id != user_id:
                     return Response({
                         'success': False,
                         'message': 'You are not allowed to access other users\' data.'
                     }, status=status.HTTP_403_FORBIDDEN)
-                users = User.objects.filter(id=user_id)
-
-            # Prefetch related models
-            users = users.prefetch_related(
-                Prefetch(
-                    'ticket_purchases',  # ✅ Correct related_name
-                    queryset=TicketPurchase.objects.filter(payment_status='succeeded')
-                ),
-                Prefetch(
-                    'subscription',
-                    queryset=UserSubscription.objects.filter(is_active=True).select_related('plan')
-                )
-            )
-
-            results = []
-            total_tickets = 0
-            total_users_with_tickets = 0
-            subscriptions_to_update = []
-            purchases_to_update = []
-
-            for user_obj in users:
-                subscription = getattr(user_obj, 'subscription', None)
-                ticket_purchases = list(user_obj.ticket_purchases.all())  # ✅ Correct usage
-
-                fetched_ticket_ids = []
-
-                for purchase in ticket_purchases:
-                    original_ids = purchase.unique_ticket_ids or []
-                    used_now = original_ids[:]
-
-                    # For yearly subscriptions, limit usage
-                    if purchase.source in ['subscription', 'first_time_bonus']:
-                        if subscription and subscription.billing_cycle == 'yearly':
-                            ticket_count = max(len(original_ids) // 12, 1)
-                            used_now = original_ids[:ticket_count]
-
-                    fetched_ticket_ids.extend(used_now)
-
-                    # Save remaining tickets
-                    remaining = [t for t in original_ids if t not in used_now]
-                    if remaining != original_ids:
-                        purchase.unique_ticket_ids = remaining
-                        purchases_to_update.append(purchase)
-
-                # Deduplicate ticket IDs
-                fetched_ticket_ids = list(dict.fromkeys(fetched_ticket_ids))
-                if not fetched_ticket_ids:
-                    continue
-
-                total_users_with_tickets += 1
-                total_tickets += len(fetched_ticket_ids)
-
-                with transaction.atomic():
-                    # Reset usage tracker if needed
-                    if subscription:
-                        reset_usage_if_needed(subscription)
-
-                    # Save consolidated result
-                    consolidation, _ = UserTicketConsolidation.objects.update_or_create(
-                        user=user_obj,
-                        defaults={
-                            'email': user_obj.email,
-                            'full_name': user_obj.full_name,
-                            'unique_ticket_ids': fetched_ticket_ids
-                        }
-                    )
-
-                    serializer = UserTicketConsolidationSerializer(consolidation)
-                    results.append(serializer.data)
-
-                    # Update ticket usage tracking
-                    if subscription:
-                        used = len(fetched_ticket_ids)
-
-                        if subscription.billing_cycle == 'monthly':
-                            max_free = subscription.plan.free_monthly_tickets
-                            subscription.monthly_tickets_used = min(
-                                subscription.monthly_tickets_used + used,
-                                max_free
-                            )
-                            subscriptions_to_update.append(subscription)
-
-                        elif subscription.billing_cycle == 'yearly':
-                            max_yearly = subscription.plan.free_monthly_tickets * 12
-                            months_used_inc = used / max(max_yearly, 1) * 12
-                            subscription.yearly_tickets_used = min(
-                                subscription.yearly_tickets_used + months_used_inc,
-                                12
-                            )
-                            subscriptions_to_update.append(subscription)
-
-            # Bulk save updates
-            if purchases_to_update:
-                TicketPurchase.objects.bulk_update(purchases_to_update, ['unique_ticket_ids'])
-
-            if subscriptions_to_update:
-                UserSubscription.objects.bulk_update(
-                    subscriptions_to_update,
-                    ['monthly_tickets_used', 'yearly_tickets_used']
-                )
-                
-            all_consolidations = UserTicketConsolidation.objects.all().only('unique_ticket_ids')
+                target_user_ids = [user_id]
+
+            # Admins can force a full pass; otherwise only entries since the watermark are merged.
+            full_rebuild = user.is_staff and request.query_params.get('full', '').lower() in ('true', '1')
+            if full_rebuild and target_user_ids is None:
+                result = rebuild_consolidations()
+            elif full_rebuild:
+                result = consolidate_tickets(user_ids=target_user_ids)
+            else:
+                result = consolidate_incremental(user_ids=target_user_ids)
 
-            all_tickets = []
-            for consolidation in all_consolidations:
-                all_tickets.extend(consolidation.unique_ticket_ids or [])
+            consolidations = UserTicketConsolidation.objects.filter(updated_at__gte=result['started_at'])
+            if target_user_ids is not None:
+                consolidations = consolidations.filter(user_id__in=target_user_ids)
+            results = UserTicketConsolidationSerializer(consolidations.order_by('user_id'), many=True).data
 
             return Response({
                 'success': True,
-                'total_users_with_tickets': total_users_with_tickets,
-                'total_tickets': total_tickets,
+                'total_users_with_tickets': result['users'],
+                'total_tickets': result['tickets'],
                 'data': results,
-                'spin_eligible_tickets': all_tickets
+                'spin_eligible_ticket_count': eligible_entries().count()
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -411,11 +321,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAdminUser
-from .serializers import RaffleWinnerSerializer
-from .utils import run_raffle_draw
+from .serializers import RaffleWinnerSerializer, RaffleDrawJobSerializer
+from .utils import get_active_giveaway
+from .draw import DRAW_STRATEGIES, STRATEGY_TICKET, STRATEGY_WEIGHTED
+from .tasks import enqueue_raffle_draw
 from tickets.models import GiveawayTicket
-from .utils import send_winner_congratulation_email 
-from .models import RaffleWinner
+from .models import RaffleWinner, RaffleDrawJob
 import logging
 import json
 
@@ -428,6 +339,8 @@ class RaffleDrawView(APIView):
     def post(self, request):
         winners_count = request.data.get('winners_count', 3)
         giveaway_id = request.data.get('giveaway_id')
+        strategy = request.data.get('strategy', STRATEGY_TICKET)
+        one_prize_per_user = str(request.data.get('one_prize_per_user', False)).lower() in ('true', '1')
 
         if not giveaway_id:
             return Response({
@@ -445,48 +358,61 @@ class RaffleDrawView(APIView):
                 'message': 'winners_count must be a positive integer.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            winners = run_raffle_draw(winners_count, giveaway_id)
-            serializer = RaffleWinnerSerializer(winners, many=True)
-
-            # Send congratulation emails to winners
-            for winner in winners:
-                send_winner_congratulation_email(winner)
-
-            # ✅ Log raffle metadata for auditing
-            logger.info(json.dumps({
-                'action': 'raffle_draw',
-                'admin': request.user.email,
-                'giveaway_id': giveaway_id,
-                'winner_count': len(winners),
-                'winners': serializer.data
-            }, default=str))
+        if strategy not in DRAW_STRATEGIES:
+            return Response({
+                'success': False,
+                'message': f"strategy must be one of: {', '.join(DRAW_STRATEGIES)}."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
+        if one_prize_per_user and strategy != STRATEGY_WEIGHTED:
             return Response({
-                'success': True,
-                'message': f'{len(winners)} winner(s) selected and notified.',
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'success': False,
+                'message': "one_prize_per_user is only supported by the 'weighted' draw strategy."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        except GiveawayTicket.DoesNotExist:
+        try:
+            giveaway = get_active_giveaway(giveaway_id)
+        except (GiveawayTicket.DoesNotExist, ValueError, TypeError):
             return Response({
                 'success': False,
                 'message': 'Active giveaway not found.'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        except ValueError as ve:
-            return Response({
-                'success': False,
-                'message': str(ve)
-            }, status=status.HTTP_400_BAD_REQUEST)
+        job = enqueue_raffle_draw(giveaway, winners_count, strategy, one_prize_per_user, requested_by=request.user)
 
-        except Exception as e:
-            logger.error(f"Error during raffle draw: {str(e)}")
+        # ✅ Log raffle metadata for auditing
+        logger.info(json.dumps({
+            'action': 'raffle_draw_queued',
+            'admin': request.user.email,
+            'job_id': job.pk,
+            'giveaway_id': giveaway.pk,
+            'winners_count': winners_count,
+            'strategy': strategy,
+            'one_prize_per_user': one_prize_per_user,
+        }, default=str))
+
+        return Response({
+            'success': True,
+            'message': 'Raffle draw queued. Poll the job status for progress.',
+            'data': RaffleDrawJobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class RaffleDrawJobView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id):
+        job = RaffleDrawJob.objects.filter(pk=job_id).first()
+        if not job:
             return Response({
                 'success': False,
-                'message': 'Raffle draw failed due to an duplicate action.',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'message': 'Raffle draw job not found.'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'success': True,
+            'data': RaffleDrawJobSerializer(job).data
+        }, status=status.HTTP_200_OK)
 
 
 
@@ -504,21 +430,74 @@ class WinnerListView(APIView):
         
         
 
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands the line back, for streaming csv.writer output."""
+    def write(self, value):
+        return value
+
+
+def stream_ticket_ids(export_format):
+    """Yield the pool's ticket IDs as NDJSON or CSV, one database chunk at a time."""
+    ticket_ids = eligible_entries().values_list('ticket_id', flat=True).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(['ticket_id'])
+        for ticket_id in ticket_ids:
+            yield writer.writerow([ticket_id])
+    else:
+        for ticket_id in ticket_ids:
+            yield json.dumps({'ticket_id': ticket_id}) + '\n'
+
+
 class Spins_Eligible_tickets(APIView):
+    """
+    Ticket IDs in the draw pool.
+
+    - default: cursor-paginated pages (`?cursor=...&page_size=...`)
+    - `?mode=count`: only the pool size, for the spin wheel
+    - `?export=ndjson|csv`: the whole pool streamed as a download
+    """
     permission_classes = [IsAdminUser]
-    
+    pagination_class = TicketIdCursorPagination
+    export_content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
     def get(self, request):
         try:
-            all_consolidations = UserTicketConsolidation.objects.all().only('unique_ticket_ids')
+            if request.query_params.get('mode') == 'count':
+                return Response({
+                    'success': True,
+                    'total_tickets': eligible_entries().count()
+                }, status=status.HTTP_200_OK)
+
+            export_format = request.query_params.get('export')
+            if export_format:
+                if export_format not in self.export_content_types:
+                    return Response({
+                        'success': False,
+                        'message': f"export must be one of: {', '.join(self.export_content_types)}."
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                response = StreamingHttpResponse(
+                    stream_ticket_ids(export_format),
+                    content_type=self.export_content_types[export_format]
+                )
+                response['Content-Disposition'] = f'attachment; filename="spin_eligible_tickets.{export_format}"'
+                return response
 
-            all_tickets = []
-            for consolidation in all_consolidations:
-                all_tickets.extend(consolidation.unique_ticket_ids or [])
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(eligible_entries().values('id', 'ticket_id'), request, view=self)
 
             return Response({
                 'success': True,
                 'message': "Ticket numbers retrieved successfully.",
-                'tickets': all_tickets
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'tickets': [row['ticket_id'] for row in page]
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -552,36 +531,19 @@ class ArchiveConsolidatedTicketsView(APIView):
             
 # Delete Winner List & Archive Winners
 from .models import RaffleWinnerArchive
-from django.utils import timezone
-from django.db import transaction
+from .archive import archive_winners
 class WinnerDeleteAllView(APIView):
     permission_classes = [IsAdminUser]
 
     def delete(self, request):
-        winners = RaffleWinner.objects.all()
-        count = winners.count()
-        if count == 0:
+        if not RaffleWinner.objects.exists():
             return Response({
                 'success': True,
                 'message': 'No winners found to archive and delete.'
             }, status=status.HTTP_200_OK)
 
         try:
-            with transaction.atomic():
-                archive_objs = [
-                    RaffleWinnerArchive(
-                        user=w.user,
-                        email=w.email,
-                        full_name=w.full_name,
-                        winning_ticket_id=w.winning_ticket_id,
-                        position=w.position,
-                        giveaway=w.giveaway,
-                        created_at=w.created_at,
-                        archived_at=timezone.now()
-                    ) for w in winners
-                ]
-                RaffleWinnerArchive.objects.bulk_create(archive_objs)
-                winners.delete()
+            count = archive_winners()['archived']
 
             logger.info(f"Admin user '{request.user.email}' archived and deleted all ({count}) raffle winners.")
 
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, UserSubscription
+from .models import (
+    AllocationRun, FreeTicketAllocation, StripeEvent, SubscriptionPlan, SubscriptionUsage, UserSubscription,
+)
 
 
 @admin.register(SubscriptionPlan)
@@ -47,3 +49,37 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
         return obj.is_current()
     is_current_status.boolean = True
     is_current_status.short_description = "Is Current"
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'type', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'type', 'received_at')
+    search_fields = ('event_id',)
+    readonly_fields = ('payload', 'attempts', 'locked_at', 'last_error', 'received_at', 'processed_at')
+    ordering = ('-received_at',)
+
+
+@admin.register(FreeTicketAllocation)
+class FreeTicketAllocationAdmin(admin.ModelAdmin):
+    list_display = ('subscription', 'period_start', 'status', 'attempts', 'next_attempt_at', 'completed_at')
+    list_filter = ('status', 'period_start')
+    search_fields = ('subscription__user__email',)
+    readonly_fields = ('attempts', 'locked_at', 'last_error', 'created_at', 'completed_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(AllocationRun)
+class AllocationRunAdmin(admin.ModelAdmin):
+    list_display = ('run_date', 'subscriptions_allocated', 'tickets_allocated', 'last_subscription_id', 'started_at', 'finished_at')
+    readonly_fields = ('started_at', 'updated_at')
+    ordering = ('-run_date',)
+
+
+@admin.register(SubscriptionUsage)
+class SubscriptionUsageAdmin(admin.ModelAdmin):
+    list_display = ('subscription', 'period_start', 'tickets_used', 'updated_at')
+    list_filter = ('period_start',)
+    search_fields = ('subscription__user__email',)
+    readonly_fields = ('subscription', 'period_start', 'tickets_used', 'updated_at')
+    ordering = ('-period_start',)
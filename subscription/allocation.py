@@ -0,0 +1,302 @@
+# subscription/allocation.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from tickets.inventory import reserve_stock
+from tickets.models import GiveawayTicket, TicketEntry, TicketPurchase
+from tickets.ticket_ids import allocate_ticket_ids
+from .models import AllocationRun, FreeTicketAllocation, UserSubscription
+from .utils import FIRST_TIME_BONUS_TICKETS, allocate_free_tickets, period_ticket_count
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'FREE_TICKET_ALLOCATION_BATCH_SIZE', 50)
+MAX_ATTEMPTS = getattr(settings, 'FREE_TICKET_ALLOCATION_MAX_ATTEMPTS', 10)
+RETRY_BACKOFF_SECONDS = getattr(settings, 'FREE_TICKET_ALLOCATION_RETRY_BACKOFF', 60)
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+# Jobs claimed by a worker that died mid-batch are released after this long.
+LOCK_TIMEOUT = timedelta(minutes=10)
+# Subscriptions handled per transaction by the scheduled bulk allocation.
+CHUNK_SIZE = getattr(settings, 'FREE_TICKET_ALLOCATION_CHUNK_SIZE', 500)
+
+
+class InsufficientStockError(Exception):
+    """The active giveaway cannot cover a chunk's free tickets; the chunk was rolled back."""
+
+
+def enqueue_allocation(subscription: UserSubscription, period_start=None):
+    """
+    Queue the free tickets of `subscription`'s current period; one INSERT.
+
+    A period that is already queued (or done) is left alone, which makes
+    replays of the triggering webhook no-ops.
+    """
+    FreeTicketAllocation.objects.bulk_create(
+        [FreeTicketAllocation(subscription=subscription, period_start=period_start or subscription.current_period_start())],
+        ignore_conflicts=True,
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2x base, 4x base... capped at six hours."""
+    return timedelta(seconds=min(RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def release_stale_locks() -> int:
+    cutoff = timezone.now() - LOCK_TIMEOUT
+    return FreeTicketAllocation.objects.filter(
+        status=FreeTicketAllocation.STATUS_RUNNING, locked_at__lt=cutoff
+    ).update(status=FreeTicketAllocation.STATUS_PENDING, locked_at=None)
+
+
+def claim_batch(batch_size: int = BATCH_SIZE) -> list:
+    """Claim up to `batch_size` due jobs, oldest first; SKIP LOCKED keeps parallel workers apart."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            FreeTicketAllocation.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=FreeTicketAllocation.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        FreeTicketAllocation.objects.filter(id__in=ids, status=FreeTicketAllocation.STATUS_PENDING).update(
+            status=FreeTicketAllocation.STATUS_RUNNING, locked_at=now
+        )
+    return list(FreeTicketAllocation.objects.filter(
+        id__in=ids, status=FreeTicketAllocation.STATUS_RUNNING, locked_at=now
+    ).order_by('next_attempt_at', 'id'))
+
+
+def run_allocation(job: FreeTicketAllocation) -> bool:
+    """Allocate and mark the job done in one transaction; failures back off and retry."""
+    try:
+        with transaction.atomic():
+            allocate_free_tickets(job.subscription_id)
+            FreeTicketAllocation.objects.filter(pk=job.pk).update(
+                status=FreeTicketAllocation.STATUS_DONE,
+                attempts=F('attempts') + 1,
+                completed_at=timezone.now(),
+                locked_at=None,
+                last_error='',
+            )
+        return True
+    except Exception as e:
+        attempts = job.attempts + 1
+        logger.warning(f"Free ticket allocation {job.pk} (subscription {job.subscription_id}) failed, attempt {attempts}: {e}")
+        FreeTicketAllocation.objects.filter(pk=job.pk).update(
+            status=FreeTicketAllocation.STATUS_FAILED if attempts >= MAX_ATTEMPTS else FreeTicketAllocation.STATUS_PENDING,
+            attempts=attempts,
+            next_attempt_at=timezone.now() + retry_delay(attempts),
+            locked_at=None,
+            last_error=str(e),
+        )
+        return False
+
+
+def process_pending_allocations(batch_size: int = BATCH_SIZE) -> dict:
+    """Work through every due allocation job, batch by batch."""
+    release_stale_locks()
+    totals = {'allocated': 0, 'failed': 0, 'batches': 0}
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            break
+        for job in batch:
+            totals['allocated' if run_allocation(job) else 'failed'] += 1
+        totals['batches'] += 1
+    return totals
+
+
+def _issue_entries(purchases):
+    """
+    Create the entries of freshly created purchases in one INSERT.
+
+    Conflicting IDs are skipped rather than failing the chunk; any purchase
+    left short is then topped up by issue_for_purchase, which replaces the
+    taken IDs, so a chunk never issues fewer entries than it sold.
+    """
+    TicketEntry.objects.bulk_create(
+        [
+            TicketEntry(
+                ticket_id=ticket_id,
+                user_id=purchase.user_id,
+                giveaway_id=purchase.ticket_id,
+                purchase=purchase,
+                source=purchase.source,
+            )
+            for purchase in purchases for ticket_id in purchase.unique_ticket_ids
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    issued = dict(
+        TicketEntry.objects.filter(purchase__in=purchases)
+        .values('purchase').annotate(n=Count('id')).values_list('purchase', 'n')
+    )
+    for purchase in purchases:
+        if issued.get(purchase.pk, 0) != purchase.quantity:
+            TicketEntry.objects.issue_for_purchase(purchase)
+
+
+def _allocate_chunk(subscriptions, giveaway, today, now) -> dict:
+    """
+    Allocate the current period of every subscription in the chunk that has not had it.
+
+    Follows the same rule as allocate_free_tickets, first-time bonus included.
+    Set-based: one stock decrement and one INSERT each for purchases, entries
+    and allocation records.
+    """
+    periods = {sub.id: sub.current_period_start(today) for sub in subscriptions}
+    this_period = Q()
+    for period in set(periods.values()):
+        this_period |= Q(period_start=period, subscription_id__in=[
+            sub_id for sub_id, start in periods.items() if start == period
+        ])
+    allocations = FreeTicketAllocation.objects.filter(this_period)
+
+    known = set(allocations.values_list('subscription_id', 'period_start'))
+    # Queued-but-unclaimed jobs for this period are taken over; rows a worker
+    # holds are skipped (SKIP LOCKED) and left to it.
+    taken_over = {
+        (sub_id, period): pk for pk, sub_id, period in
+        allocations.select_for_update(skip_locked=True)
+        .filter(status__in=[FreeTicketAllocation.STATUS_PENDING, FreeTicketAllocation.STATUS_FAILED])
+        .values_list('id', 'subscription_id', 'period_start')
+    }
+    due = [
+        sub for sub in subscriptions
+        if (sub.id, periods[sub.id]) not in known or (sub.id, periods[sub.id]) in taken_over
+    ]
+    if not due:
+        return {'subscriptions': 0, 'tickets': 0}
+
+    # Claim the periods before granting anything. A job the webhook path
+    # queued since `known` was read wins the conflict, and that subscription
+    # is left to the job rather than allocated twice.
+    FreeTicketAllocation.objects.bulk_create(
+        [
+            FreeTicketAllocation(
+                subscription_id=sub.id,
+                period_start=periods[sub.id],
+                status=FreeTicketAllocation.STATUS_DONE,
+                attempts=1,
+                completed_at=now,
+            )
+            for sub in due if (sub.id, periods[sub.id]) not in taken_over
+        ],
+        ignore_conflicts=True,
+    )
+    FreeTicketAllocation.objects.filter(pk__in=taken_over.values()).update(
+        status=FreeTicketAllocation.STATUS_DONE,
+        attempts=F('attempts') + 1,
+        completed_at=now,
+        locked_at=None,
+        last_error='',
+    )
+    claimed = set(
+        allocations.filter(status=FreeTicketAllocation.STATUS_DONE, completed_at=now)
+        .values_list('subscription_id', 'period_start')
+    )
+    due = [sub for sub in due if (sub.id, periods[sub.id]) in claimed]
+    if not due:
+        return {'subscriptions': 0, 'tickets': 0}
+
+    returning = set(
+        TicketPurchase.objects.filter(user_id__in=[sub.user_id for sub in due]).values_list('user_id', flat=True)
+    )
+    grants = [
+        (sub.user_id, source, count)
+        for sub in due
+        for source, count in [
+            ('subscription', period_ticket_count(sub)),
+            ('first_time_bonus', 0 if sub.user_id in returning else FIRST_TIME_BONUS_TICKETS),
+        ]
+        if count
+    ]
+    total = sum(count for _, _, count in grants)
+    if total and not reserve_stock(giveaway, total):
+        raise InsufficientStockError(f"Giveaway {giveaway.pk} cannot cover {total} free tickets.")
+
+    ticket_ids = iter(allocate_ticket_ids(total))
+    purchases = TicketPurchase.objects.bulk_create([
+        TicketPurchase(
+            user_id=user_id,
+            ticket=giveaway,
+            quantity=count,
+            unique_ticket_ids=[next(ticket_ids) for _ in range(count)],
+            payment_status='succeeded',
+            source=source,
+            unit_price=giveaway.price,
+            discount_percent=0,
+            amount_charged=0,
+        )
+        for user_id, source, count in grants
+    ])
+    _issue_entries(purchases)
+
+    return {'subscriptions': len(due), 'tickets': total}
+
+
+def allocate_due_periods(chunk_size: int = CHUNK_SIZE, restart: bool = False) -> dict:
+    """
+    Allocate this period's free tickets to every active subscription that is due.
+
+    Subscriptions are walked by id in chunks of `chunk_size`; each chunk and the
+    checkpoint that records it commit together, so an interrupted run picks up
+    after the last committed chunk. Subscriptions whose period is already
+    allocated (e.g. by the webhook path) are skipped. Periods start on any day
+    of the month (yearly plans renew on their anniversary), so there is one
+    run per day: schedule it daily.
+    """
+    today = timezone.now().date()
+    run, _ = AllocationRun.objects.get_or_create(run_date=today)
+    if restart:
+        AllocationRun.objects.filter(pk=run.pk).update(
+            last_subscription_id=0, subscriptions_allocated=0, tickets_allocated=0, finished_at=None
+        )
+
+    giveaway = GiveawayTicket.objects.available(today).order_by('created_at').first()
+
+    while True:
+        with transaction.atomic():
+            # Locking the checkpoint row keeps two runners from working the same day.
+            run = AllocationRun.objects.select_for_update().get(pk=run.pk)
+            if run.finished_at:
+                break
+            chunk = list(
+                UserSubscription.objects
+                .filter(id__gt=run.last_subscription_id, is_active=True, end_date__gte=today)
+                .select_related('plan')
+                .order_by('id')[:chunk_size]
+            )
+            if not chunk:
+                run.finished_at = timezone.now()
+                run.save(update_fields=['finished_at', 'updated_at'])
+                break
+            if not giveaway:
+                raise InsufficientStockError("No active giveaway ticket available.")
+
+            result = _allocate_chunk(chunk, giveaway, today, timezone.now())
+            run.last_subscription_id = chunk[-1].id
+            run.subscriptions_allocated += result['subscriptions']
+            run.tickets_allocated += result['tickets']
+            run.save(update_fields=['last_subscription_id', 'subscriptions_allocated', 'tickets_allocated', 'updated_at'])
+
+    logger.info(
+        f"Allocation run {run.run_date}: {run.subscriptions_allocated} subscriptions, "
+        f"{run.tickets_allocated} tickets{' (finished)' if run.finished_at else ''}."
+    )
+    return {
+        'run_date': run.run_date,
+        'subscriptions': run.subscriptions_allocated,
+        'tickets': run.tickets_allocated,
+        'finished': bool(run.finished_at),
+    }
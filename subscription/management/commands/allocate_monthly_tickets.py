@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from subscription.allocation import CHUNK_SIZE, InsufficientStockError, allocate_due_periods
+
+
+class Command(BaseCommand):
+    help = (
+        "Allocate this period's free tickets to every due active subscription. "
+        "Schedule it daily: periods can start on any day, allocated periods are "
+        "skipped, and an interrupted run resumes from today's checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help="Subscriptions allocated per transaction")
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore today's checkpoint and walk every subscription again")
+
+    def handle(self, *args, **options):
+        try:
+            result = allocate_due_periods(options['chunk_size'], restart=options['restart'])
+        except InsufficientStockError as e:
+            raise CommandError(f"{e} Progress is checkpointed; rerun once stock is available.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['run_date']}: {result['tickets']} tickets allocated to "
+            f"{result['subscriptions']} subscriptions ({'finished' if result['finished'] else 'in progress'})."
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from subscription.webhooks import BATCH_SIZE, process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Apply stored Stripe webhook events (polls the event log until stopped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Process the due events once and exit")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Events claimed per batch")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait between polls when no event is due")
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_pending_events(options['batch_size'])
+            if result['batches']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Processed {result['processed']} event(s), {result['failed']} failed, "
+                    f"in {result['batches']} batch(es)."
+                ))
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
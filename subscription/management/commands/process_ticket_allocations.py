@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from subscription.allocation import BATCH_SIZE, process_pending_allocations
+
+
+class Command(BaseCommand):
+    help = "Run queued free-ticket allocations (polls the queue until stopped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Run the due allocations once and exit")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Allocations claimed per batch")
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help="Seconds to wait between polls when nothing is due")
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_pending_allocations(options['batch_size'])
+            if result['batches']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Allocated {result['allocated']} subscription period(s), {result['failed']} failed, "
+                    f"in {result['batches']} batch(es)."
+                ))
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
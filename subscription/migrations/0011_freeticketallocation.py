@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscription', '0010_stripeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FreeTicketAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='subscription.usersubscription')),
+            ],
+            options={
+                'verbose_name': 'Free Ticket Allocation',
+                'verbose_name_plural': 'Free Ticket Allocations',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='subscriptio_status_97b453_idx')],
+                'constraints': [models.UniqueConstraint(fields=('subscription', 'period_start'), name='unique_allocation_per_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscription', '0011_freeticketallocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllocationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(unique=True)),
+                ('last_subscription_id', models.BigIntegerField(default=0)),
+                ('subscriptions_allocated', models.PositiveIntegerField(default=0)),
+                ('tickets_allocated', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Allocation Run',
+                'verbose_name_plural': 'Allocation Runs',
+            },
+        ),
+    ]
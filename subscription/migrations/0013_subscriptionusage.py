@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:57
+
+import django.db.models.deletion
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def anniversary_on_or_before(start, on):
+    # As subscription.models.anniversary_on_or_before at the time of this migration.
+    years = max(on.year - start.year, 0)
+    anniversary = start + relativedelta(years=years)
+    if anniversary > on and years:
+        anniversary = start + relativedelta(years=years - 1)
+    return anniversary
+
+
+def backfill_usage(apps, schema_editor):
+    UserSubscription = apps.get_model('subscription', 'UserSubscription')
+    SubscriptionUsage = apps.get_model('subscription', 'SubscriptionUsage')
+
+    subscriptions = UserSubscription.objects.filter(last_usage_reset__isnull=False).values(
+        'id', 'billing_cycle', 'start_date', 'last_usage_reset',
+        'monthly_tickets_used', 'yearly_tickets_used', 'plan__free_monthly_tickets',
+    )
+    batch = []
+    for row in subscriptions.iterator():
+        if row['billing_cycle'] == 'yearly':
+            # The yearly counter was kept in months of allowance, not tickets,
+            # and counts against the subscription year of the last reset.
+            period_start = anniversary_on_or_before(row['start_date'], row['last_usage_reset'].date())
+            used = row['yearly_tickets_used'] * row['plan__free_monthly_tickets']
+        else:
+            period_start = row['last_usage_reset'].date().replace(day=1)
+            used = row['monthly_tickets_used']
+        if used:
+            batch.append(SubscriptionUsage(subscription_id=row['id'], period_start=period_start, tickets_used=used))
+        if len(batch) >= BATCH_SIZE:
+            SubscriptionUsage.objects.bulk_create(batch, ignore_conflicts=True)
+            batch.clear()
+    SubscriptionUsage.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscription', '0012_allocationrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('tickets_used', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='subscription.usersubscription')),
+            ],
+            options={
+                'verbose_name': 'Subscription Usage',
+                'verbose_name_plural': 'Subscription Usage',
+                'constraints': [models.UniqueConstraint(fields=('subscription', 'period_start'), name='unique_usage_per_period')],
+            },
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscription', '0013_subscriptionusage'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='usersubscription',
+            name='last_usage_reset',
+        ),
+        migrations.RemoveField(
+            model_name='usersubscription',
+            name='monthly_tickets_used',
+        ),
+        migrations.RemoveField(
+            model_name='usersubscription',
+            name='yearly_tickets_used',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscription', '0014_remove_usersubscription_usage_counters'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='allocationrun',
+            old_name='period',
+            new_name='run_date',
+        ),
+    ]
@@ -1,11 +1,24 @@
 #subscription/models.py
-from django.db import models
+from collections import defaultdict
+from django.db import connection, models
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
+from dateutil.relativedelta import relativedelta
 
 User = get_user_model()
 
+
+def anniversary_on_or_before(start, on):
+    """The latest anniversary of `start` that is not after `on` (`start` itself at the earliest)."""
+    years = max(on.year - start.year, 0)
+    anniversary = start + relativedelta(years=years)
+    if anniversary > on and years:
+        # relativedelta moves a 29 February start to the 28th in other years.
+        anniversary = start + relativedelta(years=years - 1)
+    return anniversary
+
+
 class SubscriptionPlan(models.Model):
     PLAN_CHOICES = [
         ('entry', 'Entry'),
@@ -32,6 +45,11 @@ class SubscriptionPlan(models.Model):
     def yearly_price(self) -> Decimal:
         return self.monthly_price * Decimal('12') * (Decimal('1') - self.yearly_discount_percent / Decimal('100'))
 
+    def price_for(self, billing_cycle: str) -> Decimal:
+        if billing_cycle == 'yearly':
+            return self.yearly_price().quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return self.monthly_price
+
     def __str__(self):
         return self.get_name_display()
 
@@ -47,11 +65,6 @@ class UserSubscription(models.Model):
     is_active = models.BooleanField(default=True)
     billing_cycle = models.CharField(max_length=10, choices=[('monthly', 'Monthly'), ('yearly', 'Yearly')])
     
-    last_usage_reset = models.DateTimeField(null=True, blank=True)
-    
-    monthly_tickets_used = models.PositiveIntegerField(default=0)
-    yearly_tickets_used = models.PositiveIntegerField(default=0)
-    
     class Meta:
         indexes = [
             models.Index(fields=['user', 'is_active']),
@@ -64,14 +77,28 @@ class UserSubscription(models.Model):
     def is_current(self):
         return self.is_active and self.end_date >= timezone.now().date()
 
+    def current_period_start(self, on=None):
+        """First day of the allowance period containing `on`: the month, or the subscription year."""
+        on = on or timezone.now().date()
+        if self.billing_cycle == 'yearly':
+            return anniversary_on_or_before(self.start_date, on)
+        return on.replace(day=1)
+
+    def catalogue_plan(self) -> SubscriptionPlan:
+        """The plan from the in-process catalogue, unless it is already loaded on this row."""
+        if UserSubscription.plan.is_cached(self):
+            return self.plan
+        from .plan_catalogue import get_plan
+        return get_plan(self.plan_id)
+
     def get_discount(self) -> Decimal:
         if self.is_current():
-            return self.plan.ticket_discount_percent
+            return self.catalogue_plan().ticket_discount_percent
         return Decimal('0')
 
     def get_monthly_free_ticket_count(self) -> int:
         if self.is_current():
-            return self.plan.free_monthly_tickets
+            return self.catalogue_plan().free_monthly_tickets
         return 0
     
     def get_monthly_usable_ticket_count(self) -> int:
@@ -79,8 +106,190 @@ class UserSubscription(models.Model):
         if not self.is_current():
             return 0
 
-        total = self.plan.free_monthly_tickets
+        total = self.catalogue_plan().free_monthly_tickets
         if self.billing_cycle == 'yearly':
             return max(total // 12, 1)  # prevent 0
 
         return total
+
+    def period_allowance(self) -> int:
+        """Free tickets granted for one allowance period (a month, or the subscription year)."""
+        free_monthly_tickets = self.catalogue_plan().free_monthly_tickets
+        if self.billing_cycle == 'yearly':
+            return free_monthly_tickets * 12
+        return free_monthly_tickets
+
+    def tickets_used(self, on=None) -> int:
+        """Tickets used in the period containing `on`; one lookup on the usage ledger's unique key."""
+        used = (
+            SubscriptionUsage.objects
+            .filter(subscription=self, period_start=self.current_period_start(on))
+            .values_list('tickets_used', flat=True)
+            .first()
+        )
+        return used or 0
+
+    def remaining_free_tickets(self, on=None) -> int:
+        if not self.is_current():
+            return 0
+        return max(self.period_allowance() - self.tickets_used(on), 0)
+
+
+class SubscriptionUsageQuerySet(models.QuerySet):
+
+    def record(self, usages) -> int:
+        """
+        Add usage for many (subscription_id, period_start, tickets) triples at once.
+
+        One INSERT ... ON CONFLICT DO UPDATE increments each period's row in the
+        database, so concurrent writers never read-modify-write and a new period
+        simply starts a new row. Returns the number of periods touched.
+        """
+        totals = defaultdict(int)
+        for subscription_id, period_start, tickets in usages:
+            if tickets:
+                totals[(subscription_id, period_start)] += tickets
+        if not totals:
+            return 0
+
+        # ON CONFLICT cannot touch the same row twice, hence the merge above.
+        table = self.model._meta.db_table
+        now = timezone.now()
+        params = []
+        for (subscription_id, period_start), tickets in totals.items():
+            params.extend([subscription_id, period_start, tickets, now])
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(totals))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (subscription_id, period_start, tickets_used, updated_at)
+                VALUES {values}
+                ON CONFLICT (subscription_id, period_start)
+                DO UPDATE SET tickets_used = {table}.tickets_used + EXCLUDED.tickets_used,
+                              updated_at = EXCLUDED.updated_at
+                """,
+                params,
+            )
+        return len(totals)
+
+
+class SubscriptionUsage(models.Model):
+    """Free tickets used by a subscription in one allowance period; rows are only ever incremented."""
+    subscription = models.ForeignKey(UserSubscription, on_delete=models.CASCADE, related_name="usage")
+    period_start = models.DateField()
+    tickets_used = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SubscriptionUsageQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Subscription Usage"
+        verbose_name_plural = "Subscription Usage"
+        constraints = [
+            models.UniqueConstraint(fields=['subscription', 'period_start'], name='unique_usage_per_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.subscription} {self.period_start}: {self.tickets_used}"
+
+
+class StripeEvent(models.Model):
+    """A received Stripe webhook event; the unique event_id makes redeliveries no-ops."""
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_PROCESSED = 'processed'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_PROCESSED, 'Processed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Stripe Event"
+        verbose_name_plural = "Stripe Events"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.type}, {self.status})"
+
+
+class FreeTicketAllocation(models.Model):
+    """
+    One subscription's free-ticket allocation for one period, run by a worker.
+
+    The (subscription, period_start) pair is unique, so replayed webhooks and
+    retries can never allocate a period twice.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    subscription = models.ForeignKey(UserSubscription, on_delete=models.CASCADE, related_name="allocations")
+    period_start = models.DateField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Free Ticket Allocation"
+        verbose_name_plural = "Free Ticket Allocations"
+        constraints = [
+            models.UniqueConstraint(fields=['subscription', 'period_start'], name='unique_allocation_per_period'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subscription} {self.period_start} ({self.status})"
+
+
+class AllocationRun(models.Model):
+    """Checkpoint of the scheduled bulk allocation for one day; lets an interrupted run resume."""
+    run_date = models.DateField(unique=True)
+    last_subscription_id = models.BigIntegerField(default=0)
+    subscriptions_allocated = models.PositiveIntegerField(default=0)
+    tickets_allocated = models.PositiveIntegerField(default=0)
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Allocation Run"
+        verbose_name_plural = "Allocation Runs"
+
+    def __str__(self):
+        return f"Allocation run {self.run_date}"
@@ -0,0 +1,126 @@
+# subscription/plan_catalogue.py
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .models import SubscriptionPlan
+from .serializers import SubscriptionPlanSerializer
+
+PLAN_CATALOGUE_VERSION_KEY = 'subscription_plan:version'
+
+# How long a worker trusts its snapshot before re-reading the shared version.
+VERSION_CHECK_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class PlanCatalogue:
+    """
+    Every plan, loaded once per worker and shared read-only.
+
+    The plans are ordinary model instances so they can be assigned to foreign
+    keys; callers must not modify them.
+    """
+    version: int
+    plans: tuple
+    by_id: MappingProxyType
+    by_name: MappingProxyType
+    list_body: bytes
+    list_etag: str
+
+    def get(self, pk=None, name=None):
+        if name is not None:
+            return self.by_name.get(name.lower())
+        return self.by_id.get(pk)
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def cache_version() -> int:
+    version = cache.get(PLAN_CATALOGUE_VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost version key never matches an old snapshot.
+        cache.add(PLAN_CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(PLAN_CATALOGUE_VERSION_KEY, 0)
+    return version
+
+
+def invalidate_plan_catalogue():
+    """
+    Drop this worker's snapshot and bump the shared version once the transaction commits.
+
+    Doing either earlier would let a reader rebuild from the old rows and
+    cache them under the new version.
+    """
+    def bump():
+        global _snapshot
+        _snapshot = None
+        try:
+            cache.incr(PLAN_CATALOGUE_VERSION_KEY)
+        except ValueError:
+            cache.add(PLAN_CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def build_catalogue(version: int) -> PlanCatalogue:
+    """Load all plans in one query and pre-render the public plan list."""
+    plans = tuple(SubscriptionPlan.objects.order_by('monthly_price', 'id'))
+    list_body = JSONRenderer().render({
+        'success': True,
+        'message': 'All the Subscription plans retrieved successfully',
+        'data': SubscriptionPlanSerializer(plans, many=True).data,
+    })
+    return PlanCatalogue(
+        version=version,
+        plans=plans,
+        by_id=MappingProxyType({plan.id: plan for plan in plans}),
+        by_name=MappingProxyType({plan.name.lower(): plan for plan in plans}),
+        list_body=list_body,
+        list_etag=f'"{hashlib.md5(list_body, usedforsecurity=False).hexdigest()}"',
+    )
+
+
+def plan_catalogue(revalidate: bool = False) -> PlanCatalogue:
+    """
+    The current catalogue snapshot.
+
+    The shared version is re-read at most every VERSION_CHECK_SECONDS (or
+    right away with `revalidate`), so plan lookups normally cost neither a
+    query nor a cache round trip.
+    """
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and not revalidate and now - _checked_at < VERSION_CHECK_SECONDS:
+        return snapshot
+
+    version = cache_version()
+    if snapshot is not None and snapshot.version == version:
+        _checked_at = now
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_catalogue(version)
+        _checked_at = now
+        return _snapshot
+
+
+def get_plan(pk=None, name=None) -> SubscriptionPlan:
+    """A plan by id or (case-insensitive) name; raises SubscriptionPlan.DoesNotExist like a query would."""
+    plan = plan_catalogue().get(pk, name)
+    if plan is None:
+        # It may have been created by another worker since the last version check.
+        plan = plan_catalogue(revalidate=True).get(pk, name)
+    if plan is None:
+        raise SubscriptionPlan.DoesNotExist(f"No subscription plan matches {name or pk!r}.")
+    return plan
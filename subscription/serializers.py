@@ -15,14 +15,19 @@ class MySubscriptionSerializer(serializers.ModelSerializer):
     plan_name = serializers.CharField(source='plan.name', read_only=True)
     free_tickets = serializers.SerializerMethodField()
     is_current = serializers.SerializerMethodField()
+    remaining_free_tickets = serializers.SerializerMethodField()
 
     class Meta:
         model = UserSubscription
-        fields = ['plan_name', 'start_date', 'end_date', 'billing_cycle', 'is_active', 'is_current', 'free_tickets']
+        fields = ['plan_name', 'start_date', 'end_date', 'billing_cycle', 'is_active', 'is_current', 'free_tickets',
+                  'remaining_free_tickets']
 
     def get_free_tickets(self, obj):
         return obj.get_monthly_free_ticket_count()
 
+    def get_remaining_free_tickets(self, obj):
+        return obj.remaining_free_tickets()
+
     def get_is_current(self, obj):
         return obj.is_current()
     
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SubscriptionPlan
+from .plan_catalogue import invalidate_plan_catalogue
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def plan_changed(sender, instance, **kwargs):
+    invalidate_plan_catalogue()
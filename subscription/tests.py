@@ -1,3 +1,404 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from tickets.models import GiveawayTicket, TicketEntry, TicketPurchase
+from . import webhooks
+from . import allocation
+from .allocation import allocate_due_periods, enqueue_allocation, process_pending_allocations
+from .models import (
+    AllocationRun, FreeTicketAllocation, StripeEvent, SubscriptionPlan, SubscriptionUsage, UserSubscription,
+)
+from .plan_catalogue import get_plan, plan_catalogue
+from .webhooks import MAX_ATTEMPTS, ingest_event, process_pending_events
+
+User = get_user_model()
+
+
+class UsageLedgerTests(TestCase):
+
+    def setUp(self):
+        plan = SubscriptionPlan.objects.create(name='premium', monthly_price=20, free_monthly_tickets=5)
+        self.subscription = UserSubscription.objects.create(
+            user=User.objects.create_user('ledger@example.com', full_name='Ledger'),
+            plan=plan,
+            billing_cycle='monthly',
+            end_date=datetime.date.today() + datetime.timedelta(days=60),
+        )
+
+    def test_record_increments_one_row_per_period(self):
+        this_month = self.subscription.current_period_start()
+        last_month = (this_month - datetime.timedelta(days=1)).replace(day=1)
+
+        SubscriptionUsage.objects.record([(self.subscription.id, this_month, 2), (self.subscription.id, this_month, 1)])
+        SubscriptionUsage.objects.record([(self.subscription.id, this_month, 1), (self.subscription.id, last_month, 4)])
+
+        self.assertEqual(SubscriptionUsage.objects.filter(subscription=self.subscription).count(), 2)
+        self.assertEqual(self.subscription.tickets_used(), 4)
+        self.assertEqual(self.subscription.tickets_used(last_month), 4)
+
+    def test_remaining_is_clamped_and_starts_fresh_each_period(self):
+        this_month = self.subscription.current_period_start()
+        SubscriptionUsage.objects.record([(self.subscription.id, this_month, 9)])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.subscription.remaining_free_tickets(), 0)
+        next_month = (this_month + datetime.timedelta(days=31)).replace(day=1)
+        self.assertEqual(self.subscription.remaining_free_tickets(next_month), 5)
+
+
+    def test_yearly_periods_roll_over_on_the_anniversary(self):
+        self.subscription.billing_cycle = 'yearly'
+        self.subscription.start_date = datetime.date(2024, 3, 15)
+        self.subscription.end_date = datetime.date(2027, 3, 15)
+        self.subscription.save()
+        eve, anniversary = datetime.date(2025, 3, 14), datetime.date(2025, 3, 15)
+
+        self.assertEqual(self.subscription.current_period_start(eve), datetime.date(2024, 3, 15))
+        self.assertEqual(self.subscription.current_period_start(anniversary), anniversary)
+        self.assertEqual(self.subscription.current_period_start(datetime.date(2026, 1, 1)), anniversary)
+
+        SubscriptionUsage.objects.record([(self.subscription.id, self.subscription.current_period_start(eve), 60)])
+        self.assertEqual(self.subscription.remaining_free_tickets(eve), 0)
+        self.assertEqual(self.subscription.remaining_free_tickets(anniversary), 60)
+
+    def test_leap_day_start_rolls_over_on_the_28th(self):
+        self.subscription.billing_cycle = 'yearly'
+        self.subscription.start_date = datetime.date(2024, 2, 29)
+
+        self.assertEqual(self.subscription.current_period_start(datetime.date(2025, 2, 27)), datetime.date(2024, 2, 29))
+        self.assertEqual(self.subscription.current_period_start(datetime.date(2025, 2, 28)), datetime.date(2025, 2, 28))
+        self.assertEqual(self.subscription.current_period_start(datetime.date(2028, 3, 1)), datetime.date(2028, 2, 29))
+
+
+class PlanCatalogueTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan = SubscriptionPlan.objects.create(name='entry', monthly_price=5, free_monthly_tickets=1)
+        self.client = APIClient()
+
+    def test_plan_list_needs_no_queries_and_honours_etag(self):
+        self.client.get('/api/subscription/plans/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/subscription/plans/')
+            cached = self.client.get('/api/subscription/plans/', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([plan['name'] for plan in response.json()['data']], ['entry'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_saving_a_plan_refreshes_the_catalogue(self):
+        etag = self.client.get('/api/subscription/plans/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.free_monthly_tickets = 4
+            self.plan.save()
+
+        response = self.client.get('/api/subscription/plans/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0]['free_monthly_tickets'], 4)
+        self.assertEqual(get_plan(name='ENTRY').free_monthly_tickets, 4)
+
+    def test_uncommitted_change_leaves_the_catalogue_alone(self):
+        catalogue = plan_catalogue(revalidate=True)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.plan.free_monthly_tickets = 9
+            self.plan.save()
+            self.assertIs(plan_catalogue(revalidate=True), catalogue)
+
+        # Never committed: the callbacks are dropped, as on a rollback.
+        self.assertEqual(len(callbacks), 1)
+        self.assertIs(plan_catalogue(revalidate=True), catalogue)
+        self.assertEqual(get_plan(self.plan.pk).free_monthly_tickets, 1)
+
+
+def checkout_event(event_id, **session):
+    return {
+        'id': event_id,
+        'type': 'checkout.session.completed',
+        'data': {'object': {'id': f'cs_{event_id}', 'payment_status': 'paid', **session}},
+    }
+
+
+class StripeEventTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('stripe@example.com', full_name='Stripe')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan = SubscriptionPlan.objects.create(name='gold', monthly_price=10, free_monthly_tickets=3)
+        self.subscribe = checkout_event('evt_sub', subscription='sub_1', metadata={
+            'user_id': str(self.user.id), 'plan_id': str(self.plan.id), 'billing_cycle': 'monthly',
+        })
+
+    def due_now(self):
+        StripeEvent.objects.update(next_attempt_at=timezone.now())
+
+    def test_redelivered_event_is_stored_once(self):
+        ingest_event(self.subscribe)
+        ingest_event(self.subscribe)
+
+        self.assertEqual(StripeEvent.objects.filter(event_id='evt_sub').count(), 1)
+
+    def test_event_takes_effect_exactly_once(self):
+        ingest_event(self.subscribe)
+        self.assertEqual(process_pending_events(), {'processed': 1, 'failed': 0, 'batches': 1})
+
+        ingest_event(self.subscribe)
+        self.assertEqual(process_pending_events()['processed'], 0)
+
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (StripeEvent.STATUS_PROCESSED, 1))
+        self.assertEqual(UserSubscription.objects.filter(user=self.user, is_active=True).count(), 1)
+        self.assertEqual(FreeTicketAllocation.objects.count(), 1)
+
+    def test_failures_back_off_until_max_attempts(self):
+        ingest_event(self.subscribe)
+        failing = mock.Mock(side_effect=RuntimeError('boom'))
+
+        with mock.patch.dict(webhooks.EVENT_HANDLERS, {'checkout.session.completed': failing}), \
+                self.assertLogs('subscription.webhooks', 'ERROR'):
+            process_pending_events()
+            event = StripeEvent.objects.get()
+            self.assertEqual((event.status, event.attempts, event.last_error), (StripeEvent.STATUS_PENDING, 1, 'boom'))
+            self.assertGreater(event.next_attempt_at, timezone.now() + webhooks.retry_delay(1) / 2)
+            # Not due yet: the backoff keeps it out of the next run.
+            self.assertEqual(process_pending_events()['failed'], 0)
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                self.due_now()
+                process_pending_events()
+
+            self.due_now()
+            self.assertEqual(process_pending_events()['failed'], 0)
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (StripeEvent.STATUS_FAILED, MAX_ATTEMPTS))
+        self.assertEqual(failing.call_count, MAX_ATTEMPTS)
+        self.assertEqual(webhooks.retry_delay(2), 2 * webhooks.retry_delay(1))
+
+    def test_sold_out_purchase_fails_without_retry(self):
+        giveaway = GiveawayTicket.objects.create(
+            title='Gone', price=5, total_available=1,
+            ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        purchase = TicketPurchase.objects.create(
+            user=self.user, ticket=giveaway, quantity=2, stripe_checkout_session_id='cs_evt_buy',
+        )
+        ingest_event(checkout_event('evt_buy', amount_total=1000))
+
+        with self.assertLogs('subscription.webhooks', 'ERROR'):
+            self.assertEqual(process_pending_events()['processed'], 1)
+
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.payment_status, 'failed')
+        self.assertFalse(TicketEntry.objects.filter(purchase=purchase).exists())
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.STATUS_PROCESSED)
+
+    def test_crash_after_the_effect_rolls_it_back(self):
+        def crash(session):
+            webhooks.handle_checkout_completed(session)
+            raise RuntimeError('worker died before marking the event')
+
+        ingest_event(self.subscribe)
+        with mock.patch.dict(webhooks.EVENT_HANDLERS, {'checkout.session.completed': crash}), \
+                self.assertLogs('subscription.webhooks', 'ERROR'):
+            process_pending_events()
+
+        self.assertFalse(UserSubscription.objects.exists())
+        self.assertFalse(FreeTicketAllocation.objects.exists())
+
+        self.due_now()
+        process_pending_events()
+
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (StripeEvent.STATUS_PROCESSED, 2))
+        self.assertEqual(UserSubscription.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(FreeTicketAllocation.objects.count(), 1)
+
+
+class BulkAllocationTests(TestCase):
+
+    def setUp(self):
+        self.giveaway = GiveawayTicket.objects.create(
+            title='Monthly', price=5, total_available=100,
+            ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        self.plan = SubscriptionPlan.objects.create(name='silver', monthly_price=8, free_monthly_tickets=2)
+        self.subs = [self.subscribe(f'member{i}@example.com') for i in range(3)]
+
+    def subscribe(self, email, billing_cycle='monthly'):
+        return UserSubscription.objects.create(
+            user=User.objects.create_user(email, full_name=email), plan=self.plan, billing_cycle=billing_cycle,
+            end_date=datetime.date.today() + datetime.timedelta(days=365),
+        )
+
+    def tickets(self, sub, source='subscription'):
+        return sum(TicketPurchase.objects.filter(user=sub.user, source=source).values_list('quantity', flat=True))
+
+    def test_first_timers_get_the_bonus_like_the_webhook_path(self):
+        TicketPurchase.objects.create(user=self.subs[0].user, ticket=self.giveaway, quantity=1)
+
+        result = allocate_due_periods(chunk_size=2)
+
+        self.assertEqual(result['subscriptions'], 3)
+        self.assertEqual(result['tickets'], 3 * 2 + 2)
+        self.assertEqual([self.tickets(sub, 'first_time_bonus') for sub in self.subs], [0, 1, 1])
+        self.assertEqual(TicketEntry.objects.count(), 8)
+        self.giveaway.refresh_from_db()
+        self.assertEqual(self.giveaway.total_available, 92)
+        self.assertTrue(result['finished'])
+
+    def test_interrupted_run_resumes_after_the_last_chunk(self):
+        real_chunk = allocation._allocate_chunk
+        calls = []
+
+        def crash_on_second(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('worker stopped')
+            return real_chunk(*args)
+
+        with mock.patch('subscription.allocation._allocate_chunk', crash_on_second), self.assertRaises(RuntimeError):
+            allocate_due_periods(chunk_size=1)
+        run = AllocationRun.objects.get()
+        self.assertEqual((run.last_subscription_id, run.subscriptions_allocated), (self.subs[0].id, 1))
+
+        result = allocate_due_periods(chunk_size=1)
+
+        self.assertEqual((result['subscriptions'], result['finished']), (3, True))
+        self.assertEqual([self.tickets(sub) for sub in self.subs], [2, 2, 2])
+        self.assertEqual(FreeTicketAllocation.objects.filter(status=FreeTicketAllocation.STATUS_DONE).count(), 3)
+
+    def test_queued_webhook_job_is_taken_over_and_running_one_left_alone(self):
+        queued, running, _ = self.subs
+        enqueue_allocation(queued)
+        enqueue_allocation(running)
+        FreeTicketAllocation.objects.filter(subscription=running).update(status=FreeTicketAllocation.STATUS_RUNNING)
+
+        result = allocate_due_periods()
+
+        self.assertEqual(result['subscriptions'], 2)
+        self.assertEqual((self.tickets(queued), self.tickets(queued, 'first_time_bonus')), (2, 1))
+        self.assertEqual(self.tickets(running), 0)
+        job = FreeTicketAllocation.objects.get(subscription=queued)
+        self.assertEqual((job.status, job.attempts), (FreeTicketAllocation.STATUS_DONE, 1))
+        self.assertEqual(process_pending_allocations()['allocated'], 0)
+        self.assertEqual(self.tickets(queued), 2)
+
+    def test_job_queued_mid_chunk_keeps_its_period(self):
+        late = self.subs[1]
+        real_bulk_create = FreeTicketAllocation.objects.bulk_create
+
+        def webhook_enqueues_first(objs, **kwargs):
+            # The webhook path queues `late` after the chunk read its allocations.
+            real_bulk_create([FreeTicketAllocation(subscription=late, period_start=late.current_period_start())])
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(FreeTicketAllocation.objects, 'bulk_create', webhook_enqueues_first):
+            result = allocate_due_periods()
+
+        self.assertEqual(result['subscriptions'], 2)
+        self.assertEqual(self.tickets(late), 0)
+        self.assertEqual(FreeTicketAllocation.objects.get(subscription=late).status, FreeTicketAllocation.STATUS_PENDING)
+        self.assertEqual(process_pending_allocations()['allocated'], 1)
+        self.assertEqual([self.tickets(sub) for sub in self.subs], [2, 2, 2])
+
+    def test_later_run_in_the_month_picks_up_an_anniversary(self):
+        today = datetime.date.today()
+        started = datetime.date(today.year - 1, today.month, min(today.day, 28))
+        anniversary = started.replace(year=today.year)
+        yearly = self.subscribe('yearly@example.com', billing_cycle='yearly')
+        UserSubscription.objects.filter(pk=yearly.pk).update(start_date=started)
+
+        for run_date in (anniversary - datetime.timedelta(days=1), anniversary):
+            at = timezone.make_aware(datetime.datetime.combine(run_date, datetime.time(12)))
+            with mock.patch('django.utils.timezone.now', return_value=at):
+                self.assertTrue(allocate_due_periods()['finished'])
+
+        self.assertEqual(AllocationRun.objects.count(), 2)
+        self.assertEqual(
+            set(FreeTicketAllocation.objects.filter(subscription=yearly).values_list('period_start', flat=True)),
+            {started, anniversary},
+        )
+
+    def test_earlier_periods_do_not_count_as_allocated(self):
+        last_month = (self.subs[0].current_period_start() - datetime.timedelta(days=1)).replace(day=1)
+        FreeTicketAllocation.objects.create(
+            subscription=self.subs[0], period_start=last_month, status=FreeTicketAllocation.STATUS_DONE,
+        )
+
+        self.assertEqual(allocate_due_periods()['subscriptions'], 3)
+        self.assertEqual(self.tickets(self.subs[0]), 2)
+
+    def test_taken_ticket_ids_are_replaced(self):
+        TicketEntry.objects.create(
+            ticket_id='TAKEN0000000', user=self.subs[0].user, giveaway=self.giveaway,
+        )
+        real_ids = allocation.allocate_ticket_ids
+
+        with mock.patch(
+            'subscription.allocation.allocate_ticket_ids', lambda count: ['TAKEN0000000'] + real_ids(count - 1),
+        ):
+            allocate_due_periods()
+
+        for purchase in TicketPurchase.objects.filter(source__in=['subscription', 'first_time_bonus']):
+            self.assertEqual(
+                sorted(purchase.unique_ticket_ids),
+                sorted(TicketEntry.objects.filter(purchase=purchase).values_list('ticket_id', flat=True)),
+            )
+        self.assertEqual(TicketEntry.objects.filter(ticket_id='TAKEN0000000').get().purchase, None)
+
+
+class AllocationQueueTests(TestCase):
+
+    def setUp(self):
+        GiveawayTicket.objects.create(
+            title='Queue', price=5, total_available=100,
+            ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        plan = SubscriptionPlan.objects.create(name='bronze', monthly_price=4, free_monthly_tickets=3)
+        self.sub = UserSubscription.objects.create(
+            user=User.objects.create_user('queue@example.com', full_name='Queue'), plan=plan,
+            billing_cycle='monthly', end_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+
+    def issued(self):
+        return TicketEntry.objects.filter(user=self.sub.user).count()
+
+    def test_duplicate_enqueue_is_one_job(self):
+        enqueue_allocation(self.sub)
+        enqueue_allocation(self.sub)
+
+        self.assertEqual(FreeTicketAllocation.objects.count(), 1)
+        self.assertEqual(process_pending_allocations()['allocated'], 1)
+        enqueue_allocation(self.sub)
+        self.assertEqual(process_pending_allocations()['allocated'], 0)
+        self.assertEqual(self.issued(), 3 + 1)
+
+    def test_retry_after_a_failure_issues_once(self):
+        real_allocate = allocation.allocate_free_tickets
+
+        def allocate_then_fail(subscription_id):
+            real_allocate(subscription_id)
+            raise RuntimeError('lost the connection')
+
+        enqueue_allocation(self.sub)
+        with mock.patch('subscription.allocation.allocate_free_tickets', allocate_then_fail), \
+                self.assertLogs('subscription.allocation', 'WARNING'):
+            self.assertEqual(process_pending_allocations()['failed'], 1)
+        self.assertEqual(self.issued(), 0)
+
+        FreeTicketAllocation.objects.update(next_attempt_at=timezone.now())
+        process_pending_allocations()
 
-# Create your tests here.
+        job = FreeTicketAllocation.objects.get()
+        self.assertEqual((job.status, job.attempts), (FreeTicketAllocation.STATUS_DONE, 2))
+        self.assertEqual(self.issued(), 3 + 1)
+        self.assertEqual(GiveawayTicket.objects.get().total_available, 96)
@@ -4,7 +4,8 @@ from django.utils.timezone import now
 from dateutil.relativedelta import relativedelta
 import logging
 from typing import Tuple
-from .models import SubscriptionPlan, UserSubscription
+from .models import UserSubscription
+from .plan_catalogue import get_plan
 from tickets.models import GiveawayTicket, TicketPurchase
 from datetime import datetime
 
@@ -19,18 +20,24 @@ def calculate_subscription_end_date(billing_cycle: str, start_date: datetime = N
 
 def get_subscription_benefits(plan_name: str) -> Tuple[int, float]:
     """Return free tickets and discount percentage for a plan."""
-    plan = SubscriptionPlan.objects.get(name=plan_name)
+    plan = get_plan(name=plan_name)
     return plan.free_monthly_tickets, plan.ticket_discount_percent
 
 
-from django.db import transaction
-from django.utils.timezone import now
-from tickets.utils import generate_unique_purchase_id
-from tickets.models import GiveawayTicket, TicketPurchase
-from subscription.models import UserSubscription
-import logging
+from tickets.ticket_ids import allocate_ticket_ids
+from tickets.models import TicketEntry
+from tickets.inventory import reserve_stock
+
+# Extra free tickets for a subscriber's very first allocation.
+FIRST_TIME_BONUS_TICKETS = 1
+
+
+def period_ticket_count(subscription: UserSubscription) -> int:
+    """Free tickets for one period: a month's worth, or twelve months up front for yearly plans."""
+    if subscription.billing_cycle == 'yearly':
+        return subscription.plan.free_monthly_tickets * 12
+    return subscription.plan.free_monthly_tickets
 
-logger = logging.getLogger(__name__)
 
 @transaction.atomic
 def allocate_free_tickets(user_subscription_id):
@@ -38,10 +45,7 @@ def allocate_free_tickets(user_subscription_id):
     user = sub.user
     current_month = now().date().replace(day=1)
 
-    active_giveaway = GiveawayTicket.objects.filter(
-        total_available__gt=0,
-        ticket_expiry_date__gte=now().date()
-    ).order_by('created_at').first()
+    active_giveaway = GiveawayTicket.objects.available().order_by('created_at').first()
 
     if not active_giveaway:
         raise Exception("No active giveaway ticket available.")
@@ -56,46 +60,48 @@ def allocate_free_tickets(user_subscription_id):
         purchase_date__date__gte=current_month
     ).exists()
 
-    ticket_count = 0
-    bonus_count = 1 if is_first_time else 0
+    bonus_count = FIRST_TIME_BONUS_TICKETS if is_first_time else 0
 
     if sub.billing_cycle == 'yearly':
-        ticket_count = sub.plan.free_monthly_tickets * 12
+        ticket_count = period_ticket_count(sub)
     else:
-        ticket_count = 0 if already_allocated else sub.plan.free_monthly_tickets
+        ticket_count = 0 if already_allocated else period_ticket_count(sub)
 
-    total_allocated = 0
+    total_allocated = ticket_count + bonus_count
+    if not reserve_stock(active_giveaway, total_allocated):
+        raise Exception("Not enough giveaway tickets available for free allocation.")
 
     # Allocate standard subscription tickets
     if ticket_count > 0:
-        ticket_ids = [generate_unique_purchase_id() for _ in range(ticket_count)]
-        TicketPurchase.objects.create(
+        ticket_ids = allocate_ticket_ids(ticket_count)
+        purchase = TicketPurchase.objects.create(
             user=user,
             ticket=active_giveaway,
             quantity=ticket_count,
             unique_ticket_ids=ticket_ids,
             payment_status='succeeded',
-            source='subscription'
+            source='subscription',
+            unit_price=active_giveaway.price,
+            discount_percent=0,
+            amount_charged=0,
         )
-        active_giveaway.total_available -= ticket_count
-        total_allocated += ticket_count
+        TicketEntry.objects.issue_for_purchase(purchase)
 
     # Allocate bonus ticket for first-time subscriber
     if bonus_count > 0:
-        ticket_ids = [generate_unique_purchase_id()]
-        TicketPurchase.objects.create(
+        ticket_ids = allocate_ticket_ids(bonus_count)
+        purchase = TicketPurchase.objects.create(
             user=user,
             ticket=active_giveaway,
-            quantity=1,
+            quantity=bonus_count,
             unique_ticket_ids=ticket_ids,
             payment_status='succeeded',
-            source='first_time_bonus'
+            source='first_time_bonus',
+            unit_price=active_giveaway.price,
+            discount_percent=0,
+            amount_charged=0,
         )
-        active_giveaway.total_available -= 1
-        total_allocated += 1
-
-    if total_allocated > 0:
-        active_giveaway.save()
+        TicketEntry.objects.issue_for_purchase(purchase)
 
     logger.info(f"[FREE TICKET ALLOCATED] user={user.email}, plan={sub.plan.name}, "
                 f"standard={ticket_count}, bonus={bonus_count}, total={total_allocated}")
@@ -3,10 +3,16 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from .models import SubscriptionPlan, UserSubscription
 from .serializers import SubscriptionPlanSerializer, MySubscriptionSerializer, SubscribeInputSerializer
-from .utils import calculate_subscription_end_date, allocate_free_tickets
+from core.conditional import conditional_get
+from .plan_catalogue import get_plan, plan_catalogue
+from .utils import calculate_subscription_end_date
+from .webhooks import ingest_event
+from metrics.rollups import day_start, record as record_metrics
+import json
 import stripe
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
@@ -68,14 +74,13 @@ class AdminSubscriptionCRUDView(APIView):
 class PlansListView(APIView):
     permission_classes = [AllowAny]
 
+    def get_etag(self, request):
+        return plan_catalogue().list_etag
+
+    @conditional_get
     def get(self, request):
-        plans = SubscriptionPlan.objects.all().order_by('monthly_price')
-        serializer = SubscriptionPlanSerializer(plans, many=True)
-        return Response({
-            'success': True,
-            'message': 'All the Subscription plans retrieved successfully',
-            'data': serializer.data
-        })
+        # Rendered once per catalogue version; no database query.
+        return HttpResponse(plan_catalogue().list_body, content_type='application/json')
 
 class SubscribeView(APIView):
     permission_classes = [IsAuthenticated]
@@ -89,7 +94,7 @@ class SubscribeView(APIView):
         billing_cycle = serializer.validated_data['billing_cycle']
 
         try:
-            plan = SubscriptionPlan.objects.get(name__iexact=name)
+            plan = get_plan(name=name)
         except SubscriptionPlan.DoesNotExist:
             return Response({
                 "detail": f"No subscription plan found for name '{name}'."}, status=404)
@@ -192,6 +197,7 @@ class CancelSubscriptionView(APIView):
             stripe.Subscription.delete(sub.stripe_subscription_id)
             sub.is_active = False
             sub.save()
+            record_metrics(at=day_start(sub.start_date), subscriptions_cancelled=1)
             return Response({
                 'success': True,
                 'message': 'Subscription cancelled successfully.',
@@ -200,7 +206,6 @@ class CancelSubscriptionView(APIView):
             return Response({"error": str(e)}, status=500)
 
 
-from subscription.models import UserSubscription
 from tickets.models import TicketPurchase
 from tickets.serializers import TicketPurchaseDetailsSerializer
 
@@ -218,7 +223,7 @@ class MySubscriptionTicketsView(APIView):
         free_tickets = TicketPurchase.objects.filter(
             user=user,
             source__in=['subscription', 'first_time_bonus']
-        ).order_by('-purchase_date')
+        ).select_related('ticket', 'user').with_pricing().order_by('-purchase_date')
 
         serializer = TicketPurchaseDetailsSerializer(free_tickets, many=True)
 
@@ -248,68 +253,21 @@ class StripeWebhookSubscriptionView(APIView):
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
 
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
             )
         except (ValueError, stripe.error.SignatureVerificationError):
             return Response(status=400)
 
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            user_id = session['metadata']['user_id']
-            plan_id = session['metadata']['plan_id']
-            billing_cycle = session['metadata']['billing_cycle']
-            stripe_sub_id = session['subscription']
-
-            user = get_object_or_404(get_user_model(), id=user_id)
-            plan = get_object_or_404(SubscriptionPlan, id=plan_id)
-
-            start = now().date()
-            end = calculate_subscription_end_date(billing_cycle, start)
-
-            sub = UserSubscription.objects.filter(user_id=user_id).first()
-
-            if sub:
-                sub.plan = plan
-                sub.billing_cycle = billing_cycle
-                sub.start_date = start
-                sub.end_date = end
-                sub.is_active = True
-                sub.stripe_subscription_id = stripe_sub_id
-                sub.save()
-            else:
-                sub = UserSubscription.objects.create(
-                    user=user,
-                    plan=plan,
-                    billing_cycle=billing_cycle,
-                    start_date=start,
-                    end_date=end,
-                    is_active=True,
-                    stripe_subscription_id=stripe_sub_id
-                )
-
-            allocate_free_tickets(sub.id)
-
+        # Applied by the process_stripe_events worker.
+        ingest_event(json.loads(payload))
         return Response(status=200)
 
 
 #########
 
 
-from django.http import HttpResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
-from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny
-from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from django.core.exceptions import ValidationError
-from django.utils import timezone
-import stripe
 import logging
-from subscription.models import UserSubscription, SubscriptionPlan
-from tickets.models import TicketPurchase
-from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -323,7 +281,7 @@ class StripeWebhookView(APIView):
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
 
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
             )
         except ValueError as e:
@@ -333,85 +291,7 @@ class StripeWebhookView(APIView):
             logger.error(f"Invalid signature: {str(e)}")
             return Response(status=400)
 
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            metadata = session.get('metadata', {})
-
-            # Check if the event is for a subscription (based on metadata)
-            if metadata.get('user_id') and metadata.get('plan_id') and metadata.get('billing_cycle'):
-                return self.handle_subscription_event(session)
-            # Check if the event is for a purchase (based on session ID in TicketPurchase)
-            elif TicketPurchase.objects.filter(stripe_checkout_session_id=session['id']).exists():
-                return self.handle_purchase_event(session)
-            else:
-                logger.error("Webhook event does not match subscription or purchase criteria")
-                return Response(status=400)
-
+        # Stored and acknowledged right away; the process_stripe_events worker
+        # applies it (once, however often Stripe redelivers it).
+        ingest_event(json.loads(payload))
         return Response(status=200)
-
-    def handle_subscription_event(self, session):
-        user_id = session['metadata']['user_id']
-        plan_id = session['metadata']['plan_id']
-        billing_cycle = session['metadata']['billing_cycle']
-        stripe_sub_id = session['subscription']
-
-        user = get_object_or_404(get_user_model(), id=user_id)
-        plan = get_object_or_404(SubscriptionPlan, id=plan_id)
-
-        start = timezone.now().date()
-        end = calculate_subscription_end_date(billing_cycle, start)
-
-        sub = UserSubscription.objects.filter(user_id=user_id).first()
-
-        if sub:
-            sub.plan = plan
-            sub.billing_cycle = billing_cycle
-            sub.start_date = start
-            sub.end_date = end
-            sub.is_active = True
-            sub.stripe_subscription_id = stripe_sub_id
-            sub.save()
-            user.is_subscribed = True
-            user.save()
-        else:
-            sub = UserSubscription.objects.create(
-                user=user,
-                plan=plan,
-                billing_cycle=billing_cycle,
-                start_date=start,
-                end_date=end,
-                is_active=True,
-                stripe_subscription_id=stripe_sub_id
-            )
-
-        allocate_free_tickets(sub.id)
-        logger.info(f"Subscription processed for user: {user_id}, subscription: {sub.id}")
-        return Response(status=200)
-
-    def handle_purchase_event(self, session):
-        purchase = TicketPurchase.objects.filter(stripe_checkout_session_id=session['id']).first()
-
-        if purchase and session.get('payment_status') == 'paid':
-            purchase.payment_status = 'succeeded'
-            purchase.stripe_payment_intent = session.get('payment_intent')
-
-            try:
-                purchase.confirm_purchase()
-            except ValidationError as e:
-                purchase.payment_status = 'failed'
-                purchase.save()
-                logger.error(f"Purchase confirmation failed: {str(e)}")
-                return Response(status=400)
-            except Exception as e:
-                purchase.payment_status = 'failed'
-                purchase.save()
-                logger.exception(f"Unexpected error in purchase confirmation: {str(e)}")
-                return Response(status=500)
-
-            purchase.save()
-            logger.info(f"Ticket purchase confirmed: {purchase.id}")
-        else:
-            logger.error(f"No valid purchase found or payment not completed for session: {session['id']}")
-            return Response(status=400)
-
-        return Response(status=200)
\ No newline at end of file
@@ -0,0 +1,205 @@
+# subscription/webhooks.py
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from metrics.rollups import day_start, record as record_metrics
+from tickets.models import TicketPurchase
+from .models import StripeEvent, UserSubscription
+from .allocation import enqueue_allocation
+from .plan_catalogue import get_plan
+from .utils import calculate_subscription_end_date
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'STRIPE_EVENT_BATCH_SIZE', 20)
+MAX_ATTEMPTS = getattr(settings, 'STRIPE_EVENT_MAX_ATTEMPTS', 8)
+RETRY_BACKOFF_SECONDS = getattr(settings, 'STRIPE_EVENT_RETRY_BACKOFF', 30)
+MAX_BACKOFF_SECONDS = 60 * 60
+# Events claimed by a worker that died mid-batch are released after this long.
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+
+def ingest_event(payload: dict):
+    """
+    Store a verified webhook event for the worker; one INSERT.
+
+    Stripe redelivers events it did not see acknowledged, so an event ID that
+    is already stored is silently ignored.
+    """
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=payload['id'], type=payload['type'], payload=payload)],
+        ignore_conflicts=True,
+    )
+
+
+def activate_subscription(session: dict):
+    metadata = session['metadata']
+    user_id = metadata['user_id']
+    plan = get_plan(int(metadata['plan_id']))
+    billing_cycle = metadata['billing_cycle']
+    user = get_user_model().objects.get(id=user_id)
+
+    start = timezone.now().date()
+    end = calculate_subscription_end_date(billing_cycle, start)
+
+    sub = UserSubscription.objects.select_for_update().filter(user_id=user_id).first()
+    was_active = bool(sub and sub.is_active)
+
+    if sub:
+        sub.plan = plan
+        sub.billing_cycle = billing_cycle
+        sub.start_date = start
+        sub.end_date = end
+        sub.is_active = True
+        sub.stripe_subscription_id = session.get('subscription')
+        sub.save()
+    else:
+        sub = UserSubscription.objects.create(
+            user=user,
+            plan=plan,
+            billing_cycle=billing_cycle,
+            start_date=start,
+            end_date=end,
+            is_active=True,
+            stripe_subscription_id=session.get('subscription'),
+        )
+    user.is_subscribed = True
+    user.save(update_fields=['is_subscribed'])
+
+    # Free tickets are allocated by the process_ticket_allocations worker.
+    enqueue_allocation(sub)
+    if not was_active:
+        record_metrics(
+            at=day_start(start), subscriptions_started=1, subscription_revenue=plan.price_for(billing_cycle),
+        )
+    logger.info(f"Subscription processed for user: {user_id}, subscription: {sub.id}")
+
+
+def confirm_checkout_purchase(session: dict):
+    purchase = TicketPurchase.objects.select_for_update().filter(stripe_checkout_session_id=session['id']).first()
+    if not purchase or session.get('payment_status') != 'paid':
+        logger.error(f"No valid purchase found or payment not completed for session: {session['id']}")
+        return
+    if purchase.payment_status == 'succeeded':
+        logger.info(f"Purchase {purchase.id} already confirmed; skipping session {session['id']}.")
+        return
+
+    purchase.payment_status = 'succeeded'
+    purchase.stripe_payment_intent = session.get('payment_intent')
+    # Stripe reports the charged total in the smallest currency unit.
+    amount_total = session.get('amount_total')
+    amount_charged = Decimal(amount_total) / 100 if amount_total is not None else None
+
+    try:
+        purchase.confirm_purchase(amount_charged=amount_charged)
+    except ValidationError as e:
+        # Sold out: retrying will not help, so record the failure and finish.
+        purchase.payment_status = 'failed'
+        purchase.save(update_fields=['payment_status', 'stripe_payment_intent'])
+        logger.error(f"Purchase confirmation failed: {str(e)}")
+        return
+    logger.info(f"Ticket purchase confirmed: {purchase.id}")
+
+
+def handle_checkout_completed(session: dict):
+    metadata = session.get('metadata') or {}
+    if metadata.get('user_id') and metadata.get('plan_id') and metadata.get('billing_cycle'):
+        activate_subscription(session)
+    elif TicketPurchase.objects.filter(stripe_checkout_session_id=session['id']).exists():
+        confirm_checkout_purchase(session)
+    else:
+        logger.error(f"Checkout session {session['id']} matches no subscription or purchase.")
+
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+}
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2x base, 4x base... capped at one hour."""
+    return timedelta(seconds=min(RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def release_stale_locks() -> int:
+    cutoff = timezone.now() - LOCK_TIMEOUT
+    return StripeEvent.objects.filter(
+        status=StripeEvent.STATUS_PROCESSING, locked_at__lt=cutoff
+    ).update(status=StripeEvent.STATUS_PENDING, locked_at=None)
+
+
+def claim_batch(batch_size: int = BATCH_SIZE) -> list:
+    """Claim up to `batch_size` due events, oldest first; SKIP LOCKED keeps parallel workers apart."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            StripeEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=StripeEvent.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('received_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        StripeEvent.objects.filter(id__in=ids, status=StripeEvent.STATUS_PENDING).update(
+            status=StripeEvent.STATUS_PROCESSING, locked_at=now
+        )
+    return list(
+        StripeEvent.objects.filter(id__in=ids, status=StripeEvent.STATUS_PROCESSING, locked_at=now)
+        .order_by('received_at', 'id')
+    )
+
+
+def process_event(event: StripeEvent) -> bool:
+    """
+    Apply one event's effects and mark it processed in the same transaction.
+
+    Either both commit or neither does, so each event takes effect exactly
+    once; a failure rolls back and schedules a retry.
+    """
+    handler = EVENT_HANDLERS.get(event.type)
+    try:
+        with transaction.atomic():
+            if handler:
+                handler(event.payload['data']['object'])
+            StripeEvent.objects.filter(pk=event.pk).update(
+                status=StripeEvent.STATUS_PROCESSED,
+                attempts=F('attempts') + 1,
+                processed_at=timezone.now(),
+                locked_at=None,
+                last_error='',
+            )
+        return True
+    except Exception as e:
+        logger.exception(f"Stripe event {event.event_id} ({event.type}) failed: {e}")
+        attempts = event.attempts + 1
+        StripeEvent.objects.filter(pk=event.pk).update(
+            status=StripeEvent.STATUS_FAILED if attempts >= MAX_ATTEMPTS else StripeEvent.STATUS_PENDING,
+            attempts=attempts,
+            next_attempt_at=timezone.now() + retry_delay(attempts),
+            locked_at=None,
+            last_error=str(e),
+        )
+        return False
+
+
+def process_pending_events(batch_size: int = BATCH_SIZE) -> dict:
+    """Work through every due event, batch by batch."""
+    release_stale_locks()
+    totals = {'processed': 0, 'failed': 0, 'batches': 0}
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            break
+        for event in batch:
+            totals['processed' if process_event(event) else 'failed'] += 1
+        totals['batches'] += 1
+    return totals
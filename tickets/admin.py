@@ -1,15 +1,24 @@
 from django.contrib import admin
-from .models import GiveawayTicket, TicketPurchase
+from .models import GiveawayTicket, GiveawayStockShard, TicketPurchase, TicketEntry
+
+
+class GiveawayStockShardInline(admin.TabularInline):
+    model = GiveawayStockShard
+    extra = 0
+    can_delete = False
+    readonly_fields = ('index', 'available')
 
 
 @admin.register(GiveawayTicket)
 class GiveawayTicketAdmin(admin.ModelAdmin):
+    inlines = [GiveawayStockShardInline]
     list_display = (
         'id',
         'ticket_id',
         'title',
         'price',
         'total_available',
+        'stock_shards',
         'ticket_expiry_date',
         'is_available_status',
         'created_at',
@@ -40,7 +49,11 @@ class TicketPurchaseAdmin(admin.ModelAdmin):
     list_filter = ('payment_status', 'is_used', 'purchase_date')
     search_fields = ('user__email', 'stripe_payment_intent', 'stripe_checkout_session_id')
     ordering = ('-purchase_date',)
-    readonly_fields = ('total_price_display', 'unique_ticket_ids')
+    readonly_fields = ('total_price_display', 'unit_price', 'discount_percent', 'amount_charged', 'unique_ticket_ids')
+    list_select_related = ('user', 'ticket')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_pricing()
 
     def user_email(self, obj):
         return obj.user.email
@@ -53,3 +66,14 @@ class TicketPurchaseAdmin(admin.ModelAdmin):
     def total_price_display(self, obj):
         return f"${obj.total_price:.2f}"
     total_price_display.short_description = "Total Price"
+    total_price_display.admin_order_field = 'final_price'
+
+
+@admin.register(TicketEntry)
+class TicketEntryAdmin(admin.ModelAdmin):
+    list_display = ('ticket_id', 'user', 'giveaway', 'source', 'state', 'created_at', 'updated_at')
+    list_filter = ('state', 'source', 'giveaway')
+    search_fields = ('ticket_id', 'user__email')
+    raw_id_fields = ('user', 'purchase')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('-created_at',)
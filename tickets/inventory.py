@@ -0,0 +1,132 @@
+# tickets/inventory.py
+import logging
+import random
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .giveaway_cache import invalidate_giveaway_cache
+from .models import GiveawayStockShard, GiveawayTicket
+
+logger = logging.getLogger(__name__)
+
+
+def reserve_stock(giveaway: GiveawayTicket, quantity: int) -> bool:
+    """
+    Take `quantity` tickets from a giveaway's stock with conditional UPDATEs.
+
+    The `>= quantity` guard and the decrement run as a single statement, so
+    concurrent reservations can never oversell and no row is locked beyond the
+    update itself. Returns False when stock is short.
+    """
+    if quantity <= 0:
+        return True
+    if giveaway.stock_shards:
+        reserved = reserve_from_shards(giveaway, quantity)
+    else:
+        reserved = GiveawayTicket.objects.filter(pk=giveaway.pk, total_available__gte=quantity).update(
+            total_available=F('total_available') - quantity,
+            updated_at=timezone.now(),
+        ) > 0
+    if not reserved:
+        logger.warning(f"Stock reservation of {quantity} failed for Giveaway ID: {giveaway.pk}")
+        return False
+    invalidate_giveaway_cache()
+    return True
+
+
+def release_stock(giveaway: GiveawayTicket, quantity: int):
+    """Give reserved tickets back, e.g. when the rest of a confirmation fails."""
+    if quantity <= 0:
+        return
+    if giveaway.stock_shards:
+        GiveawayStockShard.objects.filter(
+            giveaway=giveaway, index=random.randrange(giveaway.stock_shards)
+        ).update(available=F('available') + quantity)
+    else:
+        GiveawayTicket.objects.filter(pk=giveaway.pk).update(
+            total_available=F('total_available') + quantity,
+            updated_at=timezone.now(),
+        )
+    invalidate_giveaway_cache()
+
+
+def _take_from_shard(giveaway, index, quantity) -> bool:
+    return GiveawayStockShard.objects.filter(
+        giveaway=giveaway, index=index, available__gte=quantity
+    ).update(available=F('available') - quantity) > 0
+
+
+def reserve_from_shards(giveaway: GiveawayTicket, quantity: int) -> bool:
+    """
+    Decrement one shard chosen at random, so parallel reservations mostly hit
+    different rows. If every shard is too low, rebalance once and retry.
+    """
+    indexes = list(range(giveaway.stock_shards))
+    random.shuffle(indexes)
+    for index in indexes:
+        if _take_from_shard(giveaway, index, quantity):
+            return True
+
+    if rebalance_shards(giveaway, minimum=quantity) < quantity:
+        return False
+    return any(_take_from_shard(giveaway, index, quantity) for index in range(giveaway.stock_shards))
+
+
+@transaction.atomic
+def rebalance_shards(giveaway: GiveawayTicket, minimum: int = 0) -> int:
+    """
+    Spread the remaining stock evenly over the shards and return the total.
+
+    Shard 0 gets at least `minimum` (when there is that much stock) so a
+    reservation bigger than an even share can still succeed. The giveaway's
+    total_available mirror is refreshed at the same time.
+    """
+    shards = list(
+        GiveawayStockShard.objects.select_for_update().filter(giveaway=giveaway).order_by('index')
+    )
+    total = sum(shard.available for shard in shards)
+    if shards:
+        _distribute(shards, total, minimum)
+        GiveawayStockShard.objects.bulk_update(shards, ['available'])
+    GiveawayTicket.objects.filter(pk=giveaway.pk).update(total_available=total, updated_at=timezone.now())
+    invalidate_giveaway_cache()
+    return total
+
+
+def _distribute(shards, total, minimum=0):
+    reserved = min(minimum, total)
+    share, remainder = divmod(total - reserved, len(shards))
+    for i, shard in enumerate(shards):
+        shard.available = share + (1 if i < remainder else 0)
+    shards[0].available += reserved
+
+
+@transaction.atomic
+def shard_stock(giveaway: GiveawayTicket, shards: int, total: int = None) -> int:
+    """
+    Switch a giveaway to `shards` counters (0 switches back to the single row).
+
+    The current stock - the mirror for unsharded giveaways, the shard sum
+    otherwise - is carried over unless a new `total` is given. Returns the stock.
+    """
+    giveaway = GiveawayTicket.objects.select_for_update().get(pk=giveaway.pk)
+    current = list(
+        GiveawayStockShard.objects.select_for_update().filter(giveaway=giveaway).values_list('available', flat=True)
+    )
+    if total is None:
+        total = sum(current) if current else giveaway.total_available
+    GiveawayStockShard.objects.filter(giveaway=giveaway).delete()
+
+    if shards:
+        rows = [GiveawayStockShard(giveaway=giveaway, index=i) for i in range(shards)]
+        _distribute(rows, total)
+        GiveawayStockShard.objects.bulk_create(rows)
+
+    GiveawayTicket.objects.filter(pk=giveaway.pk).update(
+        stock_shards=shards, total_available=total, updated_at=timezone.now()
+    )
+    invalidate_giveaway_cache()
+    logger.info(f"Giveaway ID: {giveaway.pk} stock of {total} now uses {shards or 'no'} shards.")
+    return total
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tickets.models import TicketPurchase
+
+
+class Command(BaseCommand):
+    help = "Store unit_price, discount_percent and amount_charged on confirmed purchases that predate them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--from-stripe', action='store_true',
+            help="Take amount_charged from the Stripe checkout session when the purchase has one",
+        )
+
+    def handle(self, *args, **options):
+        if options['from_stripe']:
+            stripe.api_key = settings.STRIPE_SECRET_KEY
+
+        pending = (
+            TicketPurchase.objects
+            .filter(payment_status='succeeded', amount_charged__isnull=True)
+            .select_related('ticket')
+            .with_pricing()
+            .order_by('id')
+        )
+        updated = from_stripe = 0
+        last_id = 0
+
+        while True:
+            batch = list(pending.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for purchase in batch:
+                # Best effort: today's ticket price and the buyer's current discount,
+                # unless Stripe knows what was actually charged.
+                charged = self.stripe_amount(purchase) if options['from_stripe'] else None
+                purchase.record_price(charged)
+                from_stripe += charged is not None
+
+            TicketPurchase.objects.bulk_update(batch, ['unit_price', 'discount_percent', 'amount_charged'])
+            updated += len(batch)
+            self.stdout.write(f"Backfilled {updated} purchases...")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} purchases ({from_stripe} from Stripe)."))
+
+    def stripe_amount(self, purchase):
+        if not purchase.stripe_checkout_session_id:
+            return None
+        try:
+            session = stripe.checkout.Session.retrieve(purchase.stripe_checkout_session_id)
+        except stripe.error.StripeError as e:
+            self.stderr.write(f"Stripe lookup failed for purchase {purchase.id}: {e}")
+            return None
+        amount_total = session.get('amount_total')
+        return Decimal(amount_total) / 100 if amount_total is not None else None
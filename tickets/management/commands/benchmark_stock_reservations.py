@@ -0,0 +1,77 @@
+import datetime
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from tickets.inventory import reserve_stock, shard_stock
+from tickets.models import GiveawayTicket
+
+
+class Command(BaseCommand):
+    help = "Compare single-row and sharded stock reservation throughput under parallel load"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help="Parallel threads")
+        parser.add_argument('--reservations', type=int, default=2000, help="Reservations per mode")
+        parser.add_argument('--shards', type=int, default=8, help="Shards for the sharded run")
+
+    def run(self, giveaway, workers, reservations):
+        per_worker = reservations // workers
+        barrier = threading.Barrier(workers)
+        stats = {'reserved': 0, 'failed': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def work():
+            counts = {'reserved': 0, 'failed': 0, 'errors': 0}
+            try:
+                barrier.wait()
+                for _ in range(per_worker):
+                    try:
+                        counts['reserved' if reserve_stock(giveaway, 1) else 'failed'] += 1
+                    except OperationalError:
+                        counts['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in counts.items():
+                        stats[key] += value
+
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats['seconds'] = time.perf_counter() - start
+        return stats
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        reservations = options['reservations']
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING("SQLite serializes all writers; numbers will not reflect PostgreSQL."))
+
+        for label, shards in (('single-row', 0), (f'{options["shards"]} shards', options['shards'])):
+            giveaway = GiveawayTicket.objects.create(
+                title=f"benchmark-{uuid.uuid4().hex[:12]}",
+                price=1,
+                total_available=reservations,
+                # Already expired, so the throwaway giveaway never shows up as the active one.
+                ticket_expiry_date=datetime.date.today() - datetime.timedelta(days=1),
+                is_active=False,
+            )
+            try:
+                if shards:
+                    shard_stock(giveaway, shards)
+                    giveaway.refresh_from_db()
+                stats = self.run(giveaway, workers, reservations)
+                left = GiveawayTicket.objects.get(pk=giveaway.pk).available_stock
+                self.stdout.write(
+                    f"{label:<12} {stats['reserved'] / stats['seconds']:9.1f} reservations/s  "
+                    f"reserved {stats['reserved']}  failed {stats['failed']}  errors {stats['errors']}  "
+                    f"stock left {left}"
+                )
+            finally:
+                giveaway.delete()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from tickets.inventory import rebalance_shards, shard_stock
+from tickets.models import GiveawayTicket
+
+
+class Command(BaseCommand):
+    help = "Split a giveaway's stock across N counter rows (0 = back to a single row), or rebalance them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('giveaway_id', type=int)
+        parser.add_argument('--shards', type=int, help="Number of stock shards (0 disables sharding)")
+        parser.add_argument('--rebalance', action='store_true', help="Even out the existing shards")
+
+    def handle(self, *args, **options):
+        giveaway = GiveawayTicket.objects.filter(pk=options['giveaway_id']).first()
+        if not giveaway:
+            raise CommandError("Giveaway not found.")
+
+        if options['rebalance']:
+            if not giveaway.stock_shards:
+                raise CommandError("Giveaway stock is not sharded.")
+            total = rebalance_shards(giveaway)
+            self.stdout.write(self.style.SUCCESS(f"Rebalanced {total} tickets over {giveaway.stock_shards} shards."))
+            return
+
+        if options['shards'] is None or options['shards'] < 0:
+            raise CommandError("Pass --shards N (N >= 0) or --rebalance.")
+        total = shard_stock(giveaway, options['shards'])
+        self.stdout.write(self.style.SUCCESS(f"{total} tickets now spread over {options['shards']} shards."))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_giveawayticket_is_active'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_id', models.CharField(max_length=32, unique=True)),
+                ('source', models.CharField(choices=[('manual', 'Manual'), ('subscription', 'Subscription'), ('first_time_bonus', 'First-Time Bonus'), ('purchase', 'Purchase')], default='purchase', max_length=50)),
+                ('state', models.CharField(choices=[('owned', 'Owned'), ('consolidated', 'Consolidated'), ('drawn', 'Drawn'), ('archived', 'Archived')], default='owned', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('giveaway', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='tickets.giveawayticket')),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entries', to='tickets.ticketpurchase')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ticket Entry',
+                'verbose_name_plural': 'Ticket Entries',
+                'indexes': [models.Index(fields=['state', 'user'], name='tickets_tic_state_b084dc_idx'), models.Index(fields=['giveaway', 'state'], name='tickets_tic_giveawa_bb29c1_idx'), models.Index(fields=['purchase', 'state'], name='tickets_tic_purchas_a561ab_idx')],
+            },
+        ),
+    ]
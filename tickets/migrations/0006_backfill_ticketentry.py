@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:20
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_ticket_entries(apps, schema_editor):
+    GiveawayTicket = apps.get_model('tickets', 'GiveawayTicket')
+    TicketPurchase = apps.get_model('tickets', 'TicketPurchase')
+    TicketEntry = apps.get_model('tickets', 'TicketEntry')
+    UserTicketConsolidation = apps.get_model('raffle', 'UserTicketConsolidation')
+    UserTicketConsolidationArchive = apps.get_model('raffle', 'UserTicketConsolidationArchive')
+    RaffleWinner = apps.get_model('raffle', 'RaffleWinner')
+    RaffleWinnerArchive = apps.get_model('raffle', 'RaffleWinnerArchive')
+
+    # Consolidations never recorded their giveaway; only one giveaway exists at a time,
+    # so attribute them to the most recent one.
+    latest_giveaway_id = (
+        GiveawayTicket.objects.order_by('-created_at').values_list('id', flat=True).first()
+    )
+
+    batch = []
+
+    def flush():
+        # ignore_conflicts keeps the first state seen for a ticket ID, so rows are
+        # inserted from the most current location to the least current one.
+        TicketEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+
+    def add(**kwargs):
+        batch.append(TicketEntry(**kwargs))
+        if len(batch) >= BATCH_SIZE:
+            flush()
+
+    for row in UserTicketConsolidation.objects.values('user_id', 'unique_ticket_ids').iterator():
+        for ticket_id in row['unique_ticket_ids'] or []:
+            add(
+                ticket_id=ticket_id,
+                user_id=row['user_id'],
+                giveaway_id=latest_giveaway_id,
+                state='consolidated',
+            )
+
+    purchases = TicketPurchase.objects.values('id', 'user_id', 'ticket_id', 'source', 'unique_ticket_ids')
+    for row in purchases.iterator():
+        for ticket_id in row['unique_ticket_ids'] or []:
+            add(
+                ticket_id=ticket_id,
+                user_id=row['user_id'],
+                giveaway_id=row['ticket_id'],
+                purchase_id=row['id'],
+                source=row['source'],
+                state='owned',
+            )
+
+    for row in UserTicketConsolidationArchive.objects.values('user_id', 'unique_ticket_ids').iterator():
+        for ticket_id in row['unique_ticket_ids'] or []:
+            add(ticket_id=ticket_id, user_id=row['user_id'], state='archived')
+
+    flush()
+
+    for model in (RaffleWinner, RaffleWinnerArchive):
+        for row in model.objects.values('winning_ticket_id', 'giveaway_id').iterator():
+            TicketEntry.objects.filter(ticket_id=row['winning_ticket_id']).update(
+                state='drawn', giveaway_id=row['giveaway_id']
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticketentry'),
+        ('raffle', '0003_alter_rafflewinner_position_rafflewinnerarchive'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ticket_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_backfill_ticketentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticketentry',
+            index=models.Index(fields=['state', 'id'], name='tickets_tic_state_e13f26_idx'),
+        ),
+    ]
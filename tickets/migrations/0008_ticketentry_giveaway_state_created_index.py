@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_ticketentry_state_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticketentry',
+            name='tickets_tic_giveawa_bb29c1_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ticketentry',
+            index=models.Index(fields=['giveaway', 'state', 'created_at'], name='tickets_tic_giveawa_6c73dd_idx'),
+        ),
+    ]
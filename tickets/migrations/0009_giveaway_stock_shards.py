@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticketentry_giveaway_state_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='giveawayticket',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='GiveawayStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('available', models.PositiveIntegerField(default=0)),
+                ('giveaway', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='tickets.giveawayticket')),
+            ],
+            options={
+                'verbose_name': 'Giveaway Stock Shard',
+                'verbose_name_plural': 'Giveaway Stock Shards',
+                'constraints': [models.UniqueConstraint(fields=('giveaway', 'index'), name='unique_stock_shard_index')],
+            },
+        ),
+    ]
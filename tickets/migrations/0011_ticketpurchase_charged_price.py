@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_ticketidcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketpurchase',
+            name='amount_charged',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketpurchase',
+            name='discount_percent',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketpurchase',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
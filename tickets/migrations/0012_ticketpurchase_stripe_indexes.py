@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_ticketpurchase_charged_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticketpurchase',
+            index=models.Index(fields=['stripe_checkout_session_id'], name='tickets_tic_stripe__bd20d9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketpurchase',
+            index=models.Index(fields=['stripe_payment_intent'], name='tickets_tic_stripe__f6a762_idx'),
+        ),
+    ]
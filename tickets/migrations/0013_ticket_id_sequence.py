@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:05
+
+from django.db import migrations
+
+SEQUENCE = 'tickets_ticket_id_seq'
+BLOCK_SIZE = 1000
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    TicketIdCounter = apps.get_model('tickets', 'TicketIdCounter')
+    # Carry on after any block the counter row has already handed out.
+    counter = TicketIdCounter.objects.filter(name='ticket_id').first()
+    start = counter.next_value if counter else 1
+    schema_editor.execute(
+        f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE} INCREMENT BY {BLOCK_SIZE} START WITH {int(start)}"
+    )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_ticketpurchase_stripe_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -1,14 +1,35 @@
 # tickets/models.py
-from django.db import models, transaction
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Round
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from .utils import generate_ticket_id, generate_unique_purchase_id
-from decimal import Decimal
+from .utils import generate_ticket_id
+from decimal import ROUND_HALF_UP, Decimal
 
 User = get_user_model()
 
+# Rounds of replacing taken IDs before issue_for_purchase gives up.
+ISSUE_ATTEMPTS = 5
+
+
+class GiveawayTicketQuerySet(models.QuerySet):
+    def in_stock(self):
+        """Giveaways with stock left, read from the shards when the giveaway is sharded."""
+        return self.filter(
+            models.Q(stock_shards=0, total_available__gt=0)
+            | models.Q(stock_shards__gt=0) & models.Exists(
+                GiveawayStockShard.objects.filter(giveaway=OuterRef('pk'), available__gt=0)
+            )
+        )
+
+    def available(self, on=None):
+        """In stock and not expired on `on` (today by default)."""
+        return self.in_stock().filter(ticket_expiry_date__gte=on or timezone.now().date())
+
+
 class GiveawayTicket(models.Model):
     ticket_id = models.CharField(
         max_length=10,
@@ -27,10 +48,15 @@ class GiveawayTicket(models.Model):
     ticket_expiry_date = models.DateField()
     
     is_active = models.BooleanField(default=True)
+    # 0 = stock lives in total_available; N = stock is split across N GiveawayStockShard rows
+    # and total_available is only a mirror refreshed when the shards are rebalanced.
+    stock_shards = models.PositiveSmallIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = GiveawayTicketQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Giveaway Ticket"
         verbose_name_plural = "Giveaway Tickets"
@@ -44,10 +70,74 @@ class GiveawayTicket(models.Model):
 
     @property
     def is_available(self):
-        return self.total_available > 0 and self.ticket_expiry_date >= timezone.now().date()
+        return self.ticket_expiry_date >= timezone.now().date() and self.available_stock > 0
+
+    @property
+    def available_stock(self):
+        """Exact remaining stock, summing the shard counters for sharded giveaways."""
+        if not self.stock_shards:
+            return self.total_available
+        return self.shards.aggregate(total=models.Sum('available'))['total'] or 0
+
+
+class GiveawayStockShard(models.Model):
+    giveaway = models.ForeignKey(GiveawayTicket, on_delete=models.CASCADE, related_name="shards")
+    index = models.PositiveSmallIntegerField()
+    available = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Giveaway Stock Shard"
+        verbose_name_plural = "Giveaway Stock Shards"
+        constraints = [
+            models.UniqueConstraint(fields=['giveaway', 'index'], name='unique_stock_shard_index'),
+        ]
+
+    def __str__(self):
+        return f"{self.giveaway} shard {self.index}: {self.available}"
+
+
+class TicketPurchaseQuerySet(models.QuerySet):
+    def with_pricing(self):
+        """
+        Annotate each purchase with its discount and final price.
+
+        Confirmed purchases carry the price they were charged; for the rest the
+        discount comes from a correlated subquery on the buyer's current
+        subscription. Either way a whole list is priced by one query and
+        total_price reads the annotation instead of querying per row.
+        """
+        from subscription.models import UserSubscription
+
+        current_discount = UserSubscription.objects.filter(
+            user=OuterRef('user'),
+            is_active=True,
+            end_date__gte=timezone.now().date(),
+        ).values('plan__ticket_discount_percent')[:1]
+        money = models.DecimalField(max_digits=20, decimal_places=2)
+
+        return self.annotate(
+            subscription_discount=Case(
+                When(discount_percent__isnull=False, then=F('discount_percent')),
+                When(source__in=TicketPurchase.FREE_SOURCES, then=Value(Decimal('0'))),
+                default=Coalesce(Subquery(current_discount), Value(Decimal('0'))),
+                output_field=models.DecimalField(max_digits=5, decimal_places=2),
+            ),
+        ).annotate(
+            final_price=Case(
+                When(amount_charged__isnull=False, then=F('amount_charged')),
+                When(source__in=TicketPurchase.FREE_SOURCES, then=Value(Decimal('0.00'))),
+                default=Round(
+                    F('ticket__price') * F('quantity') * (Value(Decimal('100')) - F('subscription_discount')) / Value(Decimal('100')),
+                    2,
+                ),
+                output_field=money,
+            ),
+        )
 
 
 class TicketPurchase(models.Model):
+    FREE_SOURCES = ['subscription', 'first_time_bonus']
+
     SOURCE_CHOICES = [
         ('manual', 'Manual'),
         ('subscription', 'Subscription'),
@@ -74,6 +164,14 @@ class TicketPurchase(models.Model):
     payment_status = models.CharField(max_length=30, choices=PAYMENT_STATUS_CHOICES, default='pending')
     source = models.CharField(max_length=50, choices=SOURCE_CHOICES, default='purchase')
 
+    # What the buyer actually paid, fixed at confirmation so later price or plan
+    # changes never rewrite history. Null until confirmed (or backfilled).
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    amount_charged = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    objects = TicketPurchaseQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Ticket Purchase"
         verbose_name_plural = "Ticket Purchases"
@@ -81,6 +179,9 @@ class TicketPurchase(models.Model):
         indexes = [
             models.Index(fields=['user', 'payment_status']),
             models.Index(fields=['ticket', 'is_used']),
+            # Stripe webhooks look purchases up by these.
+            models.Index(fields=['stripe_checkout_session_id']),
+            models.Index(fields=['stripe_payment_intent']),
         ]
 
     def clean(self):
@@ -89,47 +190,205 @@ class TicketPurchase(models.Model):
             raise ValidationError("Cannot purchase expired or unavailable ticket.")
         # For paid purchases, check availability
         if self.source in ['manual', 'purchase']:
-            if self.ticket.total_available < self.quantity:
+            if self.ticket.available_stock < self.quantity:
                 raise ValidationError("Not enough tickets available.")
 
     @property
     def is_free_ticket(self):
         # Tickets given by subscription or first time bonus are free
-        return self.source in ['subscription', 'first_time_bonus']
+        return self.source in self.FREE_SOURCES
 
     @property
     def total_price(self):
+        if self.amount_charged is not None:
+            return self.amount_charged
+        # Annotated by TicketPurchase.objects.with_pricing(); otherwise looked up.
+        return self.price_quote(getattr(self, 'subscription_discount', None))[2]
+
+    def price_quote(self, discount=None):
+        """(unit_price, discount_percent, amount) at today's ticket price and subscription discount."""
+        unit_price = self.ticket.price
         if self.is_free_ticket:
-            return Decimal('0.00')
+            return unit_price, Decimal('0'), Decimal('0.00')
 
-        from subscription.models import UserSubscription
+        if discount is None:
+            from subscription.models import UserSubscription
 
-        subscription = UserSubscription.objects.filter(user=self.user, is_active=True).first()
-        discount = subscription.get_discount() if subscription else Decimal('0')
+            subscription = UserSubscription.objects.filter(user=self.user, is_active=True).first()
+            discount = subscription.get_discount() if subscription else Decimal('0')
 
         discount_rate = Decimal('1') - (discount / Decimal('100'))
-        price = self.ticket.price * discount_rate
+        price = unit_price * discount_rate
+
+        # Half-up, like ROUND() in with_pricing(), so both give the same cents.
+        return unit_price, discount, (price * self.quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
-        return (price * self.quantity).quantize(Decimal('0.01'))
+    def record_price(self, amount_charged=None):
+        """Store the price of this purchase; `amount_charged` (e.g. from Stripe) overrides the quote."""
+        self.unit_price, self.discount_percent, quoted = self.price_quote(getattr(self, 'subscription_discount', None))
+        self.amount_charged = quoted if amount_charged is None else amount_charged
 
     @transaction.atomic    
-    def confirm_purchase(self):
+    def confirm_purchase(self, amount_charged=None):
         if self.payment_status != 'succeeded':
             raise ValidationError("Cannot confirm purchase unless payment succeeded.")
 
-        ticket = self.ticket
+        from metrics.rollups import record as record_metrics
+        from .inventory import reserve_stock
+        from .ticket_ids import allocate_ticket_ids
 
-        # For free tickets, still reduce stock
-        if ticket.total_available < self.quantity:
+        # For free tickets, still reduce stock (rolled back if the rest fails)
+        if not reserve_stock(self.ticket, self.quantity):
             raise ValidationError("Not enough tickets available to confirm purchase.")
 
-        # Deduct ticket quantity
-        ticket.total_available -= self.quantity
-        ticket.save()
-
         # Generate unique ticket IDs if not already generated
         if not self.unique_ticket_ids or len(self.unique_ticket_ids) != self.quantity:
-            self.unique_ticket_ids = [generate_unique_purchase_id() for _ in range(self.quantity)]
+            self.unique_ticket_ids = allocate_ticket_ids(self.quantity)
+
+        if self.amount_charged is None:
+            self.record_price(amount_charged)
 
         # Always save self (even if IDs already existed)
         self.save()
+
+        TicketEntry.objects.issue_for_purchase(self)
+        record_metrics(
+            at=self.purchase_date, purchases=1, tickets_sold=self.quantity, ticket_revenue=self.amount_charged,
+        )
+
+
+class TicketEntryQuerySet(models.QuerySet):
+    def owned(self):
+        return self.filter(state=TicketEntry.STATE_OWNED)
+
+    def consolidated(self):
+        return self.filter(state=TicketEntry.STATE_CONSOLIDATED)
+
+    def issue_for_purchase(self, purchase, ticket_ids=None):
+        """
+        Create one entry per ticket ID of a confirmed purchase (idempotent).
+
+        The whole batch goes in as one INSERT. IDs that are repeated in the
+        list or turn out to belong to another purchase are replaced with fresh
+        ones (and the purchase's unique_ticket_ids updated) instead of being
+        silently dropped; if the entries still fall short, IntegrityError.
+        """
+        own_ids = ticket_ids is None
+        ticket_ids = list(purchase.unique_ticket_ids if own_ids else ticket_ids)
+        expected = len(ticket_ids)
+        ticket_ids = list(dict.fromkeys(ticket_ids))
+        if len(ticket_ids) < expected:
+            ticket_ids += self._fresh_ids(expected - len(ticket_ids), exclude=ticket_ids)
+            if own_ids:
+                purchase.unique_ticket_ids = ticket_ids
+                purchase.save(update_fields=['unique_ticket_ids'])
+
+        pending = ticket_ids
+        for _ in range(ISSUE_ATTEMPTS):
+            self._insert_entries(purchase, pending)
+            if self.filter(purchase=purchase, ticket_id__in=ticket_ids).count() == expected:
+                return ticket_ids
+            taken = set(
+                self.filter(ticket_id__in=ticket_ids).exclude(purchase=purchase).values_list('ticket_id', flat=True)
+            )
+            pending = self._fresh_ids(len(taken), exclude=ticket_ids)
+            ticket_ids = [t for t in ticket_ids if t not in taken] + pending
+            if own_ids:
+                purchase.unique_ticket_ids = ticket_ids
+                purchase.save(update_fields=['unique_ticket_ids'])
+
+        raise IntegrityError(f"Could not issue {expected} ticket entries for purchase {purchase.pk}.")
+
+    @staticmethod
+    def _fresh_ids(count, exclude) -> list:
+        from .ticket_ids import allocate_ticket_ids
+
+        exclude = set(exclude)
+        fresh = []
+        while len(fresh) < count:
+            fresh += [t for t in allocate_ticket_ids(count - len(fresh)) if t not in exclude and t not in fresh]
+        return fresh
+
+    def _insert_entries(self, purchase, ticket_ids):
+        if connection.vendor == 'postgresql':
+            # One statement regardless of batch size: the IDs travel as a single array parameter.
+            table = self.model._meta.db_table
+            now = timezone.now()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (ticket_id, user_id, giveaway_id, purchase_id, source, state, created_at, updated_at)
+                    SELECT t, %s, %s, %s, %s, %s, %s, %s FROM unnest(%s::varchar[]) AS t
+                    ON CONFLICT (ticket_id) DO NOTHING
+                    """,
+                    [purchase.user_id, purchase.ticket_id, purchase.pk, purchase.source,
+                     TicketEntry.STATE_OWNED, now, now, list(ticket_ids)],
+                )
+            return
+        self.bulk_create(
+            [
+                TicketEntry(
+                    ticket_id=ticket_id,
+                    user_id=purchase.user_id,
+                    giveaway_id=purchase.ticket_id,
+                    purchase=purchase,
+                    source=purchase.source,
+                ) for ticket_id in ticket_ids
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class TicketIdCounter(models.Model):
+    """Shared counter for the sequence ticket-ID mode; workers reserve blocks from it."""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class TicketEntry(models.Model):
+    STATE_OWNED = 'owned'
+    STATE_CONSOLIDATED = 'consolidated'
+    STATE_DRAWN = 'drawn'
+    STATE_ARCHIVED = 'archived'
+
+    STATE_CHOICES = [
+        (STATE_OWNED, 'Owned'),
+        (STATE_CONSOLIDATED, 'Consolidated'),
+        (STATE_DRAWN, 'Drawn'),
+        (STATE_ARCHIVED, 'Archived'),
+    ]
+
+    ticket_id = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="ticket_entries")
+    giveaway = models.ForeignKey(
+        GiveawayTicket, on_delete=models.CASCADE, related_name="entries", null=True, blank=True
+    )
+    purchase = models.ForeignKey(
+        TicketPurchase, on_delete=models.SET_NULL, related_name="entries", null=True, blank=True
+    )
+    source = models.CharField(max_length=50, choices=TicketPurchase.SOURCE_CHOICES, default='purchase')
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_OWNED)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TicketEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Ticket Entry"
+        verbose_name_plural = "Ticket Entries"
+        indexes = [
+            models.Index(fields=['state', 'user']),
+            # Ordinal (OFFSET) lookups over the draw pool walk this index.
+            models.Index(fields=['state', 'id']),
+            # Incremental consolidation scans a giveaway's recent owned entries.
+            models.Index(fields=['giveaway', 'state', 'created_at']),
+            models.Index(fields=['purchase', 'state']),
+        ]
+
+    def __str__(self):
+        return f"{self.ticket_id} ({self.state})"
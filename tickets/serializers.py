@@ -1,12 +1,32 @@
 from rest_framework import serializers
 from .models import GiveawayTicket, TicketPurchase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 
-class GiveawayTicketSerializer(serializers.ModelSerializer):
-    is_available = serializers.ReadOnlyField()
+class AggregatedStockMixin:
+    """
+    Show the exact stock of sharded giveaways instead of the lagging mirror.
+
+    Serializers declare `is_available = serializers.SerializerMethodField()`;
+    it and total_available share one read of the stock.
+    """
+
+    def get_is_available(self, instance) -> bool:
+        return instance.ticket_expiry_date >= timezone.now().date() and self._stock > 0
+
+    def to_representation(self, instance):
+        self._stock = instance.available_stock
+        data = super().to_representation(instance)
+        if 'total_available' in data:
+            data['total_available'] = self._stock
+        return data
+
+
+class GiveawayTicketSerializer(AggregatedStockMixin, serializers.ModelSerializer):
+    is_available = serializers.SerializerMethodField()
 
     class Meta:
         model = GiveawayTicket
@@ -47,8 +67,9 @@ class GiveawayTicketSerializer(serializers.ModelSerializer):
         return attrs
     
     
-class UpdateGiveawayTicketSerializer(serializers.ModelSerializer):
+class UpdateGiveawayTicketSerializer(AggregatedStockMixin, serializers.ModelSerializer):
     title = serializers.ReadOnlyField()  # Prevent updates
+    is_available = serializers.SerializerMethodField()
 
     class Meta:
         model = GiveawayTicket
@@ -153,16 +174,20 @@ class TicketPurchaseDetailsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    # Confirmed purchases read their stored amount_charged; the rest need a
+    # TicketPurchase.objects.with_pricing() queryset to avoid a query per row.
     def get_total_price(self, obj):
         return obj.total_price
 
     def get_original_price_value(self, obj):
+        if obj.unit_price is not None:
+            return float(obj.unit_price) * obj.quantity
         if obj.ticket and obj.ticket.price:
             return float(obj.ticket.price) * obj.quantity
         return 0.0
 
     def get_is_free(self, obj):
-        return obj.total_price == 0.0
+        return obj.is_free_ticket or obj.total_price == 0
 
     def get_billing_source_label(self, obj):
         return {
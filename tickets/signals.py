@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .giveaway_cache import invalidate_giveaway_cache
+from .models import GiveawayTicket
+
+
+@receiver(post_save, sender=GiveawayTicket)
+@receiver(post_delete, sender=GiveawayTicket)
+def giveaway_changed(sender, instance, **kwargs):
+    invalidate_giveaway_cache()
@@ -1,3 +1,348 @@
-from django.test import TestCase
+import datetime
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .giveaway_cache import cache_version, get_giveaway_payload, payload_key
+from .inventory import rebalance_shards, release_stock, reserve_stock, shard_stock
+from .models import GiveawayStockShard, GiveawayTicket, TicketEntry, TicketPurchase
+from .serializers import GiveawayTicketSerializer, TicketPurchaseDetailsSerializer
+from .ticket_ids import (
+    CROCKFORD_ALPHABET, TICKET_ID_LENGTH, _SequenceBlock, _sequence_block, allocate_ticket_ids,
+)
+
+User = get_user_model()
+
+
+def create_giveaway(total_available):
+    return GiveawayTicket.objects.create(
+        title=f"Giveaway {total_available}",
+        price=5,
+        total_available=total_available,
+        ticket_expiry_date=datetime.date.today() + datetime.timedelta(days=30),
+    )
+
+
+class InventoryTests(TestCase):
+
+    def test_reserve_and_release(self):
+        giveaway = create_giveaway(5)
+
+        self.assertTrue(reserve_stock(giveaway, 3))
+        self.assertFalse(reserve_stock(giveaway, 3))
+        giveaway.refresh_from_db()
+        self.assertEqual(giveaway.total_available, 2)
+
+        release_stock(giveaway, 3)
+        giveaway.refresh_from_db()
+        self.assertEqual(giveaway.total_available, 5)
+
+    def test_confirm_purchase_rejects_oversell(self):
+        giveaway = create_giveaway(2)
+        user = User.objects.create_user('buyer@example.com', full_name='Buyer')
+        purchase = TicketPurchase.objects.create(user=user, ticket=giveaway, quantity=3, payment_status='succeeded')
+
+        with self.assertRaises(ValidationError):
+            purchase.confirm_purchase()
+        giveaway.refresh_from_db()
+        self.assertEqual(giveaway.total_available, 2)
+        self.assertFalse(TicketEntry.objects.filter(purchase=purchase).exists())
+
+
+class PricingTests(TestCase):
+
+    def test_with_pricing_prices_a_list_in_one_query(self):
+        from subscription.models import SubscriptionPlan, UserSubscription
+
+        giveaway = create_giveaway(100)
+        plan = SubscriptionPlan.objects.create(name='vip', monthly_price=10, ticket_discount_percent=Decimal('12.5'))
+        subscriber = User.objects.create_user('subscriber@example.com', full_name='Subscriber')
+        UserSubscription.objects.create(
+            user=subscriber, plan=plan, billing_cycle='monthly',
+            end_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        buyer = User.objects.create_user('payer@example.com', full_name='Payer')
+        for user in (subscriber, buyer):
+            TicketPurchase.objects.create(user=user, ticket=giveaway, quantity=3, payment_status='succeeded')
+        TicketPurchase.objects.create(user=subscriber, ticket=giveaway, quantity=2, source='subscription')
+
+        with self.assertNumQueries(1):
+            data = TicketPurchaseDetailsSerializer(
+                TicketPurchase.objects.select_related('ticket', 'user').with_pricing(), many=True
+            ).data
+        prices = sorted((row['user_email'], row['source'], row['total_price']) for row in data)
+
+        self.assertEqual(prices, [
+            ('payer@example.com', 'purchase', Decimal('15.00')),
+            ('subscriber@example.com', 'purchase', Decimal('13.13')),
+            ('subscriber@example.com', 'subscription', Decimal('0.00')),
+        ])
+        for purchase in TicketPurchase.objects.with_pricing():
+            self.assertEqual(purchase.final_price, purchase.total_price)
+
+    def test_confirmed_price_survives_price_changes(self):
+        giveaway = create_giveaway(10)
+        user = User.objects.create_user('keeper@example.com', full_name='Keeper')
+        purchase = TicketPurchase.objects.create(user=user, ticket=giveaway, quantity=2, payment_status='succeeded')
+        purchase.confirm_purchase()
+
+        giveaway.price = 50
+        giveaway.save()
+
+        purchase = TicketPurchase.objects.with_pricing().get(pk=purchase.pk)
+        self.assertEqual((purchase.unit_price, purchase.amount_charged), (Decimal('5.00'), Decimal('10.00')))
+        self.assertEqual(purchase.total_price, Decimal('10.00'))
+        self.assertEqual(purchase.final_price, Decimal('10.00'))
+
+    def test_backfill_command(self):
+        giveaway = create_giveaway(10)
+        user = User.objects.create_user('legacy@example.com', full_name='Legacy')
+        purchase = TicketPurchase.objects.create(user=user, ticket=giveaway, quantity=3, payment_status='succeeded')
+
+        call_command('backfill_purchase_prices', stdout=StringIO())
+
+        purchase.refresh_from_db()
+        self.assertEqual(
+            (purchase.unit_price, purchase.discount_percent, purchase.amount_charged),
+            (Decimal('5.00'), Decimal('0.00'), Decimal('15.00')),
+        )
+
+
+class TicketIdTests(TestCase):
+
+    def assertValidIds(self, ids, count):
+        self.assertEqual(len(ids), count)
+        self.assertEqual(len(set(ids)), count)
+        for ticket_id in ids:
+            self.assertEqual(len(ticket_id), TICKET_ID_LENGTH)
+            self.assertTrue(set(ticket_id) <= set(CROCKFORD_ALPHABET))
+
+    def test_random_ids(self):
+        self.assertValidIds(allocate_ticket_ids(10000), 10000)
+
+    @override_settings(TICKET_ID_MODE='sequence')
+    def test_sequence_ids_do_not_repeat_across_blocks(self):
+        ids = allocate_ticket_ids(1500) + allocate_ticket_ids(700)
+        self.assertValidIds(ids, 2200)
+
+    @override_settings(TICKET_ID_MODE='sequence')
+    def test_rolled_back_ids_are_not_reissued_to_another_worker(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            allocate_ticket_ids(5)
+            raise RuntimeError('purchase failed')
+
+        other_worker = _SequenceBlock().take(5)
+        this_worker = _sequence_block.take(5)
+
+        self.assertFalse(set(other_worker) & set(this_worker))
+        self.assertEqual(len(set(other_worker + this_worker)), 10)
+
+    def test_issue_replaces_ids_taken_by_another_purchase(self):
+        giveaway = create_giveaway(10)
+        user = User.objects.create_user('issuer@example.com', full_name='Issuer')
+        first = TicketPurchase.objects.create(
+            user=user, ticket=giveaway, quantity=1, payment_status='succeeded', unique_ticket_ids=['DUPLICATE000'],
+        )
+        TicketEntry.objects.issue_for_purchase(first)
+        second = TicketPurchase.objects.create(
+            user=user, ticket=giveaway, quantity=2, payment_status='succeeded',
+            unique_ticket_ids=['DUPLICATE000', 'FRESH0000000'],
+        )
+
+        TicketEntry.objects.issue_for_purchase(second)
+
+        second.refresh_from_db()
+        self.assertNotIn('DUPLICATE000', second.unique_ticket_ids)
+        self.assertEqual(
+            sorted(TicketEntry.objects.filter(purchase=second).values_list('ticket_id', flat=True)),
+            sorted(second.unique_ticket_ids),
+        )
+
+    def test_issue_replaces_repeated_ids(self):
+        giveaway = create_giveaway(10)
+        user = User.objects.create_user('repeat@example.com', full_name='Repeat')
+        purchase = TicketPurchase.objects.create(
+            user=user, ticket=giveaway, quantity=3, payment_status='succeeded',
+            unique_ticket_ids=['REPEATED0000', 'REPEATED0000', 'SINGLE000000'],
+        )
+
+        TicketEntry.objects.issue_for_purchase(purchase)
+
+        purchase.refresh_from_db()
+        self.assertEqual(len(set(purchase.unique_ticket_ids)), 3)
+        self.assertEqual(TicketEntry.objects.filter(purchase=purchase).count(), 3)
+
+    def test_issue_raises_when_entries_fall_short(self):
+        giveaway = create_giveaway(10)
+        user = User.objects.create_user('short@example.com', full_name='Short')
+        purchase = TicketPurchase.objects.create(
+            user=user, ticket=giveaway, quantity=2, payment_status='succeeded',
+            unique_ticket_ids=['SHORT0000000', 'SHORT0000001'],
+        )
+
+        with mock.patch('tickets.models.TicketEntryQuerySet._insert_entries'):
+            with self.assertRaises(IntegrityError):
+                TicketEntry.objects.issue_for_purchase(purchase)
+
+
+class ShardedInventoryTests(TestCase):
+
+    def setUp(self):
+        self.giveaway = create_giveaway(10)
+        shard_stock(self.giveaway, 4)
+        self.giveaway.refresh_from_db()
+
+    def test_stock_is_split_and_aggregated(self):
+        self.assertEqual(
+            list(GiveawayStockShard.objects.filter(giveaway=self.giveaway).order_by('index').values_list('available', flat=True)),
+            [3, 3, 2, 2],
+        )
+        self.assertTrue(reserve_stock(self.giveaway, 2))
+        self.assertEqual(self.giveaway.available_stock, 8)
+        self.assertEqual(GiveawayTicketSerializer(self.giveaway).data['total_available'], 8)
+
+    def test_rebalances_when_shards_run_dry(self):
+        # 5 fits in no single shard (max 3) but the giveaway has 10 in total.
+        self.assertTrue(reserve_stock(self.giveaway, 5))
+        self.assertTrue(reserve_stock(self.giveaway, 5))
+        self.assertFalse(reserve_stock(self.giveaway, 1))
+        self.assertEqual(rebalance_shards(self.giveaway), 0)
+
+    def test_unsharding_keeps_stock(self):
+        reserve_stock(self.giveaway, 4)
+        shard_stock(self.giveaway, 0)
+        self.giveaway.refresh_from_db()
+        self.assertEqual(self.giveaway.total_available, 6)
+        self.assertFalse(GiveawayStockShard.objects.filter(giveaway=self.giveaway).exists())
+
+    def test_availability_follows_the_shards_not_the_mirror(self):
+        user = User.objects.create_user('shards@example.com', full_name='Shards')
+        GiveawayTicket.objects.filter(pk=self.giveaway.pk).update(total_available=0)
+        self.giveaway.refresh_from_db()
+
+        self.assertTrue(self.giveaway.is_available)
+        self.assertEqual(GiveawayTicket.objects.available().get(), self.giveaway)
+        TicketPurchase(user=user, ticket=self.giveaway, quantity=10).clean()
+        with self.assertNumQueries(1):
+            data = GiveawayTicketSerializer(self.giveaway).data
+        self.assertEqual((data['total_available'], data['is_available']), (10, True))
+
+        # Sold out on the shards while the mirror still shows stock.
+        GiveawayStockShard.objects.filter(giveaway=self.giveaway).update(available=0)
+        GiveawayTicket.objects.filter(pk=self.giveaway.pk).update(total_available=10)
+        self.giveaway.refresh_from_db()
+
+        self.assertFalse(self.giveaway.is_available)
+        self.assertFalse(GiveawayTicket.objects.available().exists())
+        with self.assertRaises(ValidationError):
+            TicketPurchase(user=user, ticket=self.giveaway, quantity=1).clean()
+        self.assertFalse(GiveawayTicketSerializer(self.giveaway).data['is_available'])
+
+
+class GiveawayCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.giveaway = create_giveaway(10)
+
+    def test_write_invalidates_after_commit(self):
+        self.assertEqual(get_giveaway_payload()['body']['ticket']['total_available'], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.giveaway.total_available = 4
+            self.giveaway.save()
+            # Not committed yet: readers keep the old payload.
+            with self.assertNumQueries(0):
+                self.assertEqual(get_giveaway_payload()['body']['ticket']['total_available'], 10)
+
+        self.assertEqual(get_giveaway_payload()['body']['ticket']['total_available'], 4)
+        with self.assertNumQueries(0):
+            get_giveaway_payload()
+
+    def test_cold_cache_is_built_by_the_lock_holder_only(self):
+        key = payload_key(cache_version())
+        # Another request holds the recompute lock and publishes its payload while we wait.
+        self.assertTrue(cache.add(f'{key}:lock', 1))
+        published = {'status': 200, 'body': {'success': True}}
+
+        with mock.patch('tickets.giveaway_cache.time.sleep', side_effect=lambda _: cache.set(key, published)), \
+                self.assertNumQueries(0):
+            self.assertEqual(get_giveaway_payload(), published)
+
+    def test_lock_is_released_after_building(self):
+        key = payload_key(cache_version())
+
+        get_giveaway_payload()
+
+        self.assertIsNone(cache.get(f'{key}:lock'))
+        self.assertEqual(cache.get(key)['body']['ticket']['title'], self.giveaway.title)
+
+
+class ConcurrentConfirmationTests(TransactionTestCase):
+    """Fire many confirmations at once against a giveaway with less stock than demand."""
+    WORKERS = 20
+    STOCK = 7
+
+    def run_in_parallel(self, purchases):
+        barrier = threading.Barrier(len(purchases))
+        outcomes = []
+
+        def confirm(purchase):
+            try:
+                barrier.wait()
+                for _ in range(50):
+                    try:
+                        purchase.confirm_purchase()
+                        outcomes.append('confirmed')
+                        return
+                    except OperationalError:
+                        # SQLite serializes writers with a database lock; retry like a webhook would.
+                        time.sleep(0.01)
+                outcomes.append('error')
+            except ValidationError:
+                outcomes.append('sold_out')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=confirm, args=(p,)) for p in purchases]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_parallel_confirmations_never_oversell(self, shards=0):
+        giveaway = create_giveaway(self.STOCK)
+        if shards:
+            shard_stock(giveaway, shards)
+            giveaway.refresh_from_db()
+        purchases = [
+            TicketPurchase.objects.create(
+                user=User.objects.create_user(f'buyer{i}@example.com', full_name=f'Buyer {i}'),
+                ticket=giveaway,
+                quantity=1,
+                payment_status='succeeded',
+            )
+            for i in range(self.WORKERS)
+        ]
+
+        outcomes = self.run_in_parallel(purchases)
+
+        giveaway.refresh_from_db()
+        self.assertNotIn('error', outcomes)
+        self.assertEqual(outcomes.count('confirmed'), self.STOCK)
+        self.assertEqual(outcomes.count('sold_out'), self.WORKERS - self.STOCK)
+        self.assertEqual(giveaway.available_stock, 0)
+        self.assertEqual(TicketEntry.objects.filter(giveaway=giveaway).count(), self.STOCK)
+
+    def test_parallel_sharded_confirmations_never_oversell(self):
+        self.test_parallel_confirmations_never_oversell(shards=3)
@@ -0,0 +1,148 @@
+# tickets/ticket_ids.py
+import secrets
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import F
+
+# Crockford base32: no I, L, O or U, so IDs survive being read out or typed in.
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+TICKET_ID_LENGTH = 12                      # 12 base32 chars = 60 bits
+TICKET_ID_BITS = 5 * TICKET_ID_LENGTH
+
+MODE_RANDOM = 'random'
+MODE_SEQUENCE = 'sequence'
+
+SEQUENCE_NAME = 'ticket_id'
+# Fixed: on PostgreSQL it is the increment of the tickets_ticket_id_seq sequence (migration 0013).
+SEQUENCE_BLOCK_SIZE = 1000
+SEQUENCE_DB_NAME = 'tickets_ticket_id_seq'
+# Odd multiplier: value * M mod 2**60 is a bijection, so sequence numbers map to
+# distinct, non-consecutive-looking IDs.
+SEQUENCE_MULTIPLIER = 0x9E3779B97F4A7C1 | 1
+
+
+def encode_crockford(value: int, length: int = TICKET_ID_LENGTH) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def random_ticket_ids(count: int) -> set:
+    """`count` (or fewer, if the batch repeats itself) random 60-bit IDs from one CSPRNG read."""
+    raw = secrets.token_bytes(8 * count)
+    return {
+        encode_crockford(int.from_bytes(raw[i:i + 8], 'big') >> (64 - TICKET_ID_BITS))
+        for i in range(0, len(raw), 8)
+    }
+
+
+def allocate_random_ids(count: int) -> list:
+    """
+    Random IDs checked against the TicketEntry.ticket_id unique index in one query.
+
+    At 60 bits a collision is vanishingly rare, so the loop almost always runs
+    once; the unique index stays the final guarantee at insert time.
+    """
+    from .models import TicketEntry
+
+    ids = set()
+    while len(ids) < count:
+        candidates = random_ticket_ids(count - len(ids)) - ids
+        taken = set(TicketEntry.objects.filter(ticket_id__in=candidates).values_list('ticket_id', flat=True))
+        ids |= candidates - taken
+    return list(ids)
+
+
+class _SequenceBlock:
+    """Numbers reserved from the database counter, handed out in-process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next = 0
+        self.end = 0
+
+    def take(self, count: int) -> list:
+        if connection.vendor == 'sqlite':
+            # Reserved in the caller's transaction and never cached: a rollback
+            # takes back the numbers together with everything that used them.
+            # SQLite has a single writer, so the row lock costs nothing extra.
+            start, end = reserve_counter_range(count)
+            return list(range(start, end))
+
+        numbers = []
+        with self.lock:
+            while len(numbers) < count:
+                if self.next >= self.end:
+                    self.next, self.end = reserve_sequence_block()
+                take = min(count - len(numbers), self.end - self.next)
+                numbers.extend(range(self.next, self.next + take))
+                self.next += take
+        return numbers
+
+
+_sequence_block = _SequenceBlock()
+
+
+def reserve_counter_range(size: int) -> tuple:
+    """Reserve [start, start + size) from the counter row in the current transaction."""
+    from .models import TicketIdCounter
+
+    with transaction.atomic():
+        counter, _ = TicketIdCounter.objects.select_for_update().get_or_create(name=SEQUENCE_NAME)
+        TicketIdCounter.objects.filter(pk=counter.pk).update(next_value=F('next_value') + size)
+    return counter.next_value, counter.next_value + size
+
+
+def reserve_sequence_block() -> tuple:
+    """
+    Reserve [start, start + SEQUENCE_BLOCK_SIZE) outside the caller's transaction.
+
+    Purchases ask for IDs inside their own transaction; reserving there would
+    hold the counter row until the purchase commits, and a rollback would
+    hand the block this process keeps using to the next worker. PostgreSQL
+    takes blocks from a sequence (never rolled back, never locked); other
+    databases bump the counter row on a separate autocommit connection.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s)", [SEQUENCE_DB_NAME])
+            start = cursor.fetchone()[0]
+        return start, start + SEQUENCE_BLOCK_SIZE
+
+    from .models import TicketIdCounter
+
+    table = TicketIdCounter._meta.db_table
+    own_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        own_connection.set_autocommit(False)
+        with own_connection.cursor() as cursor:
+            # The UPDATE comes first so the row is write-locked before it is read.
+            cursor.execute(f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+                           [SEQUENCE_BLOCK_SIZE, SEQUENCE_NAME])
+            if not cursor.rowcount:
+                cursor.execute(f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)",
+                               [SEQUENCE_NAME, 1 + SEQUENCE_BLOCK_SIZE])
+            cursor.execute(f"SELECT next_value FROM {table} WHERE name = %s", [SEQUENCE_NAME])
+            end = cursor.fetchone()[0]
+        own_connection.commit()
+    finally:
+        own_connection.close()
+    return end - SEQUENCE_BLOCK_SIZE, end
+
+
+def sequence_ticket_ids(count: int) -> list:
+    mask = (1 << TICKET_ID_BITS) - 1
+    return [encode_crockford((n * SEQUENCE_MULTIPLIER) & mask) for n in _sequence_block.take(count)]
+
+
+def allocate_ticket_ids(count: int) -> list:
+    """Allocate `count` unique ticket IDs using the configured TICKET_ID_MODE."""
+    if count <= 0:
+        return []
+    if getattr(settings, 'TICKET_ID_MODE', MODE_RANDOM) == MODE_SEQUENCE:
+        return sequence_ticket_ids(count)
+    return allocate_random_ids(count)
@@ -2,11 +2,9 @@ import logging
 import stripe
 
 from django.conf import settings
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.http import HttpResponse
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
@@ -21,7 +19,10 @@ from .serializers import (
     GiveawayTicketSerializer, UpdateGiveawayTicketSerializer, TicketPurchaseCreateSerializer, TicketPurchaseDetailsSerializer
 )
 from .utils import validate_quantity
+from .giveaway_cache import cache_version, get_giveaway_payload, payload_key
+from .inventory import shard_stock
 from subscription.models import UserSubscription
+from core.conditional import conditional_get, make_etag
 
 from .pagination import StandardResultsSetPagination
 
@@ -38,8 +39,10 @@ class CreateGiveawayTicketView(APIView):
         serializer = GiveawayTicketSerializer(data=request.data)
         if serializer.is_valid():
             try:
-                serializer.save()
-                cache.delete('giveaway_ticket')
+                ticket = serializer.save()
+                if settings.TICKET_STOCK_SHARDS:
+                    shard_stock(ticket, settings.TICKET_STOCK_SHARDS)
+                    ticket.refresh_from_db()
                 logger.info(f"Giveaway ticket created: {serializer.data['ticket_id']}")
                 return Response({
                     'success': True,
@@ -58,45 +61,14 @@ class CreateGiveawayTicketView(APIView):
 class GiveawayTicketListView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        cached_ticket = cache.get('giveaway_ticket')
-
-        if cached_ticket:
-            serializer = GiveawayTicketSerializer(cached_ticket)
-            return Response({
-                "success": True,
-                "message": "Active giveaway ticket retrieved successfully.",
-                "ticket": serializer.data
-            }, status=status.HTTP_200_OK)
-
-        ticket = GiveawayTicket.objects.filter(
-            total_available__gt=0,
-            ticket_expiry_date__gte=timezone.now().date()
-        ).first()
-
-        if ticket:
-            # cache.set('giveaway_ticket', ticket, timeout=3600)
-            serializer = GiveawayTicketSerializer(ticket)
-            return Response({
-                "success": True,
-                "message": "Active giveaway ticket retrieved successfully.",
-                "ticket": serializer.data
-            }, status=status.HTTP_200_OK)
-
-        # If no active giveaway exists, find latest expired ticket (optional)
-        latest_ticket = GiveawayTicket.objects.order_by('-ticket_expiry_date').first()
-        if latest_ticket:
-            serializer = GiveawayTicketSerializer(latest_ticket)
-            return Response({
-                "success": False,
-                "message": f"The giveaway has expired on {latest_ticket.ticket_expiry_date}. No active giveaway is currently available.",
-                "ticket": serializer.data
-            }, status=status.HTTP_404_NOT_FOUND)
+    def get_etag(self, request):
+        # The payload's cache key changes with every giveaway or stock change.
+        return make_etag(payload_key(cache_version()))
 
-        return Response({
-            "success": False,
-            "message": "No giveaway tickets have been created yet."
-        }, status=status.HTTP_404_NOT_FOUND)
+    @conditional_get
+    def get(self, request):
+        payload = get_giveaway_payload()
+        return Response(payload['body'], status=payload['status'])
 
 
 
@@ -114,7 +86,9 @@ class UpdateGiveawayTicketView(APIView):
         if serializer.is_valid():
             try:
                 serializer.save()
-                cache.delete('giveaway_ticket')
+                if ticket.stock_shards and 'total_available' in serializer.validated_data:
+                    # A new stock level from the admin replaces whatever the shards hold.
+                    shard_stock(ticket, ticket.stock_shards, total=ticket.total_available)
                 logger.info(f"Giveaway ticket updated: {ticket.ticket_id}")
                 return Response({
                     "success": True,
@@ -138,7 +112,6 @@ class UpdateGiveawayTicketView(APIView):
 
         ticket_id = ticket.ticket_id
         ticket.delete()
-        cache.delete('giveaway_ticket')
         logger.info(f"Giveaway ticket deleted: {ticket_id}")
         return Response({
             "success": True,
@@ -237,7 +210,7 @@ class TicketPurchaseListView(ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return TicketPurchase.objects.filter(user=self.request.user, source='purchase').select_related('ticket', 'user')
+        return TicketPurchase.objects.filter(user=self.request.user, source='purchase').select_related('ticket', 'user').with_pricing()
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()